@@ -0,0 +1,101 @@
+"""
+Lọc quỹ đạo trong hệ tọa độ BIM
+- Mỗi đối tượng (camera, track_id) có 1 Kalman filter vận tốc không đổi [x, y, vx, vy]
+- Làm mượt tọa độ tâm đáy chiếu sang BIM (nhiễu do box YOLO rung)
+- Vận tốc đã lọc dùng để dự đoán thời điểm đối tượng ra khỏi vùng (ZoneIndex.exit_time)
+"""
+
+import numpy as np
+
+
+class ConstantVelocityKalman:
+    """Kalman filter 2D, trạng thái [x, y, vx, vy]"""
+    def __init__(self, x, y, timestamp, process_noise=1.0, measurement_noise=0.3):
+        """
+        Args:
+            process_noise: độ lệch chuẩn gia tốc (đơn vị BIM / s²)
+            measurement_noise: độ lệch chuẩn nhiễu đo vị trí (đơn vị BIM)
+        """
+        self.state = np.array([x, y, 0.0, 0.0])
+        # Vị trí tin theo phép đo đầu tiên, vận tốc chưa biết
+        self.P = np.diag([measurement_noise ** 2, measurement_noise ** 2, 10.0, 10.0])
+        self.R = np.eye(2) * measurement_noise ** 2
+        self.H = np.array([[1.0, 0.0, 0.0, 0.0],
+                           [0.0, 1.0, 0.0, 0.0]])
+        self.process_noise = process_noise
+        self.timestamp = timestamp
+        # Thời điểm phép đo gần nhất (predict không đổi) → tuổi của filter
+        self.measured_at = timestamp
+
+    def predict(self, timestamp):
+        """Đẩy trạng thái tới thời điểm timestamp"""
+        dt = max(0.0, timestamp - self.timestamp)
+        if dt == 0.0:
+            return
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        # Nhiễu gia tốc trắng rời rạc
+        q = self.process_noise ** 2
+        dt2, dt3, dt4 = dt * dt, dt ** 3, dt ** 4
+        Q = q * np.array([[dt4 / 4, 0, dt3 / 2, 0],
+                          [0, dt4 / 4, 0, dt3 / 2],
+                          [dt3 / 2, 0, dt2, 0],
+                          [0, dt3 / 2, 0, dt2]])
+        self.state = F @ self.state
+        self.P = F @ self.P @ F.T + Q
+        self.timestamp = timestamp
+
+    def update(self, x, y):
+        """Hiệu chỉnh bằng phép đo vị trí mới"""
+        innovation = np.array([x, y]) - self.H @ self.state
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.state = self.state + K @ innovation
+        self.P = (np.eye(4) - K @ self.H) @ self.P
+        self.measured_at = self.timestamp
+
+
+class BimTrajectoryFilter:
+    """Quản lý Kalman filter của mọi đối tượng đang theo dõi"""
+    def __init__(self, process_noise=1.0, measurement_noise=0.3, max_age_s=2.0):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.max_age_s = max_age_s
+        # key (camera_id, track_id) -> ConstantVelocityKalman
+        self.filters = {}
+
+    def update(self, key, x, y, timestamp):
+        """
+        Đưa phép đo BIM mới của đối tượng key vào filter
+
+        Returns:
+            (x, y, vx, vy) đã làm mượt
+        """
+        kf = self.filters.get(key)
+        if kf is None or timestamp - kf.measured_at > self.max_age_s:
+            kf = ConstantVelocityKalman(x, y, timestamp, self.process_noise, self.measurement_noise)
+            self.filters[key] = kf
+        else:
+            kf.predict(timestamp)
+            kf.update(x, y)
+        return tuple(float(v) for v in kf.state)
+
+    def predict(self, key, timestamp):
+        """
+        Chỉ đẩy filter của đối tượng key tới timestamp, không có phép đo mới
+        (vị trí track đẩy theo vận tốc / detection dùng lại không phải quan sát)
+
+        Returns:
+            (x, y, vx, vy) dự đoán, None nếu đối tượng chưa có filter (hoặc filter đã quá max_age_s)
+        """
+        kf = self.filters.get(key)
+        if kf is None or timestamp - kf.measured_at > self.max_age_s:
+            return None
+        kf.predict(timestamp)
+        return tuple(float(v) for v in kf.state)
+
+    def prune(self, now):
+        """Xóa filter của đối tượng không có phép đo mới quá max_age_s"""
+        stale = [key for key, kf in self.filters.items() if now - kf.measured_at > self.max_age_s]
+        for key in stale:
+            del self.filters[key]
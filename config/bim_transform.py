@@ -0,0 +1,102 @@
+"""
+Chuyển đổi tọa độ Pixel ↔ BIM cho từng camera
+- Camera 1: dùng trực tiếp ma trận H trong chuyendoitoado.py
+- Camera 2: phép Swap X/Y + Remap + Đảo Y được gộp sẵn vào ma trận H
+  → mỗi lần chuyển đổi chỉ còn 1 phép nhân ma trận 3x3
+- Ma trận nghịch đảo (BIM → Pixel) tính 1 lần từ ma trận hiệu dụng
+"""
+
+import cv2
+import numpy as np
+
+try:
+    from .chuyendoitoado import get_projection_matrix
+    from .chuyendoitoado_cam2 import get_projection_matrix_cam2
+except ImportError:
+    # Khi thư mục config được thêm trực tiếp vào sys.path (các tool)
+    from chuyendoitoado import get_projection_matrix
+    from chuyendoitoado_cam2 import get_projection_matrix_cam2
+
+
+def get_cam2_post_transform():
+    """
+    Ma trận 3x3 của chuỗi biến đổi sau H cho Camera 2 (camera vuông góc)
+    Tương đương:
+        tx, ty = ty, tx
+        tx = (tx - (-5)) / 32.0 * 38.0 + 32
+        ty = (ty - 32) / 38.0 * 32.0 + (-5)
+        ty = 22 - ty
+    """
+    # Swap X và Y
+    swap = np.array([[0.0, 1.0, 0.0],
+                     [1.0, 0.0, 0.0],
+                     [0.0, 0.0, 1.0]])
+
+    # Remap tx: từ range (-5, 27) sang range (32, 70)
+    # Remap ty: từ range (32, 70) sang range (-5, 27)
+    sx = 38.0 / 32.0
+    sy = 32.0 / 38.0
+    remap = np.array([[sx, 0.0, 5.0 * sx + 32.0],
+                      [0.0, sy, -32.0 * sy - 5.0],
+                      [0.0, 0.0, 1.0]])
+
+    # Đảo ngược Y: ty = 22 - ty (22 = -5 + 27)
+    flip = np.array([[1.0, 0.0, 0.0],
+                     [0.0, -1.0, 22.0],
+                     [0.0, 0.0, 1.0]])
+
+    return flip @ remap @ swap
+
+
+def build_effective_matrix(camera_id, projection_matrix):
+    """Gộp ma trận H đã calibrate với phép biến đổi riêng của camera"""
+    matrix = np.asarray(projection_matrix, dtype=np.float64)
+    if camera_id == 2:
+        matrix = get_cam2_post_transform() @ matrix
+    return matrix
+
+
+def get_effective_matrix(camera_id):
+    """Ma trận hiệu dụng Pixel → BIM của camera (đọc từ file calibration)"""
+    if camera_id == 1:
+        return build_effective_matrix(1, get_projection_matrix())
+    return build_effective_matrix(2, get_projection_matrix_cam2())
+
+
+def load_camera_transforms(camera_ids=(1, 2)):
+    """
+    Tính 1 lần ma trận Pixel → BIM và BIM → Pixel cho các camera
+
+    Returns:
+        (matrices, inv_matrices): dict camera_id -> ma trận 3x3
+    """
+    matrices = {cid: get_effective_matrix(cid) for cid in camera_ids}
+    inv_matrices = {cid: np.linalg.inv(m) for cid, m in matrices.items()}
+    return matrices, inv_matrices
+
+
+def transform_points(points, matrix):
+    """
+    Chuyển nhiều điểm qua ma trận 3x3 trong 1 lần gọi
+
+    Args:
+        points: mảng Nx2 (hoặc list các (x, y))
+    Returns:
+        mảng Nx2 float64
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    if len(pts) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    return cv2.perspectiveTransform(pts, matrix).reshape(-1, 2)
+
+
+def pixel_to_bim(px, py, matrix):
+    """Chuyển 1 điểm pixel sang tọa độ BIM"""
+    tx, ty = transform_points([(px, py)], matrix)[0]
+    return float(tx), float(ty)
+
+
+def bim_to_pixel(bim_x, bim_y, inv_matrix):
+    """Chuyển 1 điểm BIM về pixel (dùng ma trận nghịch đảo)"""
+    px, py = transform_points([(bim_x, bim_y)], inv_matrix)[0]
+    return float(px), float(py)
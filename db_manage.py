@@ -1,27 +1,76 @@
+import os
 import sqlite3
+import threading
+import time
+from datetime import datetime
+from queue import Queue, Empty, Full
+
+# upsert by person_ID: replace existing row for that person_ID
+UPSERT_TEMP_SQL = "INSERT OR REPLACE INTO temp_data (person_ID, x_location, y_location) VALUES (?, ?, ?)"
+
+# One row per inferred/tracked detection: ts = epoch seconds of the camera frame.
+# object_id / track_id restart at 1 on every run, run_id tells the runs apart
+HISTORY_COLUMNS = ("ts", "run_id", "camera_id", "track_id", "object_id", "person_ID", "label",
+                   "x", "y", "confidence", "state")
+INSERT_HISTORY_SQL = (f"INSERT INTO position_history ({', '.join(HISTORY_COLUMNS)}) "
+                      f"VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})")
+
+
+def _ensure_temp_table(conn):
+    cur = conn.cursor()
+    # person_ID is primary key so we can upsert by person_ID
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS temp_data
+        (person_ID INTEGER PRIMARY KEY, x_location INTEGER, y_location INTEGER)
+    """)
+    conn.commit()
+    # ensure two rows exist for person_ID 0 and 1 (initialized with NULL coords)
+    # 0 = songoku, 1 = dog
+    cur.execute("SELECT person_ID FROM temp_data WHERE person_ID IN (0,1)")
+    existing = {row[0] for row in cur.fetchall()}
+    to_add = []
+    for pid in (0, 1):
+        if pid not in existing:
+            to_add.append((pid, None, None))
+    if to_add:
+        cur.executemany("INSERT OR IGNORE INTO temp_data (person_ID, x_location, y_location) VALUES (?, ?, ?)", to_add)
+        conn.commit()
+
+
+def new_run_id():
+    """Id of this process run for position_history, e.g. "20261018_101500_4242" (start time + pid)"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+
+def _ensure_history_table(conn):
+    # (object_id, run_id, ts), (person_ID, ts) and (label, ts) indexes make
+    # "where was X between t1 and t2" a range scan, (ts) serves time-window queries over every object
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS position_history (
+            ts REAL NOT NULL,
+            run_id TEXT,
+            camera_id TEXT NOT NULL,
+            track_id INTEGER,
+            object_id INTEGER,
+            person_ID INTEGER,
+            label TEXT,
+            x REAL,
+            y REAL,
+            confidence REAL,
+            state TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_ts ON position_history (ts);
+        CREATE INDEX IF NOT EXISTS idx_history_object_run_ts ON position_history (object_id, run_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_history_person_ts ON position_history (person_ID, ts);
+        CREATE INDEX IF NOT EXISTS idx_history_label_ts ON position_history (label, ts);
+    """)
+
 
 # Make temp table if doesn't exist
 def create_temp_table(db_path):
     # create table with correct INTEGER keyword and use context manager
     with sqlite3.connect(db_path) as conn:
-        cur = conn.cursor()
-        # person_ID is primary key so we can upsert by person_ID
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS temp_data
-            (person_ID INTEGER PRIMARY KEY, x_location INTEGER, y_location INTEGER)
-        """)
-        conn.commit()
-        # ensure two rows exist for person_ID 0 and 1 (initialized with NULL coords)
-        # 0 = songoku, 1 = dog
-        cur.execute("SELECT person_ID FROM temp_data WHERE person_ID IN (0,1)")
-        existing = {row[0] for row in cur.fetchall()}
-        to_add = []
-        for pid in (0, 1):
-            if pid not in existing:
-                to_add.append((pid, None, None))
-        if to_add:
-            cur.executemany("INSERT OR IGNORE INTO temp_data (person_ID, x_location, y_location) VALUES (?, ?, ?)", to_add)
-            conn.commit()
+        _ensure_temp_table(conn)
 
 
 # Query the database and return all records
@@ -34,14 +83,13 @@ def show_all(db_path):
             print(item)
 
 
-# Add many data to the table
-def add_many_temp(db_path, data_list):
+def normalize_temp_rows(data_list):
     """
-    Insert multiple (x_location, y_location, person_ID) records into temp_data.
-    data_list should be an iterable of (x, y) tuples.
+    Validate (x, y, person_id) triples and convert them to temp_data rows
+    (person_ID, x_location, y_location); unknown person IDs are skipped.
     """
     if not data_list:
-        return
+        return []
 
     # enforce that each item is a 3-tuple (x, y, person_id)
     normalized = []
@@ -72,17 +120,23 @@ def add_many_temp(db_path, data_list):
         except Exception:
             y_i = None
         filtered.append((pid_int, x_i, y_i))
+    return filtered
+
 
+# Add many data to the table
+def add_many_temp(db_path, data_list):
+    """
+    Insert multiple (x_location, y_location, person_ID) records into temp_data.
+    data_list should be an iterable of (x, y, person_id) tuples.
+    Opens a new connection per call; long-running processes should use DatabaseWriter.
+    """
+    filtered = normalize_temp_rows(data_list)
     if not filtered:
         return
 
     with sqlite3.connect(db_path) as conn:
         cur = conn.cursor()
-        # upsert by person_ID: replace existing row for that person_ID
-        cur.executemany(
-            "INSERT OR REPLACE INTO temp_data (person_ID, x_location, y_location) VALUES (?, ?, ?)",
-            filtered,
-        )
+        cur.executemany(UPSERT_TEMP_SQL, filtered)
         conn.commit()
 
 # Delete all data in temp_file
@@ -90,4 +144,190 @@ def delete_temp(db_path):
     with sqlite3.connect(db_path) as conn:
         cur = conn.cursor()
         cur.execute("DELETE FROM temp_data")
-        conn.commit()
\ No newline at end of file
+        conn.commit()
+
+
+class DatabaseWriter(threading.Thread):
+    """
+    Single long-lived SQLite connection owned by one writer thread.
+    - WAL journal: readers (GUI, Revit tooling) never block the writer and vice versa
+    - synchronous=NORMAL: no fsync per commit in WAL mode (a power cut may lose the last
+      commits, never corrupts the database)
+    - Fixed SQL strings so sqlite3 reuses its cached prepared statements
+    - Callers only enqueue rows; everything queued within commit_interval_ms goes into one transaction
+    """
+    def __init__(self, db_path, synchronous="NORMAL", busy_timeout_ms=5000, queue_size=1000,
+                 commit_interval_ms=200):
+        super().__init__(name="DatabaseWriter")
+        self.db_path = db_path
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.commit_interval_s = commit_interval_ms / 1000.0
+        self.queue = Queue(maxsize=queue_size)
+        self.ready = threading.Event()
+        self.error = None
+        self._stop_requested = False
+        self.stats = {'requests': 0, 'rows': 0, 'transactions': 0, 'dropped': 0, 'errors': 0,
+                      'write_ms_total': 0.0, 'write_ms_max': 0.0}
+        self.daemon = True
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        _ensure_temp_table(conn)
+        _ensure_history_table(conn)
+        return conn
+
+    def execute_many(self, sql, rows):
+        """Queue rows for sql (returns immediately; False if the queue is full and the rows were dropped)"""
+        rows = list(rows)
+        if not rows:
+            return True
+        try:
+            self.queue.put_nowait((sql, rows))
+        except Full:
+            self.stats['dropped'] += len(rows)
+            return False
+        self.stats['requests'] += 1
+        return True
+
+    def write_temp(self, data_list):
+        """Queue an upsert of (x, y, person_id) triples into temp_data"""
+        return self.execute_many(UPSERT_TEMP_SQL, normalize_temp_rows(data_list))
+
+    def write_history(self, rows):
+        """Queue position_history rows: dicts with HISTORY_COLUMNS keys (missing keys = NULL)"""
+        return self.execute_many(INSERT_HISTORY_SQL,
+                                 [tuple(row.get(column) for column in HISTORY_COLUMNS) for row in rows])
+
+    def run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self.error = e
+            print(f"[ERROR] Database writer: {e}")
+            self.ready.set()
+            return
+        self.ready.set()
+
+        while True:
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except Empty:
+                if self._stop_requested:
+                    break
+                continue
+            # Everything queued within commit_interval_s goes into the same transaction
+            # (at most queue_size requests, so a backlog is committed in bounded chunks)
+            deadline = time.monotonic() + self.commit_interval_s
+            while batch[-1] is not None and len(batch) < self.queue.maxsize:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except Empty:
+                    break
+            if any(item is None for item in batch):
+                self._stop_requested = True
+            self._write_batch(conn, [item for item in batch if item is not None])
+            for _ in batch:
+                self.queue.task_done()
+            if self._stop_requested and self.queue.empty():
+                break
+
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        if not batch:
+            return
+        t0 = time.perf_counter()
+        try:
+            conn.execute("BEGIN")
+            for sql, rows in batch:
+                conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"[ERROR] Ghi database: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        self.stats['transactions'] += 1
+        self.stats['rows'] += sum(len(rows) for _, rows in batch)
+        self.stats['write_ms_total'] += elapsed_ms
+        self.stats['write_ms_max'] = max(self.stats['write_ms_max'], elapsed_ms)
+
+    def flush(self):
+        """Wait until every queued write is committed"""
+        self.queue.join()
+
+    def summary(self):
+        st = self.stats
+        avg_ms = st['write_ms_total'] / st['transactions'] if st['transactions'] else 0.0
+        return (f"{st['rows']} rows / {st['transactions']} transactions, avg {avg_ms:.2f} ms, "
+                f"max {st['write_ms_max']:.2f} ms, dropped {st['dropped']}, errors {st['errors']}")
+
+    def close(self, timeout=5.0):
+        """Commit what is left in the queue, then close the connection"""
+        self._stop_requested = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except Full:
+            pass
+        self.join(timeout)
+
+
+def _to_epoch(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def query_history(db_path, object_id=None, person_id=None, label=None, start=None, end=None, limit=None,
+                  run_id=None):
+    """
+    Positions of one object / person / label within [start, end], oldest first.
+    start/end: epoch seconds, datetime or ISO string ("2026-10-18 10:00").
+    object_id is only unique within one run: pass run_id with it.
+    Returns a list of dicts with HISTORY_COLUMNS keys.
+    """
+    conditions, params = [], []
+    for column, value in (("object_id", object_id), ("run_id", run_id), ("person_ID", person_id),
+                          ("label", label)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if start is not None:
+        conditions.append("ts >= ?")
+        params.append(_to_epoch(start))
+    if end is not None:
+        conditions.append("ts <= ?")
+        params.append(_to_epoch(end))
+
+    sql = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM position_history"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY ts"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+
+    # Read-only connection: never takes the write lock, sees the last committed WAL snapshot
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return [dict(zip(HISTORY_COLUMNS, row)) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def start_database_writer(db_path, **kwargs):
+    """Start a DatabaseWriter and wait until its connection and tables are ready"""
+    writer = DatabaseWriter(db_path, **kwargs)
+    writer.start()
+    writer.ready.wait()
+    if writer.error is not None:
+        raise writer.error
+    return writer
@@ -0,0 +1,161 @@
+"""
+Detection Config Module
+- Đọc cấu hình detection từ config/detection_config.json
+- Key nào thiếu trong file sẽ lấy giá trị mặc định
+"""
+
+import os
+import json
+import copy
+
+# Path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(script_dir, "config", "detection_config.json")
+
+# Cấu hình mặc định
+DEFAULT_DETECTION_CONFIG = {
+    # Gộp frame mới nhất của tất cả camera thành 1 batch cho YOLO
+    "batch_inference": True,
+    "conf": 0.3,
+    "imgsz": 640,
+    # Backend inference: "pytorch" / "torchscript" / "onnx" / "openvino"
+    # device: "auto" (GPU nếu có, không thì CPU), "cpu", hoặc số GPU (0)
+    # precision: "fp32", "fp16" hoặc "int8" (int8 chỉ với openvino, cần calibration_data
+    # do tools/quantize_model.py tạo ra)
+    "inference": {
+        "weights": "models/best.pt",
+        "backend": "pytorch",
+        "device": "auto",
+        "precision": "fp16",
+        "calibration_data": "output/quantize/calibration.yaml",
+    },
+    # Thứ tự phục vụ camera: "round_robin" hoặc "oldest_first"
+    "scheduler_policy": "round_robin",
+    # Chu kỳ in thống kê tốc độ phục vụ từng camera (giây)
+    "stats_interval_s": 30,
+    # Bỏ qua YOLO khi vùng BIM không có chuyển động (dùng lại detection cũ)
+    # keepalive_s: vẫn detect lại định kỳ dù cảnh tĩnh
+    "motion_gate": {
+        "enabled": True,
+        "method": "diff",
+        "scale_width": 160,
+        "diff_threshold": 25,
+        "min_motion_ratio": 0.002,
+        "zone_margin_px": 20,
+        "keepalive_s": 2.0,
+    },
+    # Chỉ inference trên vùng bao quanh vùng BIM (+ margin_px) thay vì cả frame
+    # imgsz (tùy chọn): kích thước inference riêng khi bật ROI
+    "roi": {
+        "enabled": False,
+        "margin_px": 40,
+    },
+    # Tracker IoU (kiểu ByteTrack) gán track_id ổn định cho từng đối tượng
+    # detect_every: chạy YOLO mỗi N frame, các frame giữa đẩy track theo vận tốc
+    # high_conf: detection dưới ngưỡng này chỉ dùng để nối track, không tạo track mới
+    "tracker": {
+        "enabled": True,
+        "detect_every": 1,
+        "iou_threshold": 0.3,
+        "high_conf": 0.5,
+        "max_missed": 10,
+        "min_hits": 1,
+    },
+    # Kalman filter vận tốc không đổi trong hệ BIM cho từng track (cần bật tracker)
+    # process_noise: độ lệch gia tốc (BIM/s²), measurement_noise: nhiễu vị trí (BIM)
+    # exit_warning_s: cảnh báo khi dự đoán chạm biên vùng trong vòng N giây
+    # min_exit_speed: bỏ qua dự đoán khi vận tốc nhỏ hơn (BIM/s), tránh báo động do rung
+    "bim_filter": {
+        "enabled": True,
+        "process_noise": 1.0,
+        "measurement_noise": 0.3,
+        "max_age_s": 2.0,
+        "exit_warning_s": 1.0,
+        "min_exit_speed": 0.2,
+    },
+    # Gộp detection của mọi camera trong hệ BIM: cùng label và cách nhau không quá
+    # association_distance (đơn vị BIM) là 1 đối tượng; quan sát cũ hơn max_age_s bị bỏ
+    "fusion": {
+        "association_distance": 2.0,
+        "max_age_s": 1.0,
+    },
+    # Trạng thái TRONG / NGOÀI vùng của từng đối tượng đã gộp
+    # enter_margin / exit_margin: phải vào sâu / ra xa khỏi biên bao nhiêu (BIM) mới đổi trạng thái
+    # enter_dwell_s / exit_dwell_s: trạng thái mới phải giữ liên tục bao lâu mới được xác nhận
+    # forget_after_s: đối tượng mất quá thời gian này thì bỏ (đèn của nó được tắt)
+    "region_state": {
+        "enter_margin": 0.3,
+        "exit_margin": 0.3,
+        "enter_dwell_s": 0.5,
+        "exit_dwell_s": 0.3,
+        "warning_dwell_s": 0.0,
+        "forget_after_s": 3.0,
+    },
+    # Bảng position_history trong output/data.db: mỗi detection YOLO 1 dòng kèm run_id,
+    # ghi theo lô mỗi commit_interval_ms (1 transaction); frame tĩnh dùng lại detection cũ
+    # (motion gate) không được ghi
+    # record_tracked (tùy chọn, mặc định tắt): ghi cả vị trí track đẩy theo vận tốc giữa 2 lần YOLO
+    # (vị trí ước lượng, không phải quan sát → bật chỉ khi cần quỹ đạo dày hơn)
+    "history": {
+        "enabled": True,
+        "commit_interval_ms": 200,
+        "record_tracked": False,
+    },
+    # Log CSV output/detection_logs/: xoay file "hourly" (theo giờ) hoặc "size" (theo max_mb)
+    "detection_log": {
+        "rotate": "hourly",
+        "max_mb": 50,
+    },
+    # Nhịp ghi temp_data / log CSV theo đồng hồ thực: mỗi interval_ms, hoặc sớm hơn khi
+    # 1 đối tượng di chuyển > min_delta (BIM); 2 lần ghi cách nhau ít nhất min_gap_ms
+    "persist": {
+        "interval_ms": 500,
+        "min_delta": 0.5,
+        "min_gap_ms": 100,
+    },
+    # Persistence stage (thread ghi database / log CSV): hàng đợi tối đa queue_size snapshot,
+    # khi đầy: "merge" (gộp snapshot cùng loại), "drop_oldest" hoặc "drop_newest"
+    "persistence": {
+        "queue_size": 100,
+        "policy": "merge",
+    },
+    # Label không bao giờ detect (các mốc calibration)
+    "ignored_labels": ["moc1", "moc2", "moc3", "moc4"],
+    # Chính sách riêng cho từng camera (key là camera_id dạng chuỗi)
+    "cameras": {
+        "1": {"allowed_labels": ["dog"]},
+        "2": {"allowed_labels": ["songoku"]},
+    },
+}
+
+
+def merge_config(default, override):
+    """Gộp config đọc từ file vào config mặc định (đệ quy theo dict)"""
+    merged = copy.deepcopy(default)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def get_camera_config(config, camera_id):
+    """Lấy cấu hình riêng của 1 camera (dict rỗng nếu không có)"""
+    return config.get("cameras", {}).get(str(camera_id), {})
+
+
+def load_detection_config(config_path=CONFIG_PATH):
+    """Đọc cấu hình detection từ file JSON"""
+    if not os.path.exists(config_path):
+        print(f"[CONFIG] ⚠ Không tìm thấy config: {config_path} → dùng mặc định")
+        return copy.deepcopy(DEFAULT_DETECTION_CONFIG)
+
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        print(f"[CONFIG] Đã đọc config: {config_path}")
+        return merge_config(DEFAULT_DETECTION_CONFIG, config)
+    except Exception as e:
+        print(f"[CONFIG] ❌ Lỗi đọc config: {e} → dùng mặc định")
+        return copy.deepcopy(DEFAULT_DETECTION_CONFIG)
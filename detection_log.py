@@ -0,0 +1,208 @@
+"""
+Detection Log
+- Ghi kết quả detection ra file CSV chỉ-thêm (append-only) trên thread riêng
+  → vòng hiển thị chỉ đưa dòng vào hàng đợi, không đọc / ghi lại file cũ
+- Xoay file theo giờ (detections_YYYYmmdd_HH.csv) hoặc theo kích thước (_1, _2, ...)
+- File Excel chỉ tạo khi cần: export_to_excel() / tools/export_detection_excel.py
+"""
+
+import os
+import csv
+import glob
+import threading
+from datetime import datetime
+from queue import Queue, Empty, Full
+
+# Path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(script_dir, "output", "detection_logs")
+
+# Cột giống file Excel cũ
+LOG_COLUMNS = ["Timestamp", "Camera", "Object_ID", "Label", "Confidence", "BIM_X", "BIM_Y", "Status"]
+
+ROTATE_HOURLY = "hourly"
+ROTATE_SIZE = "size"
+
+# Giới hạn dòng của 1 sheet Excel (trừ dòng tiêu đề)
+EXCEL_MAX_ROWS = 1048575
+
+
+class RotatingCsvWriter(threading.Thread):
+    """Thread ghi CSV: nhận list dòng (dict theo LOG_COLUMNS) qua hàng đợi, xoay file theo giờ / kích thước"""
+    def __init__(self, log_dir=LOG_DIR, rotate=ROTATE_HOURLY, max_bytes=50 * 1024 * 1024, queue_size=1000,
+                 prefix="detections"):
+        """
+        Args:
+            rotate: "hourly" (1 file / giờ, vẫn tách file nếu vượt max_bytes) hoặc "size" (chỉ theo max_bytes)
+            max_bytes: kích thước tối đa 1 file (0 = không giới hạn)
+        """
+        if rotate not in (ROTATE_HOURLY, ROTATE_SIZE):
+            raise ValueError(f"Kiểu xoay file không hợp lệ: {rotate}")
+        super().__init__(name="RotatingCsvWriter")
+        self.log_dir = log_dir
+        self.rotate = rotate
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.queue = Queue(maxsize=queue_size)
+        self.file = None
+        self.writer = None
+        self.path = None
+        self._period = None
+        self._part = 0
+        self.stats = {'rows': 0, 'files': 0, 'dropped': 0, 'errors': 0}
+        self.daemon = True
+
+    def write(self, rows):
+        """Đưa các dòng vào hàng đợi (trả về ngay; False nếu hàng đợi đầy và các dòng bị bỏ)"""
+        rows = list(rows)
+        if not rows:
+            return True
+        try:
+            self.queue.put_nowait(rows)
+            return True
+        except Full:
+            self.stats['dropped'] += len(rows)
+            return False
+
+    def _period_of(self, now):
+        return now.strftime("%Y%m%d_%H") if self.rotate == ROTATE_HOURLY else now.strftime("%Y%m%d_%H%M%S")
+
+    def _open(self, now):
+        """Mở file mới (tiếp tục file cùng giờ nếu chương trình chạy lại)"""
+        self._close_file()
+        os.makedirs(self.log_dir, exist_ok=True)
+        period = self._period_of(now)
+        if period != self._period:
+            self._period = period
+            self._part = 0
+        while True:
+            suffix = f"_{self._part}" if self._part else ""
+            path = os.path.join(self.log_dir, f"{self.prefix}_{period}{suffix}.csv")
+            if not self.max_bytes or not os.path.exists(path) or os.path.getsize(path) < self.max_bytes:
+                break
+            self._part += 1
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=LOG_COLUMNS, extrasaction='ignore')
+        if new_file:
+            self.writer.writeheader()
+        self.path = path
+        self.stats['files'] += 1
+
+    def _needs_rotation(self, now):
+        if self.file is None:
+            return True
+        if self.rotate == ROTATE_HOURLY and self._period_of(now) != self._period:
+            return True
+        return bool(self.max_bytes) and self.file.tell() >= self.max_bytes
+
+    def _write_rows(self, rows):
+        now = datetime.now()
+        if self._needs_rotation(now):
+            # Cùng giờ mà file đã đầy → _open() chuyển sang phần tiếp theo (_1, _2, ...)
+            self._open(now)
+        self.writer.writerows(rows)
+        self.stats['rows'] += len(rows)
+
+    def run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=1.0)]
+            except Empty:
+                continue
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            stop = any(rows is None for rows in batch)
+            try:
+                for rows in batch:
+                    if rows is not None:
+                        self._write_rows(rows)
+                if self.file is not None:
+                    self.file.flush()
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"[ERROR] Ghi log detection: {e}")
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                break
+        self._close_file()
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
+
+    def flush(self):
+        """Chờ ghi xong mọi dòng đang chờ"""
+        self.queue.join()
+
+    def close(self, timeout=5.0):
+        """Ghi nốt hàng đợi rồi đóng file"""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except Full:
+            pass
+        self.join(timeout)
+
+
+def list_log_files(log_dir=LOG_DIR, start=None, end=None, prefix="detections"):
+    """
+    Các file CSV trong khoảng thời gian (theo giờ trong tên file), sắp xếp theo thời gian
+
+    Args:
+        start / end: datetime hoặc None (không giới hạn)
+    """
+    files = []
+    for path in glob.glob(os.path.join(log_dir, f"{prefix}_*.csv")):
+        parts = os.path.basename(path)[len(prefix) + 1:-4].split("_")
+        try:
+            opened = datetime.strptime(parts[0] + parts[1][:2], "%Y%m%d%H")
+            part = int(parts[-1]) if len(parts) > 2 else 0
+        except (ValueError, IndexError):
+            continue
+        if start is not None and opened < start.replace(minute=0, second=0, microsecond=0):
+            continue
+        if end is not None and opened > end:
+            continue
+        files.append((opened, parts[1], part, path))
+    return [path for *_, path in sorted(files)]
+
+
+def export_to_excel(excel_path, log_dir=LOG_DIR, start=None, end=None):
+    """
+    Gộp các file CSV thành 1 file Excel (chạy khi cần, không chạy trong vòng detection)
+
+    Returns:
+        số dòng đã xuất
+    """
+    import pandas as pd
+
+    files = list_log_files(log_dir, start, end)
+    if not files:
+        print(f"[INFO] Không có file log trong {log_dir}")
+        return 0
+
+    df = pd.concat([pd.read_csv(path) for path in files], ignore_index=True)
+    if start is not None or end is not None:
+        times = pd.to_datetime(df["Timestamp"])
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times <= end
+        df = df[mask]
+
+    os.makedirs(os.path.dirname(os.path.abspath(excel_path)), exist_ok=True)
+    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+        # Sheet Excel tối đa ~1 triệu dòng → tách nhiều sheet
+        for i, offset in enumerate(range(0, max(len(df), 1), EXCEL_MAX_ROWS)):
+            df.iloc[offset:offset + EXCEL_MAX_ROWS].to_excel(writer, sheet_name=f"detections_{i + 1}", index=False)
+    print(f"[INFO] Đã xuất {len(df)} dòng từ {len(files)} file → {excel_path}")
+    return len(df)
@@ -0,0 +1,129 @@
+"""
+Frame Scheduler
+- Giữ frame MỚI NHẤT của từng camera (frame cũ bị thay thế → không dồn trễ)
+- Đánh thức thread detection ngay khi BẤT KỲ camera nào có frame
+- Phục vụ công bằng giữa các camera: round-robin hoặc frame cũ nhất trước
+- Đếm số frame nhận / phục vụ / bỏ và tốc độ phục vụ (Hz) của từng camera
+- Cờ motion của frame bị thay thế được gộp (OR) vào frame mới để không mất chuyển động
+"""
+
+import threading
+import time
+
+POLICY_ROUND_ROBIN = "round_robin"
+POLICY_OLDEST_FIRST = "oldest_first"
+
+
+class FrameScheduler:
+    """Hàng đợi 1 slot cho mỗi camera, dùng chung 1 Condition"""
+    def __init__(self, camera_ids, policy=POLICY_ROUND_ROBIN):
+        if policy not in (POLICY_ROUND_ROBIN, POLICY_OLDEST_FIRST):
+            raise ValueError(f"Policy không hợp lệ: {policy}")
+
+        self.camera_ids = list(camera_ids)
+        self.policy = policy
+        self._cond = threading.Condition()
+        # camera_id -> (frame, timestamp, motion)
+        self._slots = {}
+        self._next_index = 0
+
+        self._stats = {
+            cid: {'received': 0, 'served': 0, 'dropped': 0, 'wait_total': 0.0}
+            for cid in self.camera_ids
+        }
+        self._last_report_time = time.monotonic()
+        self._last_report_served = {cid: 0 for cid in self.camera_ids}
+
+    def put(self, camera_id, frame, timestamp=None, motion=True):
+        """Camera đưa frame mới vào (thay thế frame chưa được xử lý)"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._cond:
+            stats = self._stats[camera_id]
+            pending = self._slots.get(camera_id)
+            if pending is not None:
+                stats['dropped'] += 1
+                motion = motion or pending[2]
+            self._slots[camera_id] = (frame, timestamp, motion)
+            stats['received'] += 1
+            self._cond.notify()
+
+    def _select_camera(self):
+        """Chọn camera được phục vụ tiếp theo theo policy"""
+        if self.policy == POLICY_OLDEST_FIRST:
+            return min(self._slots, key=lambda cid: self._slots[cid][1])
+
+        # Round-robin: bắt đầu từ camera sau camera vừa phục vụ
+        n = len(self.camera_ids)
+        for offset in range(n):
+            cid = self.camera_ids[(self._next_index + offset) % n]
+            if cid in self._slots:
+                self._next_index = (self._next_index + offset + 1) % n
+                return cid
+        return next(iter(self._slots))
+
+    def _take(self, camera_id):
+        """Lấy frame ra khỏi slot và cập nhật thống kê (gọi khi đang giữ lock)"""
+        frame, timestamp, motion = self._slots.pop(camera_id)
+        stats = self._stats[camera_id]
+        stats['served'] += 1
+        stats['wait_total'] += max(0.0, time.time() - timestamp)
+        return camera_id, frame, timestamp, motion
+
+    def get(self, timeout=None):
+        """
+        Chờ tới khi có frame của 1 camera bất kỳ
+
+        Returns:
+            (camera_id, frame, timestamp, motion) hoặc None nếu hết timeout
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._slots, timeout):
+                return None
+            return self._take(self._select_camera())
+
+    def get_all(self, timeout=None):
+        """
+        Chờ tới khi có frame, rồi lấy frame mới nhất của MỌI camera đang có
+
+        Returns:
+            list (camera_id, frame, timestamp, motion) theo thứ tự policy (rỗng nếu hết timeout)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._slots, timeout):
+                return []
+            items = []
+            while self._slots:
+                items.append(self._take(self._select_camera()))
+            return items
+
+    def wake_all(self):
+        """Đánh thức mọi thread đang chờ (dùng khi dừng hệ thống)"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def report(self):
+        """
+        Thống kê từng camera kể từ lần report trước
+
+        Returns:
+            dict camera_id -> {received, served, dropped, served_hz, avg_wait_ms}
+        """
+        with self._cond:
+            now = time.monotonic()
+            elapsed = max(now - self._last_report_time, 1e-6)
+            report = {}
+            for cid, stats in self._stats.items():
+                served = stats['served']
+                served_window = served - self._last_report_served[cid]
+                report[cid] = {
+                    'received': stats['received'],
+                    'served': served,
+                    'dropped': stats['dropped'],
+                    'served_hz': served_window / elapsed,
+                    'avg_wait_ms': (stats['wait_total'] / served * 1000.0) if served else 0.0,
+                }
+                self._last_report_served[cid] = served
+            self._last_report_time = now
+            return report
@@ -0,0 +1,137 @@
+"""
+Cross-Camera Fusion
+- Gộp detection của mọi camera trong hệ tọa độ BIM chung thành 1 danh sách đối tượng
+- Ghép theo label, khoảng cách BIM và thời gian quan sát
+- Vị trí gộp = trung bình có trọng số confidence của các quan sát còn hiệu lực
+- 1 camera mất frame / bị che thì đối tượng vẫn còn nhờ camera khác
+"""
+
+import itertools
+
+import numpy as np
+
+# Bộ đếm object_id của đối tượng đã gộp
+_object_ids = itertools.count(1)
+
+
+class FusedObject:
+    """1 đối tượng thực, có thể được nhiều camera nhìn thấy"""
+    def __init__(self, label):
+        self.object_id = next(_object_ids)
+        self.label = label
+        # camera_id -> detection mới nhất của camera đó (có 'timestamp')
+        self.observations = {}
+
+    def position(self):
+        """Vị trí BIM gộp theo trọng số confidence"""
+        points = np.array([det['bim'] for det in self.observations.values()])
+        weights = np.array([max(det.get('confidence', 0.0), 1e-3) for det in self.observations.values()])
+        x, y = (points * weights[:, None]).sum(axis=0) / weights.sum()
+        return float(x), float(y)
+
+    def last_seen(self):
+        return max(det['timestamp'] for det in self.observations.values())
+
+    def to_dict(self):
+        """Kết quả gộp dạng dict (cùng kiểu key với detection)"""
+        observations = self.observations.values()
+        return {
+            'object_id': self.object_id,
+            'label': self.label,
+            'bim': self.position(),
+            'confidence': max(det.get('confidence', 0.0) for det in observations),
+            'cameras': sorted(self.observations),
+            'track_ids': {cid: det.get('track_id') for cid, det in self.observations.items()},
+            # An toàn: chỉ cần 1 camera thấy ở ngoài là coi như ở ngoài
+            'inside_bim': all(det['inside_bim'] for det in observations),
+            'timestamp': self.last_seen(),
+        }
+
+
+class CrossCameraFusion:
+    """Ghép detection giữa các camera thành đối tượng có object_id ổn định"""
+    def __init__(self, association_distance=2.0, max_age_s=1.0):
+        """
+        Args:
+            association_distance: khoảng cách BIM tối đa để 2 quan sát là cùng 1 đối tượng
+            max_age_s: quan sát cũ hơn thời gian này bị bỏ (camera mất frame / bị che)
+        """
+        self.association_distance = association_distance
+        self.max_age_s = max_age_s
+        self.objects = []
+
+    def expire(self, now):
+        """Bỏ quan sát quá cũ, xóa đối tượng không còn quan sát nào"""
+        for obj in self.objects:
+            for camera_id in [cid for cid, det in obj.observations.items()
+                              if now - det['timestamp'] > self.max_age_s]:
+                del obj.observations[camera_id]
+        self.objects = [obj for obj in self.objects if obj.observations]
+
+    def update(self, camera_id, detections, timestamp):
+        """
+        Đưa toàn bộ detection mới nhất của 1 camera vào fusion
+
+        Args:
+            detections: list detection dict (có 'label', 'bim', 'confidence', 'timestamp')
+            timestamp: thời điểm chụp frame của camera
+        Returns:
+            list đối tượng đã gộp (dict)
+        """
+        # Vị trí gộp trước khi bỏ quan sát cũ (để ghép theo khoảng cách)
+        positions = {obj.object_id: obj.position() for obj in self.objects}
+
+        # Frame mới thay thế toàn bộ quan sát cũ của camera này
+        previous = {}
+        for obj in self.objects:
+            det = obj.observations.pop(camera_id, None)
+            if det is not None:
+                previous[obj.object_id] = det
+
+        unmatched = list(range(len(detections)))
+
+        # Bước 1: giữ nguyên đối tượng của track đã ghép ở frame trước
+        for obj in self.objects:
+            prev = previous.get(obj.object_id)
+            if prev is None or prev.get('track_id') is None:
+                continue
+            for i in unmatched:
+                det = detections[i]
+                if det.get('track_id') == prev['track_id'] and det['label'] == obj.label:
+                    obj.observations[camera_id] = det
+                    unmatched.remove(i)
+                    break
+
+        # Bước 2: ghép theo khoảng cách BIM gần nhất với đối tượng cùng label
+        candidates = []
+        for i in unmatched:
+            det = detections[i]
+            for obj in self.objects:
+                if camera_id in obj.observations or obj.label != det['label']:
+                    continue
+                ox, oy = positions[obj.object_id]
+                distance = np.hypot(det['bim'][0] - ox, det['bim'][1] - oy)
+                if distance <= self.association_distance:
+                    candidates.append((distance, i, obj))
+
+        matched = set()
+        for distance, i, obj in sorted(candidates, key=lambda c: c[0]):
+            if i in matched or camera_id in obj.observations:
+                continue
+            obj.observations[camera_id] = detections[i]
+            matched.add(i)
+
+        # Bước 3: detection chưa ghép → đối tượng mới
+        for i in unmatched:
+            if i not in matched:
+                obj = FusedObject(detections[i]['label'])
+                obj.observations[camera_id] = detections[i]
+                self.objects.append(obj)
+
+        # Đối tượng mất quan sát của camera này vẫn giữ quan sát của camera khác
+        return self.snapshot(timestamp)
+
+    def snapshot(self, now):
+        """Danh sách đối tượng đã gộp còn hiệu lực tại thời điểm now"""
+        self.expire(now)
+        return [obj.to_dict() for obj in self.objects]
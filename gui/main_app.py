@@ -276,14 +276,23 @@ class DualCameraApp:
             self.log(f"⚠ Không đọc được config: {e}")
     
     def save_config(self, enabled=True):
-        """Lưu config vào file"""
-        config = {
+        """Lưu config vào file (giữ nguyên các key khác đã có trong file)"""
+        config = {}
+        try:
+            if os.path.exists(CONFIG_PATH):
+                with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+        except Exception:
+            config = {}
+        config.update({
             "enabled": enabled,
+            # GUI luôn kết nối qua cổng COM → config do GUI lưu là RTU (bỏ "tcp" cũ nếu có)
+            "transport": "rtu",
             "port": self.com_port_var.get(),
             "baudrate": int(self.baud_var.get()),
-            "slave_esp32": 1,
-            "slave_esp8266": 2
-        }
+            "slave_esp32": config.get("slave_esp32", 1),
+            "slave_esp8266": config.get("slave_esp8266", 2)
+        })
         try:
             os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
             with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
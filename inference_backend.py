@@ -0,0 +1,202 @@
+"""
+Inference Backend
+- Bọc YOLO(model_path) để chọn backend: pytorch / torchscript / onnx / openvino
+- Export models/best.pt sang định dạng của backend 1 lần, lưu cạnh file weights
+  (tên file theo precision / imgsz / batch, file .json đi kèm ghi hash weights → đổi weights thì export lại)
+- Chọn device (GPU/CPU) và precision (fp32/fp16/int8) từ config
+- INT8 chỉ hỗ trợ qua OpenVINO, calibrate bằng ảnh trong output/images/
+- Máy không có GPU vẫn chạy được (device="auto" → CPU)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+# Path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+BACKENDS = ("pytorch", "torchscript", "onnx", "openvino")
+PRECISIONS = ("fp32", "fp16", "int8")
+# Backend export được model INT8
+INT8_BACKENDS = ("openvino",)
+
+
+def resolve_device(device):
+    """'auto' → GPU 0 nếu có CUDA, ngược lại CPU"""
+    if str(device).lower() != "auto":
+        return device
+    try:
+        import torch
+        return 0 if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+def is_cpu(device):
+    return str(device).lower() == "cpu"
+
+
+def get_artifact_path(weights_path, backend, precision, imgsz=640, batch=1):
+    """
+    Đường dẫn file model đã export (nằm cạnh file .pt)
+    - TorchScript cố định batch → batch nằm trong tên file; ONNX / OpenVINO export batch động
+    """
+    if backend == "pytorch":
+        return weights_path
+
+    stem = os.path.splitext(weights_path)[0]
+    suffix = "" if precision == "fp32" else f"_{precision}"
+    suffix += f"_{imgsz}"
+    if backend == "torchscript":
+        return f"{stem}{suffix}_b{batch}.torchscript"
+    if backend == "onnx":
+        return f"{stem}{suffix}.onnx"
+    return f"{stem}{suffix}_openvino_model"
+
+
+def get_weights_hash(weights_path):
+    """SHA-256 của file weights (khóa cache: weights đổi thì file export cũ không dùng lại)"""
+    digest = hashlib.sha256()
+    with open(weights_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_artifact_meta(artifact_path):
+    """Đọc file .json đi kèm file export (None nếu chưa có / lỗi)"""
+    try:
+        with open(f"{artifact_path}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_artifact(artifact_path):
+    """Xóa file / thư mục export cũ"""
+    if os.path.isdir(artifact_path):
+        shutil.rmtree(artifact_path)
+    elif os.path.exists(artifact_path):
+        os.remove(artifact_path)
+
+
+def export_model(weights_path, backend, precision, device, imgsz=640, batch=1, calibration_data=None):
+    """
+    Export weights sang định dạng backend (chỉ chạy khi chưa có file cache hoặc cache không khớp
+    hash weights / imgsz / batch)
+    INT8 cần calibration_data: file dataset .yaml trỏ tới ảnh calibrate
+
+    Returns:
+        đường dẫn file/thư mục model đã export
+    """
+    artifact_path = get_artifact_path(weights_path, backend, precision, imgsz, batch)
+    if backend == "pytorch":
+        return artifact_path
+
+    meta = {
+        'weights': os.path.basename(weights_path),
+        'weights_sha256': get_weights_hash(weights_path),
+        'backend': backend,
+        'precision': precision,
+        'imgsz': imgsz,
+        'batch': None if backend in ("onnx", "openvino") else batch,
+    }
+    if os.path.exists(artifact_path):
+        if read_artifact_meta(artifact_path) == meta:
+            return artifact_path
+        print(f"[BACKEND] ⚠ {os.path.basename(artifact_path)} không khớp weights / imgsz / batch → export lại")
+        remove_artifact(artifact_path)
+
+    from ultralytics import YOLO
+
+    print(f"[BACKEND] Đang export {os.path.basename(weights_path)} → {backend} ({precision})...")
+    export_args = {
+        'format': backend,
+        'imgsz': imgsz,
+        # ONNX fp16 cần GPU lúc export; OpenVINO fp16 export được trên CPU
+        'half': precision == "fp16" and (backend == "openvino" or not is_cpu(device)),
+        'device': "cpu" if backend == "openvino" else device,
+    }
+    if precision == "int8":
+        if not calibration_data or not os.path.exists(calibration_data):
+            raise FileNotFoundError(
+                f"Thiếu dữ liệu calibrate INT8: {calibration_data} "
+                "(chạy: python tools/quantize_model.py)")
+        export_args['int8'] = True
+        export_args['data'] = calibration_data
+    if backend in ("onnx", "openvino"):
+        # Batch động để chạy được cả 1 frame lẫn batch nhiều camera
+        export_args['dynamic'] = True
+    else:
+        export_args['batch'] = batch
+
+    exported = YOLO(weights_path).export(**export_args)
+
+    # Ultralytics luôn export ra tên mặc định → đổi tên theo precision / imgsz / batch
+    if os.path.abspath(str(exported)) != os.path.abspath(artifact_path):
+        shutil.move(str(exported), artifact_path)
+    with open(f"{artifact_path}.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"[BACKEND] ✅ Đã lưu: {artifact_path}")
+    return artifact_path
+
+
+class InferenceBackend:
+    """Model YOLO đã chọn backend/device/precision, gọi giống YOLO(model_path)"""
+    def __init__(self, weights_path, backend="pytorch", device="auto", precision="fp16",
+                 imgsz=640, batch=1, calibration_data=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend không hợp lệ: {backend} (chọn {BACKENDS})")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Precision không hợp lệ: {precision} (chọn {PRECISIONS})")
+        if precision == "int8" and backend not in INT8_BACKENDS:
+            raise ValueError(f"INT8 chỉ hỗ trợ backend {INT8_BACKENDS}, không hỗ trợ {backend}")
+
+        from ultralytics import YOLO
+
+        self.backend = backend
+        self.device = resolve_device(device)
+        self.precision = precision
+
+        # Chỉ OpenVINO export / chạy được fp16 trên CPU; PyTorch / TorchScript / ONNX trên CPU
+        # luôn là fp32 → đặt lại precision trước khi tạo tên file và báo cáo benchmark
+        if precision == "fp16" and backend != "openvino" and is_cpu(self.device):
+            print(f"[BACKEND] ⚠ CPU không hỗ trợ fp16 cho {backend} → dùng fp32")
+            self.precision = "fp32"
+
+        self.artifact_path = export_model(weights_path, backend, self.precision, self.device,
+                                          imgsz=imgsz, batch=batch,
+                                          calibration_data=calibration_data)
+        self.model = YOLO(self.artifact_path, task='detect')
+
+        # Tham số half chỉ có tác dụng với PyTorch (model export đã cố định precision)
+        self.half = backend == "pytorch" and self.precision == "fp16"
+        print(f"[BACKEND] {backend} | device={self.device} | {self.precision} | {self.artifact_path}")
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault('device', self.device)
+        kwargs.setdefault('half', self.half)
+        return self.model(source, **kwargs)
+
+
+def load_inference_backend(weights_path, inference_config, imgsz=640, batch=1):
+    """Tạo InferenceBackend từ mục "inference" trong detection_config.json"""
+    calibration_data = inference_config.get("calibration_data")
+    if calibration_data and not os.path.isabs(calibration_data):
+        calibration_data = os.path.join(script_dir, calibration_data)
+
+    return InferenceBackend(
+        weights_path,
+        backend=inference_config.get("backend", "pytorch"),
+        device=inference_config.get("device", "auto"),
+        precision=inference_config.get("precision", "fp16"),
+        imgsz=imgsz,
+        batch=batch,
+        calibration_data=calibration_data,
+    )
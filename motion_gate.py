@@ -0,0 +1,96 @@
+"""
+Motion Gate
+- Phát hiện chuyển động rẻ trên ảnh xám thu nhỏ (so với nền trung bình trượt hoặc MOG2)
+- Chỉ xét chuyển động bên trong các vùng làm việc đã chiếu lên ảnh (+ lề)
+- Chạy trong thread camera → thread detection bỏ qua YOLO khi cảnh tĩnh
+"""
+
+import cv2
+import numpy as np
+
+METHOD_DIFF = "diff"
+METHOD_MOG2 = "mog2"
+
+
+class MotionGate:
+    """Trả về True khi có chuyển động trong vùng giám sát"""
+    def __init__(self, zone_polygons, method=METHOD_DIFF, scale_width=160, diff_threshold=25,
+                 min_motion_ratio=0.002, zone_margin_px=20, background_alpha=0.05):
+        """
+        Args:
+            zone_polygons: list đa giác vùng làm việc trên ảnh gốc (pixel), mỗi đa giác Nx2
+            scale_width: chiều rộng ảnh thu nhỏ để tính chuyển động
+            diff_threshold: ngưỡng chênh lệch mức xám (0-255) coi là thay đổi
+            min_motion_ratio: tỉ lệ pixel thay đổi tối thiểu trong vùng để coi là có chuyển động
+            zone_margin_px: nới rộng vùng giám sát (pixel ảnh gốc)
+            background_alpha: tốc độ cập nhật nền trung bình (method "diff")
+        """
+        if method not in (METHOD_DIFF, METHOD_MOG2):
+            raise ValueError(f"Method không hợp lệ: {method}")
+
+        self.zone_polygons = [np.asarray(polygon, dtype=np.float64).reshape(-1, 2) for polygon in zone_polygons]
+        self.method = method
+        self.scale_width = scale_width
+        self.diff_threshold = diff_threshold
+        self.min_motion_ratio = min_motion_ratio
+        self.zone_margin_px = zone_margin_px
+        self.background_alpha = background_alpha
+
+        self.mask = None
+        self.mask_area = 0
+        self.scale = 1.0
+        self.background = None
+        self.bg_subtractor = None
+        if method == METHOD_MOG2:
+            self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=200, varThreshold=16, detectShadows=False)
+
+    def _build_mask(self, frame_shape):
+        """Tạo mask vùng giám sát trên ảnh thu nhỏ (tính 1 lần theo kích thước frame)"""
+        height, width = frame_shape[:2]
+        self.scale = min(1.0, self.scale_width / float(width))
+        small_size = (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+
+        mask = np.zeros((small_size[1], small_size[0]), dtype=np.uint8)
+        polygons = [np.round(polygon * self.scale).astype(np.int32) for polygon in self.zone_polygons]
+        cv2.fillPoly(mask, polygons, 255)
+
+        margin = int(round(self.zone_margin_px * self.scale))
+        if margin > 0:
+            kernel = np.ones((2 * margin + 1, 2 * margin + 1), dtype=np.uint8)
+            mask = cv2.dilate(mask, kernel)
+
+        self.mask = mask
+        self.mask_area = int(np.count_nonzero(mask))
+        self.small_size = small_size
+
+    def update(self, frame):
+        """
+        Đưa frame mới vào gate
+
+        Returns:
+            True nếu có chuyển động trong vùng (hoặc chưa đủ dữ liệu để kết luận)
+        """
+        if self.mask is None:
+            self._build_mask(frame.shape)
+        if self.mask_area == 0:
+            # Vùng BIM không nằm trong khung hình → không lọc được, luôn detect
+            return True
+
+        small = cv2.resize(frame, self.small_size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self.method == METHOD_MOG2:
+            changed = self.bg_subtractor.apply(gray)
+        else:
+            # So với nền trung bình trượt → bắt được cả vật di chuyển chậm
+            if self.background is None:
+                self.background = gray.astype(np.float32)
+                return True
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+            cv2.accumulateWeighted(gray, self.background, self.background_alpha)
+            _, changed = cv2.threshold(diff, self.diff_threshold, 255, cv2.THRESH_BINARY)
+
+        changed_in_zone = cv2.countNonZero(cv2.bitwise_and(changed, self.mask))
+        return changed_in_zone >= self.min_motion_ratio * self.mask_area
@@ -0,0 +1,327 @@
+"""
+Persistence Stage
+- Thread riêng + hàng đợi giới hạn nhận snapshot (có timestamp) từ vòng hiển thị
+- Dựng dòng position_history / temp_data / log CSV ngoài vòng hiển thị
+  → I/O chậm không làm đứng preview hay trễ kết quả tiếp theo của result_queue
+- Khi hàng đợi đầy (back-pressure), chính sách rõ ràng:
+    "merge" (mặc định): gộp vào snapshot cùng loại mới nhất đang chờ
+        - detections: nối danh sách detection (lịch sử không mất dòng)
+        - objects: snapshot mới thay snapshot cũ (temp_data chỉ cần vị trí mới nhất)
+      không gộp được thì bỏ snapshot cũ nhất
+    "drop_oldest": bỏ snapshot cũ nhất
+    "drop_newest": bỏ snapshot mới
+- Thống kê: độ sâu hàng đợi (hiện tại / lớn nhất), số snapshot gộp / bỏ, độ trễ ghi
+- PersistScheduler: nhịp ghi theo đồng hồ thực (mỗi interval_ms, hoặc sớm hơn khi đối tượng
+  di chuyển > min_delta trong hệ BIM), không phụ thuộc tốc độ GPU / số vòng lặp hiển thị
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+SNAPSHOT_DETECTIONS = "detections"
+SNAPSHOT_OBJECTS = "objects"
+
+POLICY_MERGE = "merge"
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DROP_NEWEST = "drop_newest"
+POLICIES = (POLICY_MERGE, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST)
+
+
+class PersistenceThread(threading.Thread):
+    """Ghi snapshot detection ra database (DatabaseWriter) và log CSV (RotatingCsvWriter)"""
+    def __init__(self, db_writer, csv_log, person_ids, status_names=None, queue_size=100, policy=POLICY_MERGE,
+                 max_merged_detections=2000, stats_interval_s=30, on_saved=None, record_history=True,
+                 run_id=None):
+        """
+        Args:
+            person_ids: label_lower -> person_ID trong temp_data
+            run_id: id lần chạy ghi vào position_history (object_id / track_id đánh lại từ 1 mỗi lần chạy)
+            status_names: trạng thái vùng -> chữ trong cột Status của log CSV
+            max_merged_detections: 1 snapshot detections gộp tối đa bao nhiêu detection
+            on_saved: hàm (số tọa độ) gọi sau khi đưa temp_data vào hàng đợi database
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Chính sách hàng đợi không hợp lệ: {policy}")
+        super().__init__(name="PersistenceThread")
+        self.db_writer = db_writer
+        self.csv_log = csv_log
+        self.person_ids = person_ids
+        self.status_names = status_names or {}
+        self.queue_size = max(1, int(queue_size))
+        self.policy = policy
+        self.max_merged_detections = max_merged_detections
+        self.stats_interval_s = stats_interval_s
+        self.on_saved = on_saved
+        self.record_history = record_history
+        self.run_id = run_id
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._running = True
+        self.last_stats_time = time.time()
+        self.stats = {'submitted': 0, 'persisted': 0, 'merged': 0, 'dropped': 0, 'errors': 0,
+                      'max_depth': 0, 'max_lag_ms': 0.0}
+        self.daemon = True
+
+    def submit(self, kind, timestamp, objects, camera_id=None, detections=None):
+        """
+        Đưa 1 snapshot vào hàng đợi (không chặn)
+
+        Args:
+            kind: "detections" (1 kết quả của 1 camera → position_history)
+                  hoặc "objects" (đối tượng đã gộp → temp_data + log CSV)
+            timestamp: thời điểm snapshot (epoch giây)
+            objects: list đối tượng đã gộp (dict có 'object_id', 'track_ids', 'state', ...)
+        Returns:
+            False nếu snapshot mới bị bỏ
+        """
+        snapshot = {'kind': kind, 'timestamp': timestamp, 'camera_id': camera_id,
+                    'objects': objects, 'detections': list(detections or [])}
+        with self._cond:
+            self.stats['submitted'] += 1
+            if len(self._queue) >= self.queue_size:
+                if self.policy == POLICY_DROP_NEWEST:
+                    self.stats['dropped'] += 1
+                    return False
+                if self.policy == POLICY_MERGE and self._merge(snapshot):
+                    self.stats['merged'] += 1
+                    return True
+                self._queue.popleft()
+                self.stats['dropped'] += 1
+            self._queue.append(snapshot)
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self._queue))
+            self._cond.notify()
+            return True
+
+    def _merge(self, snapshot):
+        """Gộp snapshot vào snapshot cùng loại mới nhất trong hàng đợi (gọi khi đang giữ _cond)"""
+        for queued in reversed(self._queue):
+            if queued['kind'] != snapshot['kind']:
+                continue
+            if snapshot['kind'] == SNAPSHOT_OBJECTS:
+                queued.update(snapshot)
+                return True
+            if queued['camera_id'] != snapshot['camera_id']:
+                continue
+            if len(queued['detections']) + len(snapshot['detections']) > self.max_merged_detections:
+                return False
+            queued['detections'].extend(snapshot['detections'])
+            # Đối tượng mới nhất dùng để tra object_id / trạng thái; giữ cả track cũ đã biến mất
+            merged_objects = {obj['object_id']: obj for obj in queued['objects']}
+            merged_objects.update((obj['object_id'], obj) for obj in snapshot['objects'])
+            queued['objects'] = list(merged_objects.values())
+            queued['timestamp'] = snapshot['timestamp']
+            return True
+        return False
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running, timeout=1.0)
+                if not self._queue:
+                    if not self._running:
+                        break
+                    snapshot = None
+                else:
+                    snapshot = self._queue.popleft()
+                    self._busy = True
+
+            if snapshot is not None:
+                try:
+                    if snapshot['kind'] == SNAPSHOT_DETECTIONS:
+                        self._persist_detections(snapshot)
+                    else:
+                        self._persist_objects(snapshot)
+                    self.stats['persisted'] += 1
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    print(f"[ERROR] Persistence: {e}")
+                lag_ms = (time.time() - snapshot['timestamp']) * 1000.0
+                self.stats['max_lag_ms'] = max(self.stats['max_lag_ms'], lag_ms)
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+            self.log_stats()
+
+    def _persist_detections(self, snapshot):
+        """Mỗi detection 1 dòng position_history (vòng hiển thị chỉ gửi detection thật sự được YOLO / tracker tạo ra)"""
+        if not self.record_history or not snapshot['detections']:
+            return
+        camera_id = snapshot['camera_id']
+        objects_of_track = {}
+        for obj in snapshot['objects']:
+            track_id = obj['track_ids'].get(camera_id)
+            if track_id is not None:
+                objects_of_track[track_id] = obj
+
+        rows = []
+        for det in snapshot['detections']:
+            track_id = det.get('track_id')
+            obj = objects_of_track.get(track_id) if track_id is not None else None
+            rows.append({
+                'ts': det['timestamp'],
+                'run_id': self.run_id,
+                'camera_id': str(camera_id),
+                'track_id': track_id,
+                'object_id': obj['object_id'] if obj else None,
+                'person_ID': self.person_ids.get(det['label'].lower()),
+                'label': det['label'],
+                'x': det['bim'][0],
+                'y': det['bim'][1],
+                'confidence': det.get('confidence'),
+                'state': obj.get('state') if obj else None,
+            })
+        self.db_writer.write_history(rows)
+
+    def _persist_objects(self, snapshot):
+        """temp_data (1 dòng / person_ID, đối tượng confidence cao nhất) + log CSV"""
+        timestamp = datetime.fromtimestamp(snapshot['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
+        best_by_person = {}
+        log_rows = []
+        for obj in snapshot['objects']:
+            tx, ty = obj['bim']
+            confidence = obj['confidence']
+            person_id = self.person_ids.get(obj['label'].lower())
+            if person_id is not None:
+                best = best_by_person.get(person_id)
+                if best is None or confidence > best[0]:
+                    best_by_person[person_id] = (confidence, tx, ty)
+
+            log_rows.append({
+                'Timestamp': timestamp,
+                'Camera': "+".join(str(cid) for cid in obj['cameras']),
+                'Object_ID': obj['object_id'],
+                'Label': obj['label'],
+                'Confidence': confidence,
+                'BIM_X': tx,
+                'BIM_Y': ty,
+                'Status': self.status_names.get(obj.get('state'), 'TRONG' if obj['inside_bim'] else 'NGOAI'),
+            })
+
+        coords_to_save = [(tx, ty, person_id) for person_id, (_, tx, ty) in best_by_person.items()]
+        if coords_to_save:
+            if self.db_writer.write_temp(coords_to_save):
+                if self.on_saved is not None:
+                    self.on_saved(len(coords_to_save))
+            else:
+                print("[WARN] Hàng đợi ghi database đầy, bỏ lần ghi này")
+
+        if log_rows:
+            self.csv_log.write(log_rows)
+
+    def depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    def log_stats(self, force=False):
+        """In thống kê hàng đợi mỗi stats_interval_s giây"""
+        now = time.time()
+        if not force and (not self.stats_interval_s or now - self.last_stats_time < self.stats_interval_s):
+            return
+        self.last_stats_time = now
+        st = self.stats
+        print(f"[STATS] Persistence: chờ={self.depth()}/{self.queue_size} (max {st['max_depth']}) | "
+              f"nhận={st['submitted']} ghi={st['persisted']} gộp={st['merged']} bỏ={st['dropped']} "
+              f"lỗi={st['errors']} | trễ max={st['max_lag_ms']:.0f} ms | chính sách={self.policy}")
+
+    def flush(self, timeout=None):
+        """Chờ xử lý xong mọi snapshot đang chờ"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def close(self, timeout=5.0):
+        """Xử lý nốt hàng đợi rồi dừng thread"""
+        self.flush(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self.join(timeout)
+        self.log_stats(force=True)
+
+
+class PersistScheduler:
+    """Quyết định khi nào ghi vị trí: theo thời gian thực hoặc khi di chuyển đáng kể"""
+    def __init__(self, interval_ms=500, min_delta=0.5, min_gap_ms=100, stats_interval_s=30, rate_window_s=60.0):
+        """
+        Args:
+            interval_ms: ghi ít nhất mỗi interval_ms (0 = chỉ ghi khi di chuyển)
+            min_delta: ghi sớm khi 1 đối tượng di chuyển hơn min_delta (đơn vị BIM) so với lần ghi trước
+                       (0 = tắt, chỉ ghi theo interval_ms)
+            min_gap_ms: khoảng cách tối thiểu giữa 2 lần ghi (giới hạn tải database khi di chuyển nhanh)
+            rate_window_s: cửa sổ tính tần suất ghi thực tế
+        """
+        self.interval_s = interval_ms / 1000.0
+        self.min_delta = min_delta
+        self.min_gap_s = min_gap_ms / 1000.0
+        self.stats_interval_s = stats_interval_s
+        self.rate_window_s = rate_window_s
+        self.last_save_time = None
+        self.saved_positions = {}
+        self.save_times = deque()
+        self.counts = {'interval': 0, 'movement': 0, 'checks': 0}
+        self.last_stats_time = time.time()
+
+    def _moved(self, positions):
+        if not self.min_delta:
+            return False
+        for key, (x, y) in positions.items():
+            saved = self.saved_positions.get(key)
+            if saved is None or math.hypot(x - saved[0], y - saved[1]) > self.min_delta:
+                return True
+        return False
+
+    def due(self, positions, now=None):
+        """
+        Có cần ghi ở thời điểm now không; nếu có thì ghi nhận như đã ghi
+        - Không có đối tượng nào thì không ghi (không tính vào nhịp ghi)
+
+        Args:
+            positions: dict khóa đối tượng (object_id / person_ID) -> (x, y) BIM
+        Returns:
+            lý do ("interval" / "movement") hoặc None
+        """
+        now = time.time() if now is None else now
+        self.counts['checks'] += 1
+        if not positions:
+            return None
+        elapsed = None if self.last_save_time is None else now - self.last_save_time
+        if elapsed is not None and elapsed < self.min_gap_s:
+            return None
+
+        if elapsed is None or (self.interval_s and elapsed >= self.interval_s):
+            reason = "interval"
+        elif self._moved(positions):
+            reason = "movement"
+        else:
+            return None
+
+        self.last_save_time = now
+        self.saved_positions = dict(positions)
+        self.counts[reason] += 1
+        self.save_times.append(now)
+        return reason
+
+    def rate_hz(self, now=None):
+        """Tần suất ghi thực tế trong rate_window_s giây gần nhất"""
+        now = time.time() if now is None else now
+        while self.save_times and now - self.save_times[0] > self.rate_window_s:
+            self.save_times.popleft()
+        if not self.save_times:
+            return 0.0
+        window = min(self.rate_window_s, max(now - self.save_times[0], self.interval_s or self.min_gap_s, 1e-3))
+        return len(self.save_times) / window
+
+    def log_stats(self, now=None, force=False):
+        """In tần suất ghi thực tế mỗi stats_interval_s giây"""
+        now = time.time() if now is None else now
+        if not force and (not self.stats_interval_s or now - self.last_stats_time < self.stats_interval_s):
+            return
+        self.last_stats_time = now
+        target = f"{1.0 / self.interval_s:.2f} Hz" if self.interval_s else "chỉ khi di chuyển"
+        print(f"[STATS] Nhịp ghi: {self.rate_hz(now):.2f} Hz (đặt: {target}, di chuyển > {self.min_delta}) | "
+              f"theo thời gian={self.counts['interval']} theo di chuyển={self.counts['movement']}")
@@ -0,0 +1,168 @@
+"""
+Máy trạng thái TRONG / SẮP RA / NGOÀI vùng cho từng đối tượng
+- Trễ (hysteresis) theo đơn vị BIM: chỉ coi là VÀO khi đã vào sâu enter_margin,
+  chỉ coi là RA khi đã ra xa exit_margin → điểm rung quanh biên không làm đổi trạng thái
+- Thời gian giữ (dwell): trạng thái mới phải giữ liên tục đủ lâu mới được xác nhận,
+  kể cả trạng thái đầu tiên của đối tượng mới xuất hiện
+- Theo dõi theo object_id (đối tượng đã gộp), không theo label
+- Chỉ sinh sự kiện khi trạng thái đã xác nhận thay đổi → ít lệnh đèn, ít cảnh báo giả
+"""
+
+import numpy as np
+
+STATE_INSIDE = "INSIDE"
+STATE_WARNING = "WARNING"
+STATE_OUTSIDE = "OUTSIDE"
+
+# 8 hướng quanh điểm để kiểm tra lề (điểm + 8 điểm cách lề đều phải cùng phía)
+_DIRECTIONS = np.array([(np.cos(a), np.sin(a)) for a in np.linspace(0, 2 * np.pi, 8, endpoint=False)])
+
+
+class ObjectRegionState:
+    """Trạng thái đã xác nhận (None = chưa xác nhận lần nào) + trạng thái đang chờ xác nhận của 1 đối tượng"""
+    def __init__(self, object_id, label, state, timestamp):
+        self.object_id = object_id
+        self.label = label
+        self.state = state
+        self.since = timestamp
+        self.candidate = None
+        self.candidate_since = None
+        self.last_seen = timestamp
+
+
+class RegionStateMachine:
+    """Xác nhận chuyển trạng thái vùng của từng đối tượng (hysteresis + dwell)"""
+    def __init__(self, inside_fn, enter_margin=0.3, exit_margin=0.3, enter_dwell_s=0.5, exit_dwell_s=0.3,
+                 warning_dwell_s=0.0, forget_after_s=3.0):
+        """
+        Args:
+            inside_fn: hàm (mảng Nx2 tọa độ BIM, list N label) -> mảng bool N, vd: ZoneIndex.inside_mask
+            enter_margin / exit_margin: khoảng cách BIM phải vào sâu / ra xa khỏi biên để đổi trạng thái
+            enter_dwell_s / exit_dwell_s: thời gian giữ tối thiểu trước khi xác nhận VÀO / RA
+            warning_dwell_s: thời gian giữ tối thiểu của cảnh báo sắp ra (0 = báo ngay)
+            forget_after_s: đối tượng không còn xuất hiện quá thời gian này thì bị xóa
+        """
+        self.inside_fn = inside_fn
+        self.enter_margin = enter_margin
+        self.exit_margin = exit_margin
+        self.enter_dwell_s = enter_dwell_s
+        self.exit_dwell_s = exit_dwell_s
+        self.warning_dwell_s = warning_dwell_s
+        self.forget_after_s = forget_after_s
+        # object_id -> ObjectRegionState
+        self.objects = {}
+        self.stats = {'updates': 0, 'transitions': 0, 'suppressed': 0}
+
+    def classify(self, points, labels=None):
+        """
+        Phân loại có lề (labels: label từng điểm, vùng chỉ áp dụng cho 1 số label được xét theo label)
+
+        Returns:
+            (chắc chắn trong vùng, chắc chắn ngoài vùng) - 2 mảng bool N; cả 2 False = đang ở dải biên
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+        if labels is not None:
+            labels = list(labels)
+            probe_labels = [label for label in labels for _ in range(len(_DIRECTIONS))]
+        else:
+            probe_labels = None
+        center = np.asarray(self.inside_fn(points, labels), dtype=bool)
+
+        definitely_inside = center.copy()
+        if self.enter_margin > 0:
+            probes = (points[:, None, :] + _DIRECTIONS[None, :, :] * self.enter_margin).reshape(-1, 2)
+            definitely_inside &= np.asarray(self.inside_fn(probes, probe_labels), dtype=bool).reshape(len(points), -1).all(axis=1)
+
+        definitely_outside = ~center
+        if self.exit_margin > 0:
+            probes = (points[:, None, :] + _DIRECTIONS[None, :, :] * self.exit_margin).reshape(-1, 2)
+            definitely_outside &= ~np.asarray(self.inside_fn(probes, probe_labels),
+                                             dtype=bool).reshape(len(points), -1).any(axis=1)
+        return definitely_inside, definitely_outside
+
+    def _dwell_for(self, current, state):
+        if state == STATE_OUTSIDE:
+            return self.exit_dwell_s
+        if state == STATE_INSIDE or current in (STATE_OUTSIDE, None):
+            # Từ NGOÀI quay vào / đối tượng mới (kể cả đang bị cảnh báo) luôn phải giữ đủ enter_dwell_s
+            return self.enter_dwell_s
+        return self.warning_dwell_s
+
+    def update(self, objects, timestamp, warning_ids=()):
+        """
+        Đưa danh sách đối tượng đã gộp mới nhất vào máy trạng thái
+
+        Args:
+            objects: list dict có 'object_id', 'label', 'bim' (và 'inside_bim' nếu có)
+            timestamp: thời điểm quan sát
+            warning_ids: object_id đang được dự đoán sắp ra khỏi vùng
+        Returns:
+            list chuyển trạng thái dict: object_id, label, state, prev_state (None = trạng thái đầu tiên
+            của đối tượng mới, đã qua dwell; state None = đối tượng đã xác nhận bị xóa), bim
+        """
+        self.stats['updates'] += 1
+        transitions = []
+        definitely_inside, definitely_outside = self.classify([obj['bim'] for obj in objects],
+                                                              [obj['label'] for obj in objects])
+
+        for obj, is_in, is_out in zip(objects, definitely_inside.tolist(), definitely_outside.tolist()):
+            # An toàn: 1 camera thấy ở ngoài thì không được xác nhận là trong vùng
+            is_in = is_in and obj.get('inside_bim', True)
+            if is_out:
+                observed = STATE_OUTSIDE
+            elif is_in:
+                observed = STATE_WARNING if obj['object_id'] in warning_ids else STATE_INSIDE
+            else:
+                observed = None  # Dải biên: giữ trạng thái hiện tại
+
+            entry = self.objects.get(obj['object_id'])
+            if entry is None:
+                entry = ObjectRegionState(obj['object_id'], obj['label'], None, timestamp)
+                self.objects[obj['object_id']] = entry
+            if entry.state is None and observed is None:
+                # Chưa xác nhận lần nào mà đang ở dải biên → ứng viên tính theo tâm (vẫn phải qua dwell)
+                observed = STATE_INSIDE if obj.get('inside_bim', True) else STATE_OUTSIDE
+                if observed == STATE_INSIDE and obj['object_id'] in warning_ids:
+                    observed = STATE_WARNING
+
+            entry.last_seen = timestamp
+            if observed is None and entry.state == STATE_WARNING and obj['object_id'] not in warning_ids:
+                # Hết nguy cơ nhưng đang ở dải biên → vẫn được về TRONG
+                observed = STATE_INSIDE
+            if observed is None or observed == entry.state:
+                if entry.candidate is not None:
+                    self.stats['suppressed'] += 1
+                entry.candidate = None
+                continue
+
+            if entry.candidate != observed:
+                entry.candidate = observed
+                entry.candidate_since = timestamp
+            if timestamp - entry.candidate_since >= self._dwell_for(entry.state, observed):
+                prev_state = entry.state
+                entry.state = observed
+                entry.since = timestamp
+                entry.candidate = None
+                transitions.append(self._transition(entry, prev_state, obj['bim']))
+
+        # Quên đối tượng đã biến mất (đối tượng chưa xác nhận thì chưa từng có tín hiệu → xóa im lặng)
+        for object_id in [oid for oid, entry in self.objects.items()
+                          if timestamp - entry.last_seen > self.forget_after_s]:
+            entry = self.objects.pop(object_id)
+            if entry.state is not None:
+                transitions.append({'object_id': object_id, 'label': entry.label, 'state': None,
+                                    'prev_state': entry.state, 'bim': None})
+
+        return transitions
+
+    def _transition(self, entry, prev_state, bim):
+        self.stats['transitions'] += 1
+        return {'object_id': entry.object_id, 'label': entry.label, 'state': entry.state,
+                'prev_state': prev_state, 'bim': bim}
+
+    def state_of(self, object_id):
+        """Trạng thái đã xác nhận của đối tượng (None nếu chưa theo dõi)"""
+        entry = self.objects.get(object_id)
+        return entry.state if entry is not None else None
@@ -1,9 +1,11 @@
 import os
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from config.chuyendoitoado import get_projection_matrix
-from db_manage import create_temp_table, add_many_temp
+from db_manage import start_database_writer
+from persistence import PersistScheduler
+from detection_config import load_detection_config
+from inference_backend import load_inference_backend
 
 # Tự động chuyển đến thư mục script để tránh lỗi đường dẫn
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -42,11 +44,14 @@ def get_bim_bounds():
 
 
 def main():
-    model_path = os.path.join(script_dir, "models", "best.pt")
-    model = YOLO(model_path)
+    # Load model (backend/device/precision theo config/detection_config.json)
+    detection_config = load_detection_config()
+    inference_config = detection_config.get("inference", {})
+    model_path = os.path.join(script_dir, inference_config.get("weights", os.path.join("models", "best.pt")))
+    model = load_inference_backend(model_path, inference_config)
     
-    # Khởi tạo database
-    create_temp_table(DB_PATH)
+    # Khởi tạo database: 1 kết nối WAL duy nhất trên thread ghi riêng
+    db_writer = start_database_writer(DB_PATH)
     print(f"[INFO] Database: {DB_PATH}")
     
     # Load projection matrix (homography) to convert pixel -> project coordinates
@@ -71,9 +76,12 @@ def main():
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
     
-    # Counter để giới hạn tần suất ghi database
-    frame_count = 0
-    SAVE_INTERVAL = 10  # Ghi database mỗi 10 frame
+    # Nhịp ghi database theo đồng hồ thực (hoặc khi dog di chuyển đáng kể), không theo số frame
+    persist_config = detection_config.get("persist", {})
+    persist_scheduler = PersistScheduler(interval_ms=persist_config.get("interval_ms", 500),
+                                         min_delta=persist_config.get("min_delta", 0.5),
+                                         min_gap_ms=persist_config.get("min_gap_ms", 100),
+                                         stats_interval_s=detection_config.get("stats_interval_s", 30))
 
     print(f"🎥 Đã kết nối camera {IP2}. Bắt đầu detect... Nhấn ESC để thoát.")
 
@@ -83,10 +91,8 @@ def main():
             print("❌ Không đọc được khung hình từ camera")
             break
 
-        frame_count += 1
-        
         # Dự đoán
-        results = model(frame, device=0, conf=0.3, imgsz=640, half=True, verbose=False)
+        results = model(frame, conf=0.3, imgsz=640, verbose=False)
         
         # Danh sách tọa độ để ghi vào database
         coords_to_save = []
@@ -155,15 +161,16 @@ def main():
                 cv2.putText(frame, text_bim, (x1, y2 + 20),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 2)
         
-        # Ghi tọa độ vào database mỗi SAVE_INTERVAL frame
-        if coords_to_save and frame_count % SAVE_INTERVAL == 0:
+        # Ghi tọa độ vào database theo nhịp thời gian thực
+        if coords_to_save and persist_scheduler.due({pid: (tx, ty) for tx, ty, pid in coords_to_save}):
             try:
-                add_many_temp(DB_PATH, coords_to_save)
+                db_writer.write_temp(coords_to_save)
                 tx, ty, pid = coords_to_save[0]
                 print(f"💾 DB: dog (ID=1): ({tx:.1f}, {ty:.1f})")
             except Exception as e:
                 print(f"⚠️ Lỗi ghi database: {e}")
 
+        persist_scheduler.log_stats()
         cv2.imshow("YOLOv8 Live Detection", frame)
 
         # ESC để thoát
@@ -172,6 +179,7 @@ def main():
 
     cap.release()
     cv2.destroyAllWindows()
+    db_writer.close()
     print("👋 Đã thoát.")
 
 
@@ -11,21 +11,31 @@ import os
 import cv2
 import numpy as np
 import threading
-from queue import Queue
-from ultralytics import YOLO
+import time
+from queue import Queue, Empty
 from datetime import datetime
-import pandas as pd
 
 # Tự động chuyển đến thư mục script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 os.chdir(script_dir)
 
-from config.chuyendoitoado import get_projection_matrix
-from config.chuyendoitoado_cam2 import get_projection_matrix_cam2
-from db_manage import create_temp_table, add_many_temp
+from bim_filter import BimTrajectoryFilter
+from config.bim_transform import load_camera_transforms, pixel_to_bim, transform_points
+from db_manage import start_database_writer, new_run_id
+from detection_log import RotatingCsvWriter
+from persistence import PersistenceThread, PersistScheduler, SNAPSHOT_DETECTIONS, SNAPSHOT_OBJECTS
+from detection_config import load_detection_config, get_camera_config
+from frame_scheduler import FrameScheduler
+from fusion import CrossCameraFusion
+from inference_backend import load_inference_backend
+from motion_gate import MotionGate
+from region_state import RegionStateMachine, STATE_INSIDE, STATE_WARNING, STATE_OUTSIDE
+from tracker import IoUTracker
+from zones import load_zones, ZoneTracker
 from signal_output import (
-    signal_inside, signal_outside, signal_ready, signal_stop, signal_db_saved, 
-    get_outside_direction, init_modbus, close_modbus
+    signal_inside, signal_outside, signal_exit_warning, signal_zone_event, signal_object_lost,
+    signal_ready, signal_stop, signal_db_saved, init_modbus_async, close_modbus,
+    get_modbus_health, print_modbus_health, light_cycle, get_signal_bus, close_signal_bus, acknowledge_alarm
 )
 
 # Database path
@@ -43,9 +53,18 @@ CAMERA_URL_1 = f"rtsp://{USER}:{PASS}@{IP1}:554/cam/realmonitor?channel=1&subtyp
 IP2 = "192.168.66.14"
 CAMERA_URL_2 = f"rtsp://{USER}:{PASS}@{IP2}:554/cam/realmonitor?channel=1&subtype=1"
 
-# Queues để lưu frame và kết quả detection
-frame_queue_1 = Queue(maxsize=2)
-frame_queue_2 = Queue(maxsize=2)
+# Label → person_ID trong bảng temp_data (0 = songoku, 1 = dog)
+LABEL_PERSON_IDS = {"songoku": 0, "dog": 1}
+
+# Trạng thái vùng đã xác nhận → cột Status trong log CSV
+REGION_STATUS = {STATE_INSIDE: "TRONG", STATE_WARNING: "SAP_RA", STATE_OUTSIDE: "NGOAI"}
+
+# Nguồn của detection gửi sang thread hiển thị
+SOURCE_INFERRED = "inferred"  # YOLO chạy trên frame này
+SOURCE_TRACKED = "tracked"    # Track được đẩy theo vận tốc (frame giữa 2 lần YOLO)
+SOURCE_REUSED = "reused"      # Frame tĩnh (motion gate), dùng lại detection cũ
+
+# Queue kết quả detection (frame được giữ trong FrameScheduler)
 result_queue = Queue(maxsize=10)
 
 # Event để dừng các thread
@@ -54,11 +73,15 @@ stop_event = threading.Event()
 
 class CameraThread(threading.Thread):
     """Thread để capture frame từ camera"""
-    def __init__(self, camera_id, camera_url, frame_queue):
+    def __init__(self, camera_id, camera_url, scheduler, motion_gate=None):
         super().__init__()
         self.camera_id = camera_id
         self.camera_url = camera_url
-        self.frame_queue = frame_queue
+        self.scheduler = scheduler
+        # Motion gate chạy ngay trong thread camera (None = luôn detect)
+        self.motion_gate = motion_gate
+        # Thời điểm (perf_counter) nhận frame đầu tiên, để đo thời gian khởi động
+        self.first_frame_time = None
         self.daemon = True
         
     def run(self):
@@ -77,13 +100,15 @@ class CameraThread(threading.Thread):
                 print(f"[ERROR] Mất kết nối Camera {self.camera_id}")
                 break
             
-            # Bỏ frame cũ nếu queue đầy
-            if self.frame_queue.full():
-                try:
-                    self.frame_queue.get_nowait()
-                except:
-                    pass
-            self.frame_queue.put((self.camera_id, frame))
+            if self.first_frame_time is None:
+                self.first_frame_time = time.perf_counter()
+            
+            motion = True
+            if self.motion_gate is not None:
+                motion = self.motion_gate.update(frame)
+            
+            # Frame cũ chưa xử lý sẽ bị thay thế bởi frame mới
+            self.scheduler.put(self.camera_id, frame, time.time(), motion)
         
         cap.release()
         print(f"[INFO] Camera {self.camera_id} đã ngắt kết nối")
@@ -91,117 +116,426 @@ class CameraThread(threading.Thread):
 
 class DetectionThread(threading.Thread):
     """Thread để detect object từ frame"""
-    def __init__(self, model, proj_matrix_1, proj_matrix_2, bim_bounds):
+    def __init__(self, model, bim_matrices, zone_index, zone_polygons, scheduler, detection_config):
         super().__init__()
         self.model = model
-        self.proj_matrix_1 = proj_matrix_1
-        self.proj_matrix_2 = proj_matrix_2
-        self.bim_bounds = bim_bounds
+        self.scheduler = scheduler
+        # Ma trận hiệu dụng Pixel → BIM của từng camera (đã gộp swap/remap/đảo Y)
+        self.bim_matrices = bim_matrices
+        # Vùng đa giác (zones.py): trong / ngoài vùng, thời điểm và hướng ra
+        self.zone_index = zone_index
+        self.batch_inference = detection_config.get("batch_inference", True)
+        # device/half do InferenceBackend chọn theo config
+        self.predict_kwargs = {
+            'conf': detection_config.get("conf", 0.3),
+            'imgsz': get_inference_imgsz(detection_config),
+            'verbose': False,
+        }
+        # Filter theo camera từ config (đổi sang class ID 1 lần lúc khởi động)
+        # và truyền xuống YOLO qua tham số classes → lọc ngay trong NMS
+        ignored_ids = self.resolve_class_ids(detection_config.get("ignored_labels", []), warn_missing=False)
+        self.allowed_class_ids = {}
+        for camera_id in self.bim_matrices:
+            labels = get_camera_config(detection_config, camera_id).get("allowed_labels", [])
+            class_ids = np.setdiff1d(self.resolve_class_ids(labels), ignored_ids)
+            self.allowed_class_ids[camera_id] = class_ids
+            names = [self.model.names[c] for c in class_ids]
+            print(f"[INFO] CAM{camera_id} detect: {names} (class {class_ids.tolist()})")
+        
+        # Batch chạy chung 1 lần NMS với hợp các class của mọi camera;
+        # camera nào có đúng tập class đó thì không cần lọc lại sau NMS
+        self.batch_class_ids = np.unique(np.concatenate(list(self.allowed_class_ids.values())))
+        self.batch_needs_mask = {
+            camera_id: len(class_ids) != len(self.batch_class_ids)
+            for camera_id, class_ids in self.allowed_class_ids.items()
+        }
+        # Motion gate: frame tĩnh thì dùng lại detection cũ,
+        # nhưng vẫn detect lại sau mỗi keepalive_s giây
+        gate_config = detection_config.get("motion_gate", {})
+        self.motion_gate_enabled = gate_config.get("enabled", False)
+        self.keepalive_s = gate_config.get("keepalive_s", 2.0)
+        self.last_detections = {camera_id: [] for camera_id in self.bim_matrices}
+        self.last_inference_time = {camera_id: 0.0 for camera_id in self.bim_matrices}
+        self.gate_stats = {camera_id: {'inferred': 0, 'skipped': 0, 'tracked': 0}
+                           for camera_id in self.bim_matrices}
+        
+        # Tracker: mỗi camera 1 IoUTracker; YOLO chạy mỗi detect_every frame,
+        # các frame giữa dùng vị trí track được đẩy theo vận tốc
+        tracker_config = detection_config.get("tracker", {})
+        self.trackers = {}
+        self.detect_every = 1
+        if tracker_config.get("enabled", False):
+            self.trackers = {
+                camera_id: IoUTracker(
+                    iou_threshold=tracker_config.get("iou_threshold", 0.3),
+                    max_missed=tracker_config.get("max_missed", 10),
+                    high_conf=tracker_config.get("high_conf", 0.5),
+                    min_hits=tracker_config.get("min_hits", 1),
+                )
+                for camera_id in self.bim_matrices
+            }
+            self.detect_every = max(1, int(tracker_config.get("detect_every", 1)))
+            print(f"[INFO] Tracker: BẬT (YOLO mỗi {self.detect_every} frame)")
+        self.frame_counters = {camera_id: 0 for camera_id in self.bim_matrices}
+        
+        # Kalman filter trong hệ BIM cho từng track + cảnh báo sớm khi sắp ra khỏi vùng
+        filter_config = detection_config.get("bim_filter", {})
+        self.bim_filter = None
+        if filter_config.get("enabled", False):
+            self.bim_filter = BimTrajectoryFilter(
+                process_noise=filter_config.get("process_noise", 1.0),
+                measurement_noise=filter_config.get("measurement_noise", 0.3),
+                max_age_s=filter_config.get("max_age_s", 2.0),
+            )
+        self.exit_warning_s = filter_config.get("exit_warning_s", 1.0)
+        self.min_exit_speed = filter_config.get("min_exit_speed", 0.2)
+        # Thời điểm chụp của frame đang xử lý (từ FrameScheduler)
+        self.frame_timestamps = {}
+        
+        # ROI: chỉ inference trên vùng bao quanh các vùng làm việc (+ lề) thay vì cả frame
+        roi_config = detection_config.get("roi", {})
+        self.roi_enabled = roi_config.get("enabled", False)
+        self.roi_margin = roi_config.get("margin_px", 40)
+        self.zone_polygons = zone_polygons
+        self.roi_rects = {}
+        
+        self.stats_interval = detection_config.get("stats_interval_s", 30)
+        self.last_stats_time = time.monotonic()
         self.daemon = True
         
     def pixel_to_bim(self, px, py, camera_id):
-        """Chuyển pixel sang tọa độ BIM"""
-        if camera_id == 1:
-            matrix = self.proj_matrix_1
-        else:
-            matrix = self.proj_matrix_2
+        """Chuyển pixel sang tọa độ BIM (1 phép nhân ma trận)"""
+        return pixel_to_bim(px, py, self.bim_matrices[camera_id])
+    
+    def is_inside_bim(self, x, y, label=None):
+        """Kiểm tra tọa độ có trong vùng được phép của label không"""
+        return bool(self.zone_index.inside_mask([(x, y)], label)[0])
+    
+    def inside_bim_mask(self, bim_points, labels=None):
+        """Kiểm tra nhiều điểm BIM (mảng Nx2, list label tương ứng) cùng lúc, trả về mảng bool"""
+        return self.zone_index.inside_mask(bim_points, labels)
+    
+    def resolve_class_ids(self, labels, warn_missing=True):
+        """Đổi tên label sang class ID của model (so khớp không phân biệt hoa thường)"""
+        wanted = {label.lower() for label in labels}
+        class_ids = [cls_id for cls_id, name in self.model.names.items() if name.lower() in wanted]
         
-        pt = np.array([[[float(px), float(py)]]], dtype=np.float32)
-        tpt = cv2.perspectiveTransform(pt, matrix)
-        tx, ty = float(tpt[0, 0, 0]), float(tpt[0, 0, 1])
+        missing = wanted - {self.model.names[c].lower() for c in class_ids}
+        if missing and warn_missing:
+            print(f"[WARN] Model không có label: {sorted(missing)}")
         
-        # Camera 2: HOÁN ĐỔI X và Y (vì camera vuông góc) + REMAP + ĐẢO Y
-        if camera_id == 2:
-            tx, ty = ty, tx  # Swap X và Y
-            
-            # Remap tx: từ range (-5, 27) sang range (32, 70)
-            tx = (tx - (-5)) / 32.0 * 38.0 + 32
-            
-            # Remap ty: từ range (32, 70) sang range (-5, 27)
-            ty = (ty - 32) / 38.0 * 32.0 + (-5)
-            
-            # Đảo ngược Y (gần camera → xa trong BIM, cần sửa)
-            ty = 22 - ty  # 22 = -5 + 27
+        return np.array(sorted(class_ids), dtype=int)
+    
+    def get_roi_rect(self, camera_id, frame_shape):
+        """Hình chữ nhật (x0, y0, x1, y1) bao các vùng làm việc + lề, cắt theo kích thước frame"""
+        key = (camera_id, frame_shape[:2])
+        rect = self.roi_rects.get(key)
+        if rect is None:
+            height, width = frame_shape[:2]
+            polygon = np.concatenate(self.zone_polygons[camera_id])
+            x0 = int(np.clip(np.floor(polygon[:, 0].min()) - self.roi_margin, 0, width - 1))
+            y0 = int(np.clip(np.floor(polygon[:, 1].min()) - self.roi_margin, 0, height - 1))
+            x1 = int(np.clip(np.ceil(polygon[:, 0].max()) + self.roi_margin, x0 + 1, width))
+            y1 = int(np.clip(np.ceil(polygon[:, 1].max()) + self.roi_margin, y0 + 1, height))
+            rect = (x0, y0, x1, y1)
+            self.roi_rects[key] = rect
+            print(f"[INFO] CAM{camera_id} ROI: x=[{x0}, {x1}), y=[{y0}, {y1}) "
+                  f"({(x1 - x0) * (y1 - y0) * 100 // (width * height)}% frame)")
+        return rect
+    
+    def crop_to_roi(self, camera_id, frame):
+        """
+        Cắt frame theo ROI của camera
         
-        return tx, ty
+        Returns:
+            (ảnh đưa vào YOLO, (offset_x, offset_y) để đổi box về tọa độ frame gốc)
+        """
+        if not self.roi_enabled:
+            return frame, (0, 0)
+        x0, y0, x1, y1 = self.get_roi_rect(camera_id, frame.shape)
+        return frame[y0:y1, x0:x1], (x0, y0)
     
-    def is_inside_bim(self, x, y):
-        """Kiểm tra tọa độ có trong vùng BIM không"""
-        x_min, x_max, y_min, y_max = self.bim_bounds
-        return x_min <= x <= x_max and y_min <= y <= y_max
+    def parse_result(self, camera_id, r, apply_class_mask=False, offset=(0, 0)):
+        """Chuyển kết quả YOLO của 1 frame thành danh sách detection"""
+        # Lấy toàn bộ box về NumPy trong 1 lần: x1, y1, x2, y2, (track_id,) conf, cls
+        data = r.boxes.data.cpu().numpy()
+        if len(data) == 0:
+            return []
+        
+        cls_ids = data[:, -1].astype(int)
+        
+        # YOLO đã lọc class trong NMS; chỉ lọc lại khi batch chứa class của camera khác
+        if apply_class_mask:
+            keep = np.isin(cls_ids, self.allowed_class_ids[camera_id])
+            if not keep.any():
+                return []
+            data = data[keep]
+            cls_ids = cls_ids[keep]
+        
+        confidences = data[:, -2]
+        # Box trên ảnh ROI → tọa độ frame gốc trước khi chuyển sang BIM
+        ox, oy = offset
+        boxes = data[:, :4] + np.array([ox, oy, ox, oy], dtype=data.dtype)
+        
+        track_ids = None
+        tracker = self.trackers.get(camera_id)
+        if tracker is not None:
+            track_ids = tracker.update(boxes, cls_ids, confidences)
+        
+        return self.build_detections(camera_id, boxes, cls_ids, confidences, track_ids)
     
-    def process_frame(self, camera_id, frame):
-        """Xử lý frame và detect objects"""
-        results = self.model(frame, device=0, conf=0.3, imgsz=640, half=True, verbose=False)
+    def build_detections(self, camera_id, boxes, cls_ids, confidences, track_ids=None):
+        """Tạo danh sách detection (tâm đáy, tọa độ BIM, trong/ngoài vùng) từ mảng box"""
+        if len(boxes) == 0:
+            return []
+        boxes = np.asarray(boxes).astype(int)
         
-        # Filter theo camera:
-        # Camera 1: chỉ detect dog
-        # Camera 2: chỉ detect songoku
-        if camera_id == 1:
-            allowed_labels = {"dog"}
-        else:
-            allowed_labels = {"songoku"}
+        # Tọa độ tâm đáy của tất cả box
+        centers = np.stack([(boxes[:, 0] + boxes[:, 2]) // 2, boxes[:, 3]], axis=1)
+        
+        # Chuyển tất cả sang tọa độ BIM trong 1 lần gọi
+        try:
+            bim_points = transform_points(centers, self.bim_matrices[camera_id])
+        except Exception as e:
+            print(f"[ERROR] Transform failed: {e}")
+            return []
+        
+        names = self.model.names
+        labels = [names.get(int(cls_id), str(int(cls_id))) for cls_id in cls_ids]
+        inside = self.inside_bim_mask(bim_points, labels)
         
         detections = []
-        for r in results:
-            for box in r.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cls_id = int(box.cls[0])
-                label = self.model.names.get(cls_id, str(cls_id))
-                
-                # Bỏ qua các mốc
-                if label.lower() in {"moc1", "moc2", "moc3", "moc4"}:
-                    continue
-                
-                # Chỉ giữ lại label được phép cho camera này
-                if label.lower() not in allowed_labels:
-                    continue
-                
-                # Lấy confidence score
-                confidence = float(box.conf[0])
-                
-                # Tính tọa độ tâm đáy
-                cx = int((x1 + x2) / 2)
-                cy = y2
-                
-                # Chuyển sang tọa độ BIM
-                try:
-                    tx, ty = self.pixel_to_bim(cx, cy, camera_id)
-                except Exception as e:
-                    print(f"[ERROR] Transform failed: {e}")
+        for i in range(len(boxes)):
+            x1, y1, x2, y2 = boxes[i].tolist()
+            # track_id = None khi tắt tracker hoặc track chưa đủ min_hits
+            track_id = None
+            if track_ids is not None and track_ids[i] >= 0:
+                track_id = int(track_ids[i])
+            detections.append({
+                'camera_id': camera_id,
+                'label': labels[i],
+                'confidence': float(confidences[i]),
+                'bbox': (x1, y1, x2, y2),
+                'center': (int(centers[i, 0]), int(centers[i, 1])),
+                'bim': (float(bim_points[i, 0]), float(bim_points[i, 1])),
+                'inside_bim': bool(inside[i]),
+                'track_id': track_id
+            })
+        
+        return detections
+    
+    def filter_detections(self, detections, timestamp, measured=True):
+        """
+        Làm mượt tọa độ BIM của các detection có track_id và dự đoán thời điểm ra khỏi vùng
+        - measured=True: detection YOLO → hiệu chỉnh filter bằng phép đo
+        - measured=False: track đẩy / detection dùng lại → filter chỉ dự đoán (không tự củng cố)
+        
+        Thêm vào detection: 'bim_raw', 'bim_velocity', và 'exit_eta_s' / 'exit_direction'
+        khi đối tượng sẽ chạm biên trong vòng exit_warning_s giây
+        """
+        filtered = []
+        for det in detections:
+            det['bim_raw'] = det['bim']
+            track_id = det.get('track_id')
+            if track_id is not None:
+                key = (det['camera_id'], track_id)
+                if measured:
+                    state = self.bim_filter.update(key, det['bim'][0], det['bim'][1], timestamp)
+                else:
+                    state = self.bim_filter.predict(key, timestamp)
+                if state is None:
+                    filtered.append(det)
                     continue
+                x, y, vx, vy = state
+                det['bim'] = (x, y)
+                det['bim_velocity'] = (vx, vy)
+                # An toàn: tọa độ đo HOẶC tọa độ lọc ở ngoài thì coi là ngoài
+                det['inside_bim'] = det['inside_bim'] and self.is_inside_bim(x, y, det['label'])
                 
-                inside_bim = self.is_inside_bim(tx, ty)
-                
-                detections.append({
-                    'camera_id': camera_id,
-                    'label': label,
-                    'confidence': confidence,
-                    'bbox': (x1, y1, x2, y2),
-                    'center': (cx, cy),
-                    'bim': (tx, ty),
-                    'inside_bim': inside_bim
-                })
+                speed = np.hypot(vx, vy)
+                if det['inside_bim'] and speed >= self.min_exit_speed:
+                    eta = self.zone_index.exit_time(x, y, vx, vy, det['label'])
+                    if eta is not None and eta <= self.exit_warning_s:
+                        det['exit_eta_s'] = eta
+                        # Hướng ra: điểm ngay sau khi vượt biên (0.05 đơn vị BIM)
+                        t = eta + 0.05 / speed
+                        det['exit_direction'] = self.zone_index.outside_direction(
+                            x + vx * t, y + vy * t, det['label'])
+            filtered.append(det)
+        
+        self.bim_filter.prune(timestamp)
+        return filtered
+    
+    def publish(self, camera_id, frame, detections, source=SOURCE_INFERRED):
+        """
+        Gắn thời điểm chụp + nguồn, lọc quỹ đạo BIM (nếu bật) rồi gửi kết quả sang thread hiển thị
+        source: "inferred" (YOLO), "tracked" (đẩy track) hoặc "reused" (frame tĩnh, dùng lại detection cũ)
+        """
+        timestamp = self.frame_timestamps.get(camera_id, time.time())
+        # Bản sao → last_detections giữ nguyên tọa độ đo (dùng lại khi cảnh tĩnh)
+        detections = [dict(det, timestamp=timestamp, source=source) for det in detections]
+        if self.bim_filter is not None:
+            detections = self.filter_detections(detections, timestamp, measured=source == SOURCE_INFERRED)
+        result_queue.put((camera_id, frame, detections))
+    
+    def propagate_tracks(self, camera_id):
+        """Frame không chạy YOLO: detection lấy từ các track được đẩy theo vận tốc"""
+        boxes, cls_ids, confidences, track_ids = self.trackers[camera_id].predict()
+        return self.build_detections(camera_id, boxes, cls_ids, confidences, track_ids)
+    
+    def process_frame(self, camera_id, frame):
+        """Xử lý frame và detect objects"""
+        class_ids = self.allowed_class_ids[camera_id]
+        if len(class_ids) == 0:
+            return []
+        image, offset = self.crop_to_roi(camera_id, frame)
+        results = self.model(image, classes=class_ids.tolist(), **self.predict_kwargs)
+        
+        detections = []
+        for r in results:
+            detections.extend(self.parse_result(camera_id, r, offset=offset))
         
         return detections
     
-    def run(self):
+    def process_batch(self, items):
+        """
+        Detect frame của nhiều camera trong 1 lần gọi YOLO
+        
+        Args:
+            items: list (camera_id, frame)
+        Returns:
+            list (camera_id, frame, detections) theo đúng thứ tự items
+        """
+        if len(self.batch_class_ids) == 0:
+            return [(camera_id, frame, []) for camera_id, frame in items]
+        
+        crops = [self.crop_to_roi(camera_id, frame) for camera_id, frame in items]
+        images = [image for image, _ in crops]
+        results = self.model(images, classes=self.batch_class_ids.tolist(), **self.predict_kwargs)
+        
+        # YOLO trả về 1 Results cho mỗi ảnh trong batch, cùng thứ tự đầu vào
+        return [
+            (camera_id, frame,
+             self.parse_result(camera_id, r, self.batch_needs_mask[camera_id], offset=offset))
+            for (camera_id, frame), (_, offset), r in zip(items, crops, results)
+        ]
+    
+    def log_stats(self):
+        """In tốc độ phục vụ của từng camera theo chu kỳ"""
+        now = time.monotonic()
+        if now - self.last_stats_time < self.stats_interval:
+            return
+        self.last_stats_time = now
+        
+        for camera_id, st in self.scheduler.report().items():
+            gate = self.gate_stats[camera_id]
+            print(f"[STATS] CAM{camera_id}: {st['served_hz']:.1f} Hz | "
+                  f"nhận={st['received']} xử lý={st['served']} bỏ={st['dropped']} | "
+                  f"chờ TB={st['avg_wait_ms']:.0f} ms | "
+                  f"YOLO={gate['inferred']} bỏ qua (tĩnh)={gate['skipped']} "
+                  f"track={gate['tracked']}")
+        
+        # Sức khỏe bus Modbus (RTT, lỗi, online/offline của từng slave)
+        print_modbus_health(get_modbus_health())
+        # Hàng đợi của từng signal sink (tín hiệu bị bỏ khi sink chậm)
+        get_signal_bus().print_stats()
+    
+    def needs_inference(self, camera_id, motion, now):
+        """Frame có cần chạy YOLO không (có chuyển động hoặc đến hạn keep-alive)"""
+        if not self.motion_gate_enabled or motion:
+            return True
+        return now - self.last_inference_time[camera_id] >= self.keepalive_s
+    
+    def is_detect_frame(self, camera_id):
+        """Frame đầu tiên và mỗi N frame sau đó chạy YOLO, các frame khác chỉ đẩy track"""
+        count = self.frame_counters[camera_id]
+        self.frame_counters[camera_id] = count + 1
+        return count % self.detect_every == 0
+    
+    def split_by_gate(self, items):
+        """
+        Tách frame cần inference, frame chỉ đẩy track và frame tĩnh (dùng lại detection cũ)
+        
+        Returns:
+            (to_infer, reused): to_infer = list (camera_id, frame),
+                                reused = list (camera_id, frame, detections, source)
+                                source: "tracked" (track được đẩy theo vận tốc) hoặc "reused" (frame tĩnh)
+        """
+        now = time.monotonic()
+        to_infer = []
+        reused = []
+        for camera_id, frame, timestamp, motion in items:
+            self.frame_timestamps[camera_id] = timestamp
+            if not self.needs_inference(camera_id, motion, now):
+                self.gate_stats[camera_id]['skipped'] += 1
+                reused.append((camera_id, frame, self.last_detections[camera_id], SOURCE_REUSED))
+            elif self.is_detect_frame(camera_id):
+                self.last_inference_time[camera_id] = now
+                self.gate_stats[camera_id]['inferred'] += 1
+                to_infer.append((camera_id, frame))
+            else:
+                self.gate_stats[camera_id]['tracked'] += 1
+                detections = self.propagate_tracks(camera_id)
+                self.last_detections[camera_id] = detections
+                reused.append((camera_id, frame, detections, SOURCE_TRACKED))
+        return to_infer, reused
+    
+    def run_batched(self):
+        """Mỗi vòng: gom frame mới nhất của mọi camera → 1 lần inference"""
         while not stop_event.is_set():
-            # Xử lý Camera 1
+            items = self.scheduler.get_all(timeout=0.5)
+            self.log_stats()
+            if not items:
+                continue
+            
+            batch, reused = self.split_by_gate(items)
+            for result in reused:
+                self.publish(*result)
+            if not batch:
+                continue
+            
             try:
-                camera_id, frame = frame_queue_1.get(timeout=0.1)
-                detections = self.process_frame(camera_id, frame)
-                result_queue.put((camera_id, frame, detections))
-            except:
-                pass
+                for camera_id, frame, detections in self.process_batch(batch):
+                    self.last_detections[camera_id] = detections
+                    self.publish(camera_id, frame, detections)
+            except Exception as e:
+                print(f"[ERROR] Batch inference: {e}")
+    
+    def run_sequential(self):
+        """Mỗi camera 1 lần inference riêng, camera nào có frame thì xử lý ngay"""
+        while not stop_event.is_set():
+            item = self.scheduler.get(timeout=0.5)
+            self.log_stats()
+            if item is None:
+                continue
             
-            # Xử lý Camera 2
+            batch, reused = self.split_by_gate([item])
+            for result in reused:
+                self.publish(*result)
+            if not batch:
+                continue
+            
+            camera_id, frame = batch[0]
             try:
-                camera_id, frame = frame_queue_2.get(timeout=0.1)
                 detections = self.process_frame(camera_id, frame)
-                result_queue.put((camera_id, frame, detections))
-            except:
-                pass
+                self.last_detections[camera_id] = detections
+                self.publish(camera_id, frame, detections)
+            except Exception as e:
+                print(f"[ERROR] Inference Camera {camera_id}: {e}")
+    
+    def run(self):
+        if self.batch_inference:
+            self.run_batched()
+        else:
+            self.run_sequential()
+
+
+def get_inference_imgsz(detection_config):
+    """imgsz dùng khi inference (ROI có thể đặt imgsz riêng) - model export theo đúng giá trị này"""
+    roi_config = detection_config.get("roi", {})
+    if roi_config.get("enabled", False) and roi_config.get("imgsz"):
+        return roi_config["imgsz"]
+    return detection_config.get("imgsz", 640)
 
 
 def get_bim_bounds():
@@ -226,6 +560,27 @@ def get_bim_bounds():
     return min(all_x), max(all_x), min(all_y), max(all_y)
 
 
+def create_motion_gates(gate_config, zone_polygons):
+    """Tạo MotionGate cho từng camera theo các vùng làm việc chiếu lên ảnh"""
+    if not gate_config.get("enabled", False):
+        print("[INFO] Motion gate: TẮT")
+        return {}
+    
+    gates = {}
+    for camera_id, polygons in zone_polygons.items():
+        gates[camera_id] = MotionGate(
+            polygons,
+            method=gate_config.get("method", "diff"),
+            scale_width=gate_config.get("scale_width", 160),
+            diff_threshold=gate_config.get("diff_threshold", 25),
+            min_motion_ratio=gate_config.get("min_motion_ratio", 0.002),
+            zone_margin_px=gate_config.get("zone_margin_px", 20),
+        )
+    print(f"[INFO] Motion gate: BẬT ({gate_config.get('method', 'diff')}, "
+          f"keep-alive {gate_config.get('keepalive_s', 2.0)}s)")
+    return gates
+
+
 def draw_detections(frame, detections, camera_id):
     """Vẽ kết quả detection lên frame"""
     for det in detections:
@@ -249,7 +604,10 @@ def draw_detections(frame, detections, camera_id):
         cv2.line(frame, (x1, y2), (x2, y2), box_color, 3)
         cv2.circle(frame, (cx, cy), 6, box_color, -1)
         
-        # Hiển thị thông tin với confidence
+        # Hiển thị thông tin với confidence (và track ID nếu có)
+        track_id = det.get('track_id')
+        if track_id is not None:
+            label = f"{label} #{track_id}"
         cv2.putText(frame, f"{label} [{status}] Conf:{confidence:.2f}", (x1, y1 - 10),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, box_color, 2)
         cv2.putText(frame, f"BIM:({tx:.1f},{ty:.1f})", (x1, y2 + 20),
@@ -263,29 +621,25 @@ def draw_detections(frame, detections, camera_id):
     return frame
 
 
-def save_to_excel(detections_data, excel_path):
-    """Lưu dữ liệu detection vào file Excel"""
-    try:
-        if not detections_data:
-            return
-        
-        # Tạo DataFrame
-        df = pd.DataFrame(detections_data)
-        
-        # Kiểm tra file đã tồn tại chưa
-        if os.path.exists(excel_path):
-            # Đọc file cũ và append
-            df_old = pd.read_excel(excel_path, engine='openpyxl')
-            df = pd.concat([df_old, df], ignore_index=True)
-        
-        # Lưu vào Excel
-        df.to_excel(excel_path, index=False, engine='openpyxl')
-        
-    except Exception as e:
-        print(f"[ERROR] Khong luu duoc Excel: {e}")
+def with_region_state(objects, region_states):
+    """Bản sao đối tượng đã gộp kèm trạng thái vùng đã xác nhận ('state')"""
+    return [dict(obj, state=region_states.state_of(obj['object_id'])) for obj in objects]
+
+
+def print_startup_report(startup_t0, model_ready, camera_threads, first_detection):
+    """In thời gian khởi động tới detection đầu tiên (tính từ lúc vào main)"""
+    parts = [f"model {model_ready - startup_t0:.2f}s"]
+    for cam_thread in camera_threads:
+        if cam_thread.first_frame_time is not None:
+            parts.append(f"camera {cam_thread.camera_id} {cam_thread.first_frame_time - startup_t0:.2f}s")
+        else:
+            parts.append(f"camera {cam_thread.camera_id} chưa có frame")
+    parts.append(f"detection đầu tiên {first_detection - startup_t0:.2f}s")
+    print(f"[STATS] Khởi động: {' | '.join(parts)}")
 
 
 def main():
+    startup_t0 = time.perf_counter()
     print("="*60)
     print("       DUAL CAMERA DETECTION SYSTEM")
     print("="*60)
@@ -293,67 +647,187 @@ def main():
     print(f"Camera 2: {IP2}")
     print("="*60)
     
-    # Load model
-    model_path = os.path.join(script_dir, "models", "best.pt")
-    print(f"[INFO] Loading model: {model_path}")
-    model = YOLO(model_path)
+    # Modbus (kết nối + ping slave + nháy đèn) chạy nền song song với load model / kết nối camera
+    print("[INFO] Khởi tạo Modbus (chạy nền)...")
+    init_modbus_async()
     
-    # Load homography matrices
+    # Load detection config
+    detection_config = load_detection_config()
+    batch_inference = detection_config.get("batch_inference", True)
+    mode = "batch" if batch_inference else "tuần tự"
+    print(f"[INFO] Chế độ inference: {mode}")
+    
+    scheduler = FrameScheduler([1, 2], policy=detection_config.get("scheduler_policy", "round_robin"))
+    print(f"[INFO] Lập lịch frame: {scheduler.policy}")
+    
+    # Load homography matrices (Pixel → BIM và BIM → Pixel, tính 1 lần)
     print("[INFO] Loading calibration matrices...")
-    proj_matrix_1 = get_projection_matrix().astype('float32')
-    proj_matrix_2 = get_projection_matrix_cam2().astype('float32')
+    bim_matrices, inv_matrices = load_camera_transforms((1, 2))
     
     # Get BIM bounds
     bim_bounds = get_bim_bounds()
     print(f"[INFO] Vùng BIM: X=[{bim_bounds[0]}, {bim_bounds[1]}], Y=[{bim_bounds[2]}, {bim_bounds[3]}]")
     
-    # Khởi tạo database
-    create_temp_table(DB_PATH)
-    print(f"[INFO] Database: {DB_PATH}")
+    # Vùng giám sát đa giác (mặc định = vùng BIM chữ nhật) + chỉ mục lưới
+    zone_index = load_zones(bim_bounds)
+    for zone in zone_index.zones:
+        print(f"[INFO] Vùng '{zone.name}' ({zone.zone_type}): {len(zone.polygon)} đỉnh")
     
-    # Khởi tạo Modbus RS485 cho điều khiển đèn
-    print("[INFO] Khởi tạo Modbus RS485...")
-    init_modbus()
+    # Các vùng làm việc chiếu lên ảnh từng camera (dùng cho motion gate và ROI)
+    zone_polygons = {
+        camera_id: [transform_points(polygon, inv_matrix) for polygon in zone_index.work_polygons()]
+        for camera_id, inv_matrix in inv_matrices.items()
+    }
     
-    # Khởi tạo camera threads
+    # Kết nối camera trước khi load model (RTSP mất vài giây, chạy song song với load model)
     print("[INFO] Đang kết nối cameras...")
-    cam_thread_1 = CameraThread(1, CAMERA_URL_1, frame_queue_1)
-    cam_thread_2 = CameraThread(2, CAMERA_URL_2, frame_queue_2)
-    
-    # Khởi tạo detection thread
-    det_thread = DetectionThread(model, proj_matrix_1, proj_matrix_2, bim_bounds)
-    
-    # Start threads
+    motion_gates = create_motion_gates(detection_config.get("motion_gate", {}), zone_polygons)
+    cam_thread_1 = CameraThread(1, CAMERA_URL_1, scheduler, motion_gates.get(1))
+    cam_thread_2 = CameraThread(2, CAMERA_URL_2, scheduler, motion_gates.get(2))
     cam_thread_1.start()
     cam_thread_2.start()
+    
+    # Khởi tạo database: 1 kết nối WAL duy nhất trên thread ghi riêng
+    history_config = detection_config.get("history", {})
+    # Id lần chạy: object_id / track_id đánh lại từ 1 mỗi lần chạy
+    run_id = new_run_id()
+    history_sources = {SOURCE_INFERRED}
+    if history_config.get("record_tracked", False):
+        history_sources.add(SOURCE_TRACKED)
+    print(f"[INFO] Lịch sử vị trí: run_id={run_id}, ghi detection {sorted(history_sources)}")
+    db_writer = start_database_writer(DB_PATH, commit_interval_ms=history_config.get("commit_interval_ms", 200))
+    print(f"[INFO] Database: {DB_PATH}")
+    
+    # Load model (backend/device/precision theo config)
+    inference_config = detection_config.get("inference", {})
+    model_path = os.path.join(script_dir, inference_config.get("weights", os.path.join("models", "best.pt")))
+    print(f"[INFO] Loading model: {model_path}")
+    model = load_inference_backend(model_path, inference_config,
+                                   imgsz=get_inference_imgsz(detection_config),
+                                   batch=2 if batch_inference else 1)
+    model_ready = time.perf_counter()
+    print(f"[INFO] Model sẵn sàng sau {model_ready - startup_t0:.2f}s")
+    
+    # Khởi tạo detection thread
+    det_thread = DetectionThread(model, bim_matrices, zone_index, zone_polygons, scheduler, detection_config)
     det_thread.start()
     
-    print("[INFO] Bắt đầu detection... Nhấn ESC để thoát.")
-    signal_ready()  # Gửi tín hiệu hệ thống sẵn sàng
+    print("[INFO] Bắt đầu detection... Nhấn ESC để thoát, A để xác nhận cảnh báo đối tượng mất dấu.")
+    signal_ready()  # Gửi tín hiệu hệ thống sẵn sàng (self-test đèn đã chạy nền)
+    first_detection = None
     
     # Biến để lưu frame và detections mới nhất
     latest_frames = {1: None, 2: None}
     latest_detections = {1: [], 2: []}
+    # Track đang được dự đoán sắp ra khỏi vùng: camera_id -> {track_id: detection}
+    exit_warnings = {1: {}, 2: {}}
     
-    # Counter cho database
-    frame_count = 0
-    SAVE_INTERVAL = 10
+    # Gộp detection của 2 camera thành đối tượng duy nhất trong hệ BIM
+    fusion_config = detection_config.get("fusion", {})
+    fusion = CrossCameraFusion(association_distance=fusion_config.get("association_distance", 2.0),
+                               max_age_s=fusion_config.get("max_age_s", 1.0))
+    # Sự kiện vào / ra từng vùng của đối tượng đã gộp
+    zone_tracker = ZoneTracker(zone_index)
+    # Trạng thái TRONG / SẮP RA / NGOÀI của từng đối tượng (hysteresis + dwell) → tín hiệu đèn
+    region_config = detection_config.get("region_state", {})
+    region_states = RegionStateMachine(zone_index.inside_mask,
+                                       enter_margin=region_config.get("enter_margin", 0.3),
+                                       exit_margin=region_config.get("exit_margin", 0.3),
+                                       enter_dwell_s=region_config.get("enter_dwell_s", 0.5),
+                                       exit_dwell_s=region_config.get("exit_dwell_s", 0.3),
+                                       warning_dwell_s=region_config.get("warning_dwell_s", 0.0),
+                                       forget_after_s=region_config.get("forget_after_s", 3.0))
     
-    # Đường dẫn file Excel
-    excel_path = os.path.join(script_dir, "output", "detection_results.xlsx")
+    # Nhịp ghi temp_data / log CSV theo đồng hồ thực (hoặc khi đối tượng di chuyển đáng kể)
+    persist_config = detection_config.get("persist", {})
+    persist_scheduler = PersistScheduler(interval_ms=persist_config.get("interval_ms", 500),
+                                         min_delta=persist_config.get("min_delta", 0.5),
+                                         min_gap_ms=persist_config.get("min_gap_ms", 100),
+                                         stats_interval_s=detection_config.get("stats_interval_s", 30))
+    
+    # Log CSV chỉ-thêm, xoay theo giờ (Excel xuất khi cần: tools/export_detection_excel.py)
+    log_config = detection_config.get("detection_log", {})
+    csv_log = RotatingCsvWriter(rotate=log_config.get("rotate", "hourly"),
+                                max_bytes=log_config.get("max_mb", 50) * 1024 * 1024)
+    csv_log.start()
+    
+    # Persistence stage: dựng dòng và ghi database / log CSV ngoài vòng hiển thị
+    persistence_config = detection_config.get("persistence", {})
+    persistence = PersistenceThread(db_writer, csv_log, LABEL_PERSON_IDS, status_names=REGION_STATUS,
+                                    queue_size=persistence_config.get("queue_size", 100),
+                                    policy=persistence_config.get("policy", "merge"),
+                                    stats_interval_s=detection_config.get("stats_interval_s", 30),
+                                    on_saved=signal_db_saved,
+                                    record_history=history_config.get("enabled", True),
+                                    run_id=run_id)
+    persistence.start()
     
     while True:
         # Lấy kết quả từ queue
         try:
             camera_id, frame, detections = result_queue.get(timeout=0.1)
-            latest_frames[camera_id] = frame
-            latest_detections[camera_id] = detections
+        except Empty:
+            camera_id = None
+        
+        if camera_id is not None and first_detection is None:
+            first_detection = time.perf_counter()
+            print_startup_report(startup_t0, model_ready, (cam_thread_1, cam_thread_2), first_detection)
+        
+        # Mọi lệnh đèn của 1 kết quả được gửi thành 1 đợt
+        if camera_id is not None:
+            with light_cycle():
+                latest_frames[camera_id] = frame
+                latest_detections[camera_id] = detections
+                frame_time = detections[0]['timestamp'] if detections else time.time()
+                fused_objects = fusion.update(camera_id, detections, frame_time)
+                for event in zone_tracker.update(fused_objects):
+                    signal_zone_event(event['label'], event['zone'], event['event'], event['bim'][0], event['bim'][1],
+                                      zone_type=event['zone_type'], object_id=event['object_id'])
+            
+                # Log detections
+                for det in detections:
+                    track = f" #{det['track_id']}" if det.get('track_id') is not None else ""
+                    print(f"[CAM{camera_id}] {det['label']}{track} -> BIM: ({det['bim'][0]:.2f}, {det['bim'][1]:.2f})")
             
-            # Log detections
-            for det in detections:
-                print(f"[CAM{camera_id}] {det['label']} -> BIM: ({det['bim'][0]:.2f}, {det['bim'][1]:.2f})")
-        except:
-            pass
+                # Đối tượng có track đang được dự đoán sắp chạm biên
+                exit_warnings[camera_id] = {det['track_id']: det for det in detections if 'exit_eta_s' in det}
+                warning_dets = {}
+                for obj in fused_objects:
+                    for cid, track_id in obj['track_ids'].items():
+                        det = exit_warnings.get(cid, {}).get(track_id)
+                        if det is not None:
+                            warning_dets[obj['object_id']] = det
+                
+                # Tín hiệu đèn chỉ khi trạng thái đối tượng đã được xác nhận đổi
+                # (ngay khi có kết quả, không chờ nhịp ghi)
+                objects_by_id = {obj['object_id']: obj for obj in fused_objects}
+                for change in region_states.update(fused_objects, frame_time, warning_ids=warning_dets):
+                    if change['state'] is None:
+                        signal_object_lost(change['label'], change['object_id'], last_state=change['prev_state'])
+                        continue
+                    obj = objects_by_id[change['object_id']]
+                    tx, ty = obj['bim']
+                    cameras = "+".join(str(cid) for cid in obj['cameras'])
+                    if change['state'] == STATE_INSIDE:
+                        signal_inside(obj['label'], tx, ty, camera_id=cameras,
+                                      person_id=LABEL_PERSON_IDS.get(obj['label'].lower(), 0),
+                                      object_id=obj['object_id'])
+                    elif change['state'] == STATE_WARNING:
+                        det = warning_dets[obj['object_id']]
+                        signal_exit_warning(obj['label'], tx, ty, camera_id=cameras, eta_s=det['exit_eta_s'],
+                                            direction=det['exit_direction'], track_id=det['track_id'],
+                                            object_id=obj['object_id'])
+                    else:
+                        signal_outside(obj['label'], tx, ty, camera_id=cameras,
+                                       direction=zone_index.outside_direction(tx, ty, obj['label']),
+                                       object_id=obj['object_id'])
+                
+                # Lịch sử vị trí: snapshot cho persistence stage (dựng dòng + ghi ở thread riêng)
+                # Chỉ detection thật sự quan sát được; detection dùng lại ở frame tĩnh không phải quan sát mới
+                history_detections = [det for det in detections if det['source'] in history_sources]
+                if history_detections:
+                    persistence.submit(SNAPSHOT_DETECTIONS, frame_time, with_region_state(fused_objects, region_states),
+                                       camera_id=camera_id, detections=history_detections)
         
         # Hiển thị Camera 1
         if latest_frames[1] is not None:
@@ -365,82 +839,35 @@ def main():
             display2 = draw_detections(latest_frames[2].copy(), latest_detections[2], 2)
             cv2.imshow("Camera 2 - Detection", display2)
         
-        # Ghi database và Excel
-        frame_count += 1
-        if frame_count % SAVE_INTERVAL == 0:
-            coords_to_save = []
-            excel_data = []
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Camera 1 (dog) → person_id = 1
-            for det in latest_detections[1]:
-                tx, ty = det['bim']
-                confidence = det.get('confidence', 0.0)
-                coords_to_save.append((tx, ty, 1))  # dog = person_id 1
-                
-                # Thêm vào Excel data
-                excel_data.append({
-                    'Timestamp': timestamp,
-                    'Camera': 1,
-                    'Label': det['label'],
-                    'Confidence': confidence,
-                    'BIM_X': tx,
-                    'BIM_Y': ty,
-                    'Status': 'TRONG' if det['inside_bim'] else 'NGOAI'
-                })
-                
-                if det['inside_bim']:
-                    signal_inside(det['label'], tx, ty, camera_id=1, person_id=1)
-                else:
-                    direction = get_outside_direction(tx, ty, bim_bounds)
-                    signal_outside(det['label'], tx, ty, camera_id=1, direction=direction)
-                    break  # Chỉ lấy 1 detection
-            
-            # Camera 2 (songoku) → person_id = 0
-            for det in latest_detections[2]:
-                tx, ty = det['bim']
-                confidence = det.get('confidence', 0.0)
-                coords_to_save.append((tx, ty, 0))  # songoku = person_id 0
-                
-                # Thêm vào Excel data
-                excel_data.append({
-                    'Timestamp': timestamp,
-                    'Camera': 2,
-                    'Label': det['label'],
-                    'Confidence': confidence,
-                    'BIM_X': tx,
-                    'BIM_Y': ty,
-                    'Status': 'TRONG' if det['inside_bim'] else 'NGOAI'
-                })
-                
-                if det['inside_bim']:
-                    signal_inside(det['label'], tx, ty, camera_id=2, person_id=0)
-                else:
-                    direction = get_outside_direction(tx, ty, bim_bounds)
-                    signal_outside(det['label'], tx, ty, camera_id=2, direction=direction)
-                    break  # Chỉ lấy 1 detection
-            
-            # Lưu database
-            if coords_to_save:
-                try:
-                    add_many_temp(DB_PATH, coords_to_save)
-                    signal_db_saved(len(coords_to_save))
-                except Exception as e:
-                    print(f"[ERROR] Ghi database: {e}")
-            
-            # Lưu Excel
-            if excel_data:
-                save_to_excel(excel_data, excel_path)
+        # Ghi database và log CSV theo nhịp thời gian thực
+        # Đối tượng đã gộp từ mọi camera (bỏ quan sát quá cũ) → temp_data + log CSV ở persistence stage
+        now = time.time()
+        current_objects = fusion.snapshot(now)
+        if persist_scheduler.due({obj['object_id']: obj['bim'] for obj in current_objects}, now):
+            persistence.submit(SNAPSHOT_OBJECTS, now, with_region_state(current_objects, region_states))
+        persist_scheduler.log_stats(now)
         
+        key = cv2.waitKey(1) & 0xFF
         # ESC để thoát
-        if cv2.waitKey(1) & 0xFF == 27:
+        if key == 27:
             break
+        # A: xác nhận cảnh báo của đối tượng mất dấu khi đang ở ngoài vùng (tắt đèn giữ)
+        elif key in (ord('a'), ord('A')):
+            acknowledge_alarm()
     
     # Cleanup
     print("[INFO] Đang tắt...")
+    # Ghi nốt dữ liệu trước: lần ghi cuối còn phát tín hiệu DB_SAVED lên bus đang mở
+    persistence.close()  # Ghi nốt snapshot đang chờ
+    persist_scheduler.log_stats(force=True)
+    db_writer.close()  # Ghi nốt hàng đợi rồi đóng kết nối database
+    csv_log.close()  # Ghi nốt log CSV
+    print(f"[STATS] Database: {db_writer.summary()}")
     signal_stop()  # Gửi tín hiệu dừng hệ thống (tắt đèn)
     close_modbus()  # Đóng kết nối Modbus
+    close_signal_bus()  # Xử lý nốt tín hiệu còn lại (console / file log), sau đó không phát tín hiệu nữa
     stop_event.set()
+    scheduler.wake_all()
     cam_thread_1.join(timeout=2)
     cam_thread_2.join(timeout=2)
     cv2.destroyAllWindows()
@@ -11,6 +11,7 @@ import subprocess
 import sys
 import os
 from signal_output import signal_calibration_done
+from config.bim_transform import build_effective_matrix, transform_points
 
 # Thông tin camera IP
 USER = "admin"
@@ -140,6 +141,9 @@ class CalibrationSetup:
                 from chuyendoitoado_cam2 import get_projection_matrix_cam2
                 matrix = get_projection_matrix_cam2().astype('float32')
             
+            # Ma trận hiệu dụng: Camera 2 đã gộp swap/remap/đảo Y như run_dual_cam.py
+            effective_matrix = build_effective_matrix(self.camera_id, matrix)
+            
             # Lấy BIM coords mong đợi để so sánh
             expected_bim = get_bim_coords_for_camera(self.camera_id)
             expected_points = [
@@ -162,22 +166,11 @@ class CalibrationSetup:
             total_error = 0.0
             max_error = 0.0
             
+            # Chuyển cả 4 điểm pixel sang BIM trong 1 lần
+            transformed = transform_points(self.points, effective_matrix)
+            
             for i, (px, py) in enumerate(self.points):
-                # Chuyển pixel sang BIM bằng perspectiveTransform
-                pt = np.array([[[float(px), float(py)]]], dtype=np.float32)
-                tpt = cv2.perspectiveTransform(pt, matrix)
-                tx, ty = float(tpt[0, 0, 0]), float(tpt[0, 0, 1])
-                
-                # Camera 2: Áp dụng các phép biến đổi như trong run_dual_cam.py
-                if self.camera_id == 2:
-                    tx, ty = ty, tx  # Swap X và Y
-                    # Remap tx: từ range (-5, 27) sang range (32, 70)
-                    tx = (tx - (-5)) / 32.0 * 38.0 + 32
-                    # Remap ty: từ range (32, 70) sang range (-5, 27)
-                    ty = (ty - 32) / 38.0 * 32.0 + (-5)
-                    # Đảo ngược Y
-                    ty = 22 - ty  # 22 = -5 + 27
-                
+                tx, ty = float(transformed[i, 0]), float(transformed[i, 1])
                 bim_points.append((tx, ty))
                 
                 # So sánh với giá trị mong đợi
@@ -389,6 +382,8 @@ def print_summary_both_cameras():
         # Load matrices
         matrix1 = get_projection_matrix().astype('float32')
         matrix2 = get_projection_matrix_cam2().astype('float32')
+        bim_points_1 = transform_points(cam1_points, build_effective_matrix(1, matrix1))
+        bim_points_2 = transform_points(cam2_points, build_effective_matrix(2, matrix2))
         
         # Lấy BIM coords mong đợi để so sánh
         expected_bim = get_bim_coords_for_camera(1)  # Cả 2 camera dùng chung
@@ -413,9 +408,7 @@ def print_summary_both_cameras():
         cam1_total_error = 0.0
         cam1_max_error = 0.0
         for i, (px, py) in enumerate(cam1_points):
-            pt = np.array([[[float(px), float(py)]]], dtype=np.float32)
-            tpt = cv2.perspectiveTransform(pt, matrix1)
-            tx, ty = float(tpt[0, 0, 0]), float(tpt[0, 0, 1])
+            tx, ty = float(bim_points_1[i, 0]), float(bim_points_1[i, 1])
             
             # So sánh với giá trị mong đợi
             exp_x, exp_y = expected_points[i]
@@ -438,14 +431,8 @@ def print_summary_both_cameras():
         cam2_total_error = 0.0
         cam2_max_error = 0.0
         for i, (px, py) in enumerate(cam2_points):
-            pt = np.array([[[float(px), float(py)]]], dtype=np.float32)
-            tpt = cv2.perspectiveTransform(pt, matrix2)
-            tx, ty = float(tpt[0, 0, 0]), float(tpt[0, 0, 1])
-            # Áp dụng các phép biến đổi cho Camera 2
-            tx, ty = ty, tx  # Swap
-            tx = (tx - (-5)) / 32.0 * 38.0 + 32  # Remap X
-            ty = (ty - 32) / 38.0 * 32.0 + (-5)  # Remap Y
-            ty = 22 - ty  # Đảo Y
+            # Camera 2: ma trận hiệu dụng đã gộp swap/remap/đảo Y
+            tx, ty = float(bim_points_2[i, 0]), float(bim_points_2[i, 1])
             
             # So sánh với giá trị mong đợi
             exp_x, exp_y = expected_points[i]
@@ -0,0 +1,194 @@
+"""
+Signal Bus
+- Tín hiệu (DETECT_INSIDE, EXIT_WARNING, ...) là bản ghi SignalEvent đưa lên bus trong tiến trình
+- Mỗi sink (console, đèn Modbus, file log, còi, PLC, ...) có thread + hàng đợi riêng
+  → sink chậm không làm chậm detection hay sink khác
+- Mỗi hàng đợi có chính sách khi đầy (back-pressure):
+    "drop_oldest": bỏ đợt cũ nhất (mặc định, hợp với hiển thị / log)
+    "drop_newest": bỏ đợt mới
+    "block":       chờ tối đa block_timeout_s rồi bỏ đợt mới (hợp với sink không được mất lệnh)
+- Tín hiệu được gửi theo đợt (list SignalEvent): các tín hiệu của 1 chu kỳ detection đi cùng nhau
+
+Thêm sink mới:
+    class SirenSink(SignalSink):
+        name = "siren"
+        def handle(self, event):
+            if event.signal_type == "DETECT_OUTSIDE":
+                ...
+    bus.register(SirenSink(), queue_size=100, policy="drop_oldest")
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DROP_NEWEST = "drop_newest"
+POLICY_BLOCK = "block"
+POLICIES = (POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_BLOCK)
+
+
+class SignalEvent:
+    """1 tín hiệu: loại + dữ liệu + thời điểm phát (không phải thời điểm sink xử lý)"""
+    def __init__(self, signal_type, data=None, timestamp=None):
+        self.signal_type = signal_type
+        self.data = dict(data or {})
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def time_str(self):
+        return datetime.fromtimestamp(self.timestamp).strftime("%H:%M:%S")
+
+    def to_dict(self):
+        return {'signal_type': self.signal_type, 'timestamp': self.timestamp, **self.data}
+
+    def __repr__(self):
+        return f"SignalEvent({self.signal_type}, {self.data})"
+
+
+class SignalSink:
+    """Sink cơ sở: override handle() (1 tín hiệu) hoặc handle_batch() (cả đợt)"""
+    name = "sink"
+
+    def handle(self, event):
+        raise NotImplementedError
+
+    def handle_batch(self, events):
+        for event in events:
+            self.handle(event)
+
+    def close(self):
+        """Gọi 1 lần trên thread của sink khi bus đóng"""
+        pass
+
+
+class SinkWorker(threading.Thread):
+    """Thread + hàng đợi riêng của 1 sink"""
+    def __init__(self, sink, queue_size=1000, policy=POLICY_DROP_OLDEST, block_timeout_s=0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"Chính sách hàng đợi không hợp lệ: {policy}")
+        super().__init__(name=f"SignalSink-{sink.name}")
+        self.sink = sink
+        self.queue_size = max(1, int(queue_size))
+        self.policy = policy
+        self.block_timeout_s = block_timeout_s
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._running = True
+        self.stats = {'events': 0, 'handled': 0, 'dropped': 0, 'errors': 0, 'max_lag_ms': 0.0}
+        self.daemon = True
+
+    def put(self, events):
+        """Đưa 1 đợt tín hiệu vào hàng đợi, trả về False nếu đợt bị bỏ"""
+        with self._cond:
+            self.stats['events'] += len(events)
+            if len(self._queue) >= self.queue_size:
+                if self.policy == POLICY_DROP_OLDEST:
+                    self.stats['dropped'] += len(self._queue.popleft())
+                elif self.policy == POLICY_BLOCK:
+                    self._cond.wait_for(lambda: len(self._queue) < self.queue_size or not self._running,
+                                        self.block_timeout_s)
+                if len(self._queue) >= self.queue_size or not self._running:
+                    self.stats['dropped'] += len(events)
+                    return False
+            self._queue.append(events)
+            self._cond.notify_all()
+            return True
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._queue:
+                    break
+                events = self._queue.popleft()
+                self._busy = True
+                self._cond.notify_all()
+
+            try:
+                self.sink.handle_batch(events)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"[ERROR] Sink '{self.sink.name}': {e}")
+            lag_ms = (time.time() - events[0].timestamp) * 1000.0
+            self.stats['handled'] += len(events)
+            self.stats['max_lag_ms'] = max(self.stats['max_lag_ms'], lag_ms)
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+        try:
+            self.sink.close()
+        except Exception as e:
+            print(f"[ERROR] Đóng sink '{self.sink.name}': {e}")
+
+    def flush(self, timeout=None):
+        """Chờ hàng đợi trống và sink xử lý xong đợt hiện tại"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def stop(self, timeout=2.0):
+        """Xử lý nốt hàng đợi rồi dừng"""
+        self.flush(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self.join(timeout)
+
+
+class SignalBus:
+    """Phát mỗi đợt tín hiệu tới hàng đợi của mọi sink đã đăng ký (không chặn theo sink)"""
+    def __init__(self):
+        self.workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def register(self, sink, queue_size=1000, policy=POLICY_DROP_OLDEST, block_timeout_s=0.05):
+        """Đăng ký sink và khởi động thread của nó"""
+        worker = SinkWorker(sink, queue_size=queue_size, policy=policy, block_timeout_s=block_timeout_s)
+        with self._lock:
+            self.workers.append(worker)
+        worker.start()
+        print(f"[INFO] Signal sink '{sink.name}': hàng đợi {worker.queue_size}, khi đầy: {policy}")
+        return worker
+
+    def publish(self, events):
+        """Phát 1 tín hiệu hoặc 1 đợt (list) tín hiệu"""
+        if isinstance(events, SignalEvent):
+            events = [events]
+        if not events or self._closed:
+            return
+        events = list(events)
+        with self._lock:
+            workers = list(self.workers)
+        for worker in workers:
+            worker.put(events)
+
+    def flush(self, timeout=None):
+        """Chờ mọi sink xử lý hết tín hiệu đang chờ"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in list(self.workers):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            worker.flush(remaining)
+
+    def stats(self):
+        """Thống kê từng sink: name -> dict"""
+        return {worker.sink.name: dict(worker.stats, queued=len(worker._queue)) for worker in self.workers}
+
+    def print_stats(self):
+        for name, st in self.stats().items():
+            print(f"[STATS] Sink {name}: {st['handled']}/{st['events']} tín hiệu, bỏ={st['dropped']} "
+                  f"lỗi={st['errors']} chờ={st['queued']} trễ max={st['max_lag_ms']:.1f} ms")
+
+    def close(self, timeout=2.0):
+        """Xử lý nốt tín hiệu còn lại rồi dừng mọi sink"""
+        if self._closed:
+            return
+        self._closed = True
+        for worker in list(self.workers):
+            worker.stop(timeout)
@@ -1,14 +1,20 @@
 """
 Signal Output Module
-- Gửi tín hiệu ra console
-- Điều khiển đèn qua Modbus RS485 (ESP32/ESP8266)
+- Tín hiệu đi qua SignalBus (signal_bus.py): console, đèn Modbus, file log là các sink
+  chạy trên thread riêng → send_signal() không chặn vòng detection
+- Điều khiển đèn qua Modbus RS485 (ESP32/ESP8266) hoặc Modbus TCP (slave giả lập)
+- Lệnh ghi coil chạy trên thread ModbusWorker riêng → không chặn vòng hiển thị
 - Đọc cấu hình từ config/modbus_config.json
 """
 
 import os
 import json
 import time
-from datetime import datetime
+import atexit
+import threading
+from contextlib import contextmanager
+
+from signal_bus import SignalBus, SignalEvent, SignalSink, POLICY_BLOCK, POLICY_DROP_OLDEST
 
 # Path
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,9 +23,23 @@ CONFIG_PATH = os.path.join(script_dir, "config", "modbus_config.json")
 # Global Modbus client & state
 modbus_client = None
 modbus_config = None
+# Thread duy nhất được phép dùng modbus_client
+modbus_worker = None
+
+# Lệnh đèn đang gom trong light_cycle() của từng thread
+_light_staging = threading.local()
+# (slave_id, coil) -> thời điểm (monotonic) lệnh đèn gần nhất, để self-test không ghi đè đèn của detection
+_last_light_request = {}
+# Thread khởi động Modbus + self-test chạy nền (None = chưa chạy)
+_startup_thread = None
+
+# Bus tín hiệu: console / đèn / file log là các sink chạy trên thread riêng
+signal_bus = None
+_signal_bus_lock = threading.Lock()
 
 # Lưu trạng thái vùng hiện tại của từng label
-# key = label_lower ("songoku"/"dog"), value = "INSIDE" hoặc "OUTSIDE"
+# key = label_lower ("songoku"/"dog"), value = "INSIDE", "WARNING" (sắp ra) hoặc "OUTSIDE"
+# (gộp từ trạng thái từng đối tượng trong ModbusSink)
 last_region_state = {}
 
 
@@ -31,10 +51,13 @@ def load_modbus_config():
         print(f"[MODBUS] ⚠ Không tìm thấy config: {CONFIG_PATH}")
         modbus_config = {
             "enabled": False,
+            "transport": "rtu",
             "port": "COM7",
             "baudrate": 9600,
             "slave_esp32": 1,
-            "slave_esp8266": 2
+            "slave_esp8266": 2,
+            "health_interval_s": 5.0,
+            "reconnect_max_backoff_s": 30.0
         }
         return modbus_config
     
@@ -65,9 +88,42 @@ def save_modbus_config(config):
         return False
 
 
+def create_modbus_client(config):
+    """
+    Tạo client pymodbus theo config
+    - transport "rtu" (mặc định): RS485 qua cổng serial (port, baudrate)
+    - transport "tcp": Modbus TCP (host, tcp_port), vd: tools/modbus_slave_simulator.py
+    
+    Returns:
+        (client, mô tả kết nối)
+    """
+    transport = config.get("transport", "rtu")
+    timeout = config.get("timeout", 1)
+    
+    if transport == "tcp":
+        from pymodbus.client.sync import ModbusTcpClient
+        host = config.get("host", "127.0.0.1")
+        tcp_port = config.get("tcp_port", 502)
+        return ModbusTcpClient(host, port=tcp_port, timeout=timeout), f"TCP {host}:{tcp_port}"
+    
+    from pymodbus.client.sync import ModbusSerialClient
+    port = config.get("port", "COM7")
+    baudrate = config.get("baudrate", 9600)
+    client = ModbusSerialClient(
+        method='rtu',
+        port=port,
+        baudrate=baudrate,
+        parity='N',
+        stopbits=1,
+        bytesize=8,
+        timeout=timeout
+    )
+    return client, f"RS485 tại {port} @ {baudrate}"
+
+
 def init_modbus():
-    """Khởi tạo kết nối Modbus RS485 từ config"""
-    global modbus_client, modbus_config
+    """Khởi tạo kết nối Modbus (RS485 hoặc TCP) từ config"""
+    global modbus_client, modbus_config, modbus_worker
     
     print("[MODBUS] === Bắt đầu init_modbus() ===")
     
@@ -75,221 +131,1024 @@ def init_modbus():
     if modbus_config is None:
         load_modbus_config()
     
-    print(f"[MODBUS] Config: enabled={modbus_config.get('enabled')}, port={modbus_config.get('port')}")
+    print(f"[MODBUS] Config: enabled={modbus_config.get('enabled')}, "
+          f"transport={modbus_config.get('transport', 'rtu')}, port={modbus_config.get('port')}")
     
     if not modbus_config.get("enabled", False):
         print("[MODBUS] ⚠ Modbus chưa được bật trong config")
         print("         → Vào GUI > Tab Modbus > Kết nối để bật")
         return False
     
-    port = modbus_config.get("port", "COM7")
-    baudrate = modbus_config.get("baudrate", 9600)
-    
     try:
-        from pymodbus.client.sync import ModbusSerialClient
-        print(f"[MODBUS] Đang kết nối tới {port}...")
-        
-        client = ModbusSerialClient(
-            method='rtu',
-            port=port,
-            baudrate=baudrate,
-            parity='N',
-            stopbits=1,
-            bytesize=8,
-            timeout=1
-        )
-        
-        if client.connect():
-            modbus_client = client  # Gán vào biến global SAU khi connect thành công
-            slave1 = modbus_config.get("slave_esp32", 1)
-            slave2 = modbus_config.get("slave_esp8266", 2)
-            print(f"[MODBUS] ✅ Đã kết nối RS485 tại {port} @ {baudrate}")
-            print(f"         - Slave {slave1} (ESP32): songoku")
-            print(f"         - Slave {slave2} (ESP8266): dog")
-            print(f"[MODBUS] modbus_client = {modbus_client}")
-            return True
-        else:
-            print(f"[MODBUS] ❌ Không thể kết nối tới {port} (connect() returned False)")
-            modbus_client = None
-            return False
-            
+        client, target = create_modbus_client(modbus_config)
     except ImportError:
         print("[MODBUS] ❌ Thiếu thư viện pymodbus! Chạy: pip install pymodbus==2.5.3")
         return False
+    
+    print(f"[MODBUS] Đang kết nối tới {target}...")
+    try:
+        connected = client.connect()
     except Exception as e:
         print(f"[MODBUS] ❌ Lỗi kết nối: {e}")
-        modbus_client = None
+        connected = False
+    
+    # Worker luôn chạy: lần kết nối đầu thất bại (vd: chưa cắm adapter USB-RS485) thì worker
+    # tự kết nối lại với backoff, lệnh đèn giữ trong hàng đợi và được ghi khi kết nối xong
+    # Kiểm tra sức khỏe mọi slave có trong bảng đèn
+    slave_ids = sorted({slave_id for lights in get_lights_config().values() for slave_id, _ in lights})
+    modbus_worker = ModbusWorker(client, slave_ids=slave_ids,
+                                 health_interval_s=modbus_config.get("health_interval_s", 5.0),
+                                 max_backoff_s=modbus_config.get("reconnect_max_backoff_s", 30.0),
+                                 connected=connected, target=target)
+    modbus_worker.start()
+    modbus_client = client
+    
+    if not connected:
+        print(f"[MODBUS] ❌ Không thể kết nối tới {target} → worker sẽ tự thử kết nối lại")
         return False
+    
+    slave1 = modbus_config.get("slave_esp32", 1)
+    slave2 = modbus_config.get("slave_esp8266", 2)
+    print(f"[MODBUS] ✅ Đã kết nối {target}")
+    print(f"         - Slave {slave1} (ESP32): songoku")
+    print(f"         - Slave {slave2} (ESP8266): dog")
+    print(f"[MODBUS] modbus_client = {modbus_client}")
+    return True
 
 
 def close_modbus():
-    """Đóng kết nối Modbus"""
-    global modbus_client
+    """Đóng kết nối Modbus (tắt đèn và chờ worker ghi xong lệnh cuối)"""
+    global modbus_client, modbus_worker
+    # init_modbus_async() chưa xong thì chờ, tránh kết nối mở ra sau khi đã đóng
+    wait_modbus_ready(timeout=5.0)
+    # ModbusSink xử lý nốt tín hiệu đang chờ trước khi tắt đèn
+    flush_signals()
     if modbus_client:
         turn_off_all_lights()
+        if modbus_worker and not modbus_worker.stop():
+            # Worker còn kẹt trong 1 giao dịch → không đóng client dưới tay nó (thread daemon)
+            print("[MODBUS] ⚠ Worker chưa dừng kịp, bỏ qua đóng cổng")
+            modbus_worker = None
+            modbus_client = None
+            return
+        target = modbus_worker.target if modbus_worker else "Modbus"
+        modbus_worker = None
         modbus_client.close()
-        print("[MODBUS] Đã ngắt kết nối RS485")
+        modbus_client = None
+        print(f"[MODBUS] Đã ngắt kết nối {target}")
+
+
+# Ngưỡng histogram thời gian phản hồi (ms)
+RTT_BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class SlaveHealth:
+    """Thống kê sức khỏe 1 slave: RTT, số lỗi, online/offline"""
+    def __init__(self, slave_id):
+        self.slave_id = slave_id
+        self.online = None  # None = chưa kiểm tra lần nào
+        self.ok_count = 0
+        self.error_count = 0
+        self.consecutive_errors = 0
+        self.last_error = None
+        self.last_rtt_ms = None
+        self.rtt_total_ms = 0.0
+        self.rtt_max_ms = 0.0
+        # histogram[i] = số lần RTT <= RTT_BUCKETS_MS[i], phần tử cuối = lớn hơn mọi ngưỡng
+        self.histogram = [0] * (len(RTT_BUCKETS_MS) + 1)
+        self.next_check = 0.0
+
+    def record_ok(self, rtt_ms):
+        """Ghi nhận 1 giao dịch thành công, trả về True nếu slave vừa online trở lại"""
+        recovered = self.online is False
+        self.online = True
+        self.ok_count += 1
+        self.consecutive_errors = 0
+        self.last_rtt_ms = rtt_ms
+        self.rtt_total_ms += rtt_ms
+        self.rtt_max_ms = max(self.rtt_max_ms, rtt_ms)
+        bucket = next((i for i, limit in enumerate(RTT_BUCKETS_MS) if rtt_ms <= limit), len(RTT_BUCKETS_MS))
+        self.histogram[bucket] += 1
+        return recovered
+
+    def record_error(self, error):
+        """Ghi nhận 1 giao dịch lỗi, trả về True nếu slave vừa chuyển sang offline"""
+        went_offline = self.online is not False
+        self.online = False
+        self.error_count += 1
+        self.consecutive_errors += 1
+        self.last_error = str(error)
+        return went_offline
+
+    def summary(self):
+        """Thống kê dạng dict (để in / hiển thị)"""
+        return {
+            'slave_id': self.slave_id,
+            'online': self.online,
+            'ok': self.ok_count,
+            'errors': self.error_count,
+            'consecutive_errors': self.consecutive_errors,
+            'last_error': self.last_error,
+            'last_rtt_ms': self.last_rtt_ms,
+            'avg_rtt_ms': self.rtt_total_ms / self.ok_count if self.ok_count else None,
+            'max_rtt_ms': self.rtt_max_ms if self.ok_count else None,
+            'histogram': dict(zip([f"<={b}ms" for b in RTT_BUCKETS_MS] + [f">{RTT_BUCKETS_MS[-1]}ms"],
+                                  self.histogram)),
+        }
+
+
+def coil_runs(coils):
+    """
+    Tách các coil cần ghi của 1 slave thành dãy liên tiếp
+
+    Args:
+        coils: dict coil -> state
+    Returns:
+        list (coil bắt đầu, [state, ...])
+    """
+    runs = []
+    for coil in sorted(coils):
+        if runs and coil == runs[-1][0] + len(runs[-1][1]):
+            runs[-1][1].append(coils[coil])
+        else:
+            runs.append((coil, [coils[coil]]))
+    return runs
+
+
+class ModbusWorker(threading.Thread):
+    """
+    Thread ghi coil Modbus
+    - Hàng đợi là dict (slave, coil) -> trạng thái mong muốn: nhiều lệnh cho cùng 1 coil
+      trước khi kịp ghi chỉ còn lệnh cuối cùng
+    - Nhớ trạng thái đã được slave xác nhận → lệnh trùng không bao giờ ra bus RS485
+    - Kiểm tra sức khỏe định kỳ (đọc coil 0 của từng slave) ngay trên thread này
+      → không tranh chấp bus với lệnh ghi; có lệnh ghi mới thì dừng ping, ghi trước rồi ping tiếp
+    - Slave offline chỉ được ping lại khi hết backoff (tính từ giao dịch lỗi gần nhất, kể cả lệnh ghi)
+    - Mất kết nối: tự kết nối lại với backoff, rồi ghi lại trạng thái mong muốn
+    """
+    def __init__(self, client, slave_ids=(), health_interval_s=5.0, max_backoff_s=30.0, connected=True,
+                 target="Modbus"):
+        """
+        Args:
+            connected: client đã kết nối chưa (False → thử kết nối lại sau health_interval_s)
+            target: mô tả kết nối để in log, vd: "RS485 tại COM7 @ 9600", "TCP 127.0.0.1:5020"
+        """
+        super().__init__(name="ModbusWorker")
+        self.client = client
+        self.target = target
+        self._cond = threading.Condition()
+        # (slave_id, coil) -> state chờ ghi
+        self._pending = {}
+        # (slave_id, coil) -> state slave đã xác nhận
+        self._acked = {}
+        # (slave_id, coil) -> state mong muốn mới nhất (để ghi lại sau khi slave phục hồi)
+        self._desired = {}
+        self._busy = False
+        self._running = True
+        self.stats = {'requested': 0, 'coalesced': 0, 'cached': 0, 'written': 0, 'errors': 0,
+                      'transactions': 0, 'reconnects': 0}
+
+        self.health_interval_s = health_interval_s
+        self.max_backoff_s = max_backoff_s
+        self.health = {slave_id: SlaveHealth(slave_id) for slave_id in slave_ids}
+        # health_interval_s = 0 (tắt ping) vẫn phải thử kết nối lại, không lặp liên tục
+        self._reconnect_interval_s = health_interval_s or 1.0
+        self._reconnect_backoff_s = self._reconnect_interval_s
+        # Thời gian chờ trước lần kết nối lại kế tiếp (= backoff của lần thất bại gần nhất)
+        self._reconnect_wait_s = self._reconnect_interval_s
+        self._next_health_check = time.monotonic() + self._reconnect_interval_s
+        self._check_requested = False
+        self._connected = connected
+        self.daemon = True
+
+    def request(self, slave_id, coil, state):
+        """Đặt trạng thái mong muốn cho 1 coil (trả về ngay)"""
+        key = (slave_id, coil)
+        with self._cond:
+            self.stats['requested'] += 1
+            if key in self._pending:
+                self.stats['coalesced'] += 1
+            self._pending[key] = bool(state)
+            self._desired[key] = bool(state)
+            self._cond.notify()
+
+    def acked_state(self, slave_id, coil=0):
+        """Trạng thái coil đã được slave xác nhận (None nếu chưa ghi lần nào)"""
+        with self._cond:
+            return self._acked.get((slave_id, coil))
+
+    def desired_state(self, slave_id, coil=0):
+        """Trạng thái mong muốn mới nhất của coil (None nếu chưa có lệnh nào)"""
+        with self._cond:
+            return self._desired.get((slave_id, coil))
+
+    def _get_health(self, slave_id):
+        health = self.health.get(slave_id)
+        if health is None:
+            health = self.health[slave_id] = SlaveHealth(slave_id)
+        return health
+
+    def _record(self, slave_id, t0, error=None):
+        """
+        Cập nhật thống kê sức khỏe sau 1 giao dịch (ghi hoặc ping) và hẹn lần ping kế tiếp;
+        slave vừa phục hồi → ghi lại trạng thái
+        """
+        health = self._get_health(slave_id)
+        if error is None:
+            if health.record_ok((time.perf_counter() - t0) * 1000.0):
+                print(f"[MODBUS] ✅ Slave {slave_id} đã phản hồi trở lại")
+                self._reassert(slave_id)
+        elif health.record_error(error):
+            print(f"[MODBUS] ❌ Slave {slave_id} không phản hồi: {error}")
+        # Slave offline được ping thưa dần để không chiếm bus (mỗi lần timeout mất ~1s)
+        backoff = 1 if error is None else 2 ** min(health.consecutive_errors, 6)
+        health.next_check = time.monotonic() + min(self.health_interval_s * backoff, self.max_backoff_s)
+
+    def _reassert(self, slave_id=None):
+        """Đưa lại trạng thái mong muốn của slave (hoặc mọi slave) vào hàng đợi"""
+        with self._cond:
+            for key, state in self._desired.items():
+                if slave_id is None or key[0] == slave_id:
+                    self._acked.pop(key, None)
+                    self._pending.setdefault(key, state)
+
+    def request_many(self, states):
+        """Đặt trạng thái mong muốn cho nhiều coil cùng lúc: dict (slave_id, coil) -> state"""
+        if not states:
+            return
+        with self._cond:
+            for key, state in states.items():
+                self.stats['requested'] += 1
+                if key in self._pending:
+                    self.stats['coalesced'] += 1
+                self._pending[key] = bool(state)
+                self._desired[key] = bool(state)
+            self._cond.notify()
+
+    def _write(self, slave_id, coil, values):
+        """
+        Ghi 1 dãy coil liên tiếp bắt đầu từ coil xuống bus, True nếu slave xác nhận
+        - 1 coil: FC5 (write_coil), nhiều coil: FC15 (write_coils) trong 1 giao dịch
+        """
+        t0 = time.perf_counter()
+        try:
+            if len(values) == 1:
+                result = self.client.write_coil(coil, values[0], unit=slave_id)
+            else:
+                result = self.client.write_coils(coil, values, unit=slave_id)
+            self.stats['transactions'] += 1
+            if result is None or result.isError():
+                print(f"[MODBUS] Lỗi điều khiển Slave {slave_id}: {result}")
+                self._record(slave_id, t0, error=result)
+                return False
+            self._record(slave_id, t0)
+            device = {1: "ESP32", 2: "ESP8266"}.get(slave_id, "Slave")
+            if len(values) == 1:
+                status = "🔆 BẬT" if values[0] else "⚫ TẮT"
+                print(f"[MODBUS] {status} đèn {device} (Slave {slave_id})")
+            else:
+                states = " ".join("🔆" if v else "⚫" for v in values)
+                print(f"[MODBUS] Đèn {device} (Slave {slave_id}) coil {coil}-{coil + len(values) - 1}: {states}")
+            return True
+        except Exception as e:
+            print(f"[MODBUS] Lỗi điều khiển Slave {slave_id}: {e}")
+            self._record(slave_id, t0, error=e)
+            return False
+
+    def _ping(self, slave_id):
+        """Đọc coil 0 của slave, True nếu slave trả lời"""
+        t0 = time.perf_counter()
+        try:
+            result = self.client.read_coils(0, 1, unit=slave_id)
+            if result is None or result.isError():
+                self._record(slave_id, t0, error=result)
+                return False
+            self._record(slave_id, t0)
+            return True
+        except Exception as e:
+            self._record(slave_id, t0, error=e)
+            return False
+
+    def _reconnect(self):
+        """Đóng và mở lại kết nối, backoff tăng gấp đôi sau mỗi lần thất bại"""
+        self.stats['reconnects'] += 1
+        try:
+            self.client.close()
+            connected = self.client.connect()
+        except Exception as e:
+            print(f"[MODBUS] Lỗi kết nối lại: {e}")
+            connected = False
+
+        if connected:
+            print(f"[MODBUS] ✅ Đã kết nối lại {self.target}")
+            self._reconnect_backoff_s = self._reconnect_interval_s
+            self._reconnect_wait_s = self._reconnect_interval_s
+            self._connected = True
+            self._reassert()
+        else:
+            self._reconnect_wait_s = self._reconnect_backoff_s
+            self._reconnect_backoff_s = min(self._reconnect_backoff_s * 2, self.max_backoff_s)
+            print(f"[MODBUS] ⚠ Kết nối lại {self.target} thất bại, thử lại sau {self._reconnect_wait_s:.1f}s")
+            self._connected = False
+        return connected
+
+    def _health_check(self):
+        """
+        Ping các slave tới hạn (slave offline chờ hết backoff); cả bus không phản hồi → kết nối lại
+
+        Returns:
+            False nếu dừng giữa chừng để nhường bus cho lệnh ghi mới (các slave còn lại ping sau)
+        """
+        now = time.monotonic()
+        if not self._connected:
+            self._reconnect()
+            self._next_health_check = now + (self._reconnect_interval_s if self._connected
+                                             else self._reconnect_wait_s)
+            return True
+
+        results = []
+        for slave_id, health in self.health.items():
+            if time.monotonic() < health.next_check:
+                continue
+            with self._cond:
+                if self._pending:
+                    # Lệnh đèn không phải chờ ping (mỗi slave offline mất tới ~1s timeout)
+                    self._next_health_check = now
+                    return False
+            results.append(self._ping(slave_id))
+
+        if results and not any(results) and all(h.online is False for h in self.health.values()):
+            # Mọi slave đều im lặng → nhiều khả năng mất kết nối (adapter USB-RS485 / TCP)
+            self._connected = False
+            self._reconnect()
+        self._next_health_check = now + (self.health_interval_s if self._connected
+                                         else self._reconnect_wait_s)
+        return True
+
+    def _health_due(self):
+        if not self.health_interval_s and self._connected:
+            return False
+        return time.monotonic() >= self._next_health_check
+
+    def run(self):
+        while True:
+            with self._cond:
+                timeout = None
+                if self.health_interval_s or not self._connected:
+                    timeout = max(0.0, self._next_health_check - time.monotonic())
+                # Đang mất kết nối thì giữ lệnh trong hàng đợi, chỉ thức dậy để thử kết nối lại
+                self._cond.wait_for(lambda: (self._pending and self._connected) or self._check_requested
+                                    or not self._running, timeout)
+                if not self._running and not (self._pending and self._connected):
+                    # Dừng khi đang mất kết nối: lệnh chưa ghi được thì bỏ
+                    if self._pending:
+                        print(f"[MODBUS] ⚠ Dừng khi mất kết nối, bỏ {len(self._pending)} lệnh chưa ghi")
+                        self._pending = {}
+                    self._cond.notify_all()
+                    return
+                batch = self._pending if self._connected else {}
+                if self._connected:
+                    self._pending = {}
+                self._busy = bool(batch)
+
+            self._write_batch(batch)
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+            if self._check_requested:
+                if self._health_check():
+                    with self._cond:
+                        self._check_requested = False
+                        self._cond.notify_all()
+            elif self._health_due():
+                self._health_check()
+
+    def _write_batch(self, batch):
+        """
+        Ghi 1 đợt lệnh: chỉ các coil khác trạng thái đã xác nhận,
+        gom theo slave và ghi mỗi dãy coil liên tiếp trong 1 giao dịch
+        """
+        changes = {}
+        for (slave_id, coil), state in batch.items():
+            if self._acked.get((slave_id, coil)) == state:
+                self.stats['cached'] += 1
+                continue
+            changes.setdefault(slave_id, {})[coil] = state
+
+        for slave_id, coils in changes.items():
+            for start, values in coil_runs(coils):
+                keys = [(slave_id, start + i) for i in range(len(values))]
+                if self._write(slave_id, start, values):
+                    self.stats['written'] += len(values)
+                    with self._cond:
+                        for key, state in zip(keys, values):
+                            self._acked[key] = state
+                else:
+                    self.stats['errors'] += 1
+                    with self._cond:
+                        # Trạng thái thực không rõ → lần sau phải ghi lại
+                        for key in keys:
+                            self._acked.pop(key, None)
+
+    def check_now(self, timeout=None):
+        """Ping mọi slave ngay (trên thread worker) và chờ kết quả, trả về health_report()"""
+        with self._cond:
+            for health in self.health.values():
+                health.next_check = 0.0
+            self._check_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._check_requested or not self._running, timeout)
+        return self.health_report()
+
+    def flush(self, timeout=None):
+        """Chờ tới khi mọi lệnh đang chờ đã được ghi"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def health_report(self):
+        """Thống kê sức khỏe của từng slave"""
+        return {slave_id: health.summary() for slave_id, health in self.health.items()}
+
+    def stop(self, timeout=5.0):
+        """
+        Ghi nốt lệnh còn lại rồi dừng thread (đang mất kết nối thì bỏ lệnh chờ)
+
+        Returns:
+            True nếu thread đã dừng
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: (not self._pending or not self._connected) and not self._busy, timeout)
+            self._running = False
+            self._cond.notify_all()
+        self.join(timeout)
+        st = self.stats
+        print(f"[MODBUS] Worker: yêu cầu={st['requested']} gộp={st['coalesced']} "
+              f"bỏ (trùng trạng thái)={st['cached']} ghi={st['written']} coil / "
+              f"{st['transactions']} giao dịch lỗi={st['errors']} kết nối lại={st['reconnects']}")
+        print_modbus_health(self.health_report())
+        return not self.is_alive()
+
+
+def print_modbus_health(report):
+    """In thống kê sức khỏe các slave"""
+    for slave_id, h in report.items():
+        status = {True: "🟢 online", False: "🔴 offline", None: "⚪ chưa kiểm tra"}[h['online']]
+        avg = f"{h['avg_rtt_ms']:.1f}" if h['avg_rtt_ms'] is not None else "-"
+        peak = f"{h['max_rtt_ms']:.1f}" if h['max_rtt_ms'] is not None else "-"
+        histogram = " ".join(f"{k}:{v}" for k, v in h['histogram'].items() if v)
+        print(f"[MODBUS] Slave {slave_id}: {status} | ok={h['ok']} lỗi={h['errors']} | "
+              f"RTT TB={avg} ms max={peak} ms | {histogram}")
+
+
+def get_modbus_health():
+    """Thống kê sức khỏe slave hiện tại (dict rỗng nếu Modbus chưa chạy)"""
+    if not modbus_worker:
+        return {}
+    return modbus_worker.health_report()
+
+
+def get_lights_config():
+    """
+    Bảng đèn: label -> list (slave_id, coil)
+    - Đọc từ "lights" trong config, vd: {"dog": [{"slave": 2, "coil": 0}]}
+    - Không có → songoku = slave_esp32, dog = slave_esp8266 (coil 0)
+    """
+    if modbus_config is None:
+        load_modbus_config()
+    
+    lights = modbus_config.get("lights")
+    if not lights:
+        return {
+            "songoku": [(modbus_config.get("slave_esp32", 1), 0)],
+            "dog": [(modbus_config.get("slave_esp8266", 2), 0)],
+        }
+    
+    table = {}
+    for label, entries in lights.items():
+        if isinstance(entries, dict):
+            entries = [entries]
+        table[label.lower()] = [(int(e["slave"]), int(e.get("coil", 0))) for e in entries]
+    return table
+
+
+@contextmanager
+def light_cycle():
+    """
+    Gom mọi lệnh đèn trong 1 chu kỳ detection thành 1 đợt gửi cho ModbusWorker
+    - Tín hiệu (signal_*) được phát lên SignalBus thành 1 đợt; ModbusSink xử lý cả đợt trong 1 cycle
+    
+    Ví dụ:
+        with light_cycle():
+            signal_inside(...)
+            signal_outside(...)
+    → chỉ trạng thái cuối cùng của mỗi coil được gửi, các coil cùng slave được ghi chung
+    """
+    if getattr(_light_staging, 'states', None) is not None:
+        # Đã ở trong 1 cycle (lồng nhau) → dùng chung
+        yield
+        return
+    
+    _light_staging.states = {}
+    _light_staging.events = []
+    try:
+        yield
+    finally:
+        states = _light_staging.states
+        events = _light_staging.events
+        _light_staging.states = None
+        _light_staging.events = None
+        if states and modbus_client and modbus_worker:
+            modbus_worker.request_many(states)
+        if events:
+            get_signal_bus().publish(events)
+
+
+def set_coil(slave_id, coil, state):
+    """
+    Đặt trạng thái 1 coil (không chặn)
+    Trong light_cycle(): chỉ gom lại, gửi khi hết cycle; ngoài cycle: gửi ngay cho worker
+    """
+    if not modbus_client or not modbus_worker:
+        return False
+    
+    _last_light_request[(slave_id, coil)] = time.monotonic()
+    staged = getattr(_light_staging, 'states', None)
+    if staged is not None:
+        staged[(slave_id, coil)] = bool(state)
+    else:
+        modbus_worker.request(slave_id, coil, bool(state))
+    return True
 
 
 def set_light(slave_id, state):
     """
-    Bật/tắt đèn cho slave cụ thể
+    Bật/tắt đèn cho slave cụ thể (không chặn, lệnh được ModbusWorker ghi)
     
     Args:
         slave_id: 1 (ESP32) hoặc 2 (ESP8266)
         state: True (bật) hoặc False (tắt)
     """
-    if not modbus_client:
+    return set_coil(slave_id, 0, state)
+
+
+def set_lights_for_label(label, state):
+    """Bật/tắt mọi đèn gán cho label"""
+    lights = get_lights_config().get(label.lower())
+    if not lights:
         return False
     
-    try:
-        modbus_client.write_coil(0, bool(state), unit=slave_id)
-        status = "🔆 BẬT" if state else "⚫ TẮT"
-        device = "ESP32" if slave_id == 1 else "ESP8266"
-        print(f"[MODBUS] {status} đèn {device} (Slave {slave_id})")
-        return True
-    except Exception as e:
-        print(f"[MODBUS] Lỗi điều khiển Slave {slave_id}: {e}")
-        return False
+    with light_cycle():
+        results = [set_coil(slave_id, coil, state) for slave_id, coil in lights]
+    return all(results)
 
 
 def turn_on_light_for_label(label):
     """Bật đèn tương ứng với label (songoku/dog)"""
-    if modbus_config is None:
-        load_modbus_config()
-    
-    label_lower = label.lower()
-    if label_lower == "songoku":
-        slave_id = modbus_config.get("slave_esp32", 1)
-    elif label_lower == "dog":
-        slave_id = modbus_config.get("slave_esp8266", 2)
-    else:
-        return False
-    
-    return set_light(slave_id, True)
+    return set_lights_for_label(label, True)
 
 
 def turn_off_light_for_label(label):
     """Tắt đèn tương ứng với label"""
-    if modbus_config is None:
-        load_modbus_config()
-    
-    label_lower = label.lower()
-    if label_lower == "songoku":
-        slave_id = modbus_config.get("slave_esp32", 1)
-    elif label_lower == "dog":
-        slave_id = modbus_config.get("slave_esp8266", 2)
-    else:
-        return False
-    
-    return set_light(slave_id, False)
+    return set_lights_for_label(label, False)
+
+
+def set_all_lights(state):
+    """Bật/tắt mọi đèn trong bảng đèn (1 đợt ghi, mỗi dãy coil liên tiếp của 1 slave = 1 giao dịch)"""
+    with light_cycle():
+        for lights in get_lights_config().values():
+            for slave_id, coil in lights:
+                set_coil(slave_id, coil, state)
 
 
 def turn_off_all_lights():
     """Tắt tất cả đèn"""
-    if modbus_config is None:
-        load_modbus_config()
+    set_all_lights(False)
+
+
+# ============ KHỞI ĐỘNG / SELF-TEST ============
+
+def run_self_test(blink_s=0.5):
+    """
+    Tự kiểm tra sau khi kết nối: ping mọi slave rồi nháy toàn bộ đèn
+    - Chạy trên thread nền; mọi lệnh đi qua ModbusWorker nên không tranh chấp bus
+    - Sau khi nháy, mỗi đèn trở về trạng thái mong muốn trước lúc nháy
+      (đèn detection đang bật vẫn bật); đèn được detection đặt lại trong lúc nháy thì giữ nguyên
     
-    slave1 = modbus_config.get("slave_esp32", 1)
-    slave2 = modbus_config.get("slave_esp8266", 2)
-    set_light(slave1, False)
-    set_light(slave2, False)
+    Returns:
+        True nếu mọi slave phản hồi
+    """
+    worker = modbus_worker
+    if not modbus_client or worker is None:
+        return False
+    
+    t0 = time.perf_counter()
+    report = worker.check_now(timeout=10.0)
+    for slave_id, health in report.items():
+        if health['online']:
+            print(f"[MODBUS] Self-test: Slave {slave_id} ✅ ({health['last_rtt_ms']:.1f} ms)")
+        else:
+            print(f"[MODBUS] Self-test: Slave {slave_id} ❌ không phản hồi ({health['last_error']})")
+    
+    saved = {(slave_id, coil): bool(worker.desired_state(slave_id, coil))
+             for lights in get_lights_config().values() for slave_id, coil in lights}
+    set_all_lights(True)
+    blink_started = time.monotonic()
+    time.sleep(blink_s)
+    with light_cycle():
+        for (slave_id, coil), state in saved.items():
+            if _last_light_request.get((slave_id, coil), 0.0) <= blink_started:
+                set_coil(slave_id, coil, state)
+    worker.flush(timeout=5.0)
+    
+    all_online = all(health['online'] for health in report.values())
+    print(f"[MODBUS] Self-test xong sau {time.perf_counter() - t0:.2f}s "
+          f"({'OK' if all_online else 'có slave lỗi'})")
+    return all_online
 
 
-# ============ SIGNAL FUNCTIONS ============
+def _startup(self_test, blink_s):
+    t0 = time.perf_counter()
+    connected = init_modbus()
+    print(f"[MODBUS] Khởi tạo Modbus: {time.perf_counter() - t0:.2f}s")
+    if modbus_worker is None:
+        return
+    # Tín hiệu đến trước khi Modbus sẵn sàng chỉ được ghi nhận trạng thái, chưa bật/tắt đèn
+    # → ModbusSink gửi lại trạng thái đèn hiện tại (xong trước khi self-test lưu trạng thái đèn)
+    signal_modbus_ready()
+    flush_signals()
+    if connected and self_test:
+        run_self_test(blink_s)
 
-def send_signal(signal_type, **kwargs):
+
+def init_modbus_async(self_test=True, blink_s=0.5):
     """
-    Gửi tín hiệu ra console và điều khiển đèn
+    init_modbus() + self-test trên thread nền (chạy song song với load model / kết nối camera)
+    
+    Returns:
+        thread khởi động (join() để chờ xong)
     """
-    timestamp = datetime.now().strftime("%H:%M:%S")
+    global _startup_thread
+    _startup_thread = threading.Thread(target=_startup, args=(self_test, blink_s),
+                                       name="ModbusStartup", daemon=True)
+    _startup_thread.start()
+    return _startup_thread
+
+
+def start_self_test(blink_s=0.5):
+    """Chạy self-test nền nếu chưa có thread khởi động nào làm việc này"""
+    global _startup_thread
+    if _startup_thread is not None:
+        return _startup_thread
+    _startup_thread = threading.Thread(target=run_self_test, args=(blink_s,),
+                                       name="ModbusSelfTest", daemon=True)
+    _startup_thread.start()
+    return _startup_thread
+
+
+def wait_modbus_ready(timeout=None):
+    """Chờ thread khởi động / self-test xong (True nếu đã xong)"""
+    if _startup_thread is None:
+        return True
+    _startup_thread.join(timeout)
+    return not _startup_thread.is_alive()
+
+
+# ============ SIGNAL SINKS ============
+
+# Cấu hình mặc định các sink (ghi đè bằng "signal_sinks" trong modbus_config.json)
+DEFAULT_SIGNAL_SINKS = {
+    "console": {"enabled": True, "queue_size": 1000, "policy": POLICY_DROP_OLDEST},
+    # Đèn phụ thuộc chuyển trạng thái TRONG/NGOÀI → hạn chế bỏ tín hiệu
+    "modbus": {"enabled": True, "queue_size": 200, "policy": POLICY_BLOCK, "block_timeout_s": 0.05},
+    "file_log": {"enabled": False, "queue_size": 1000, "policy": POLICY_DROP_OLDEST,
+                 "path": os.path.join("output", "signals.jsonl")},
+}
+
+
+class ConsoleSink(SignalSink):
+    """In tín hiệu ra console"""
+    name = "console"
     
-    if signal_type == "DETECT_INSIDE":
-        label = kwargs.get('label', 'unknown')
-        label_lower = label.lower()
-        x = kwargs.get('x', 0)
-        y = kwargs.get('y', 0)
-        cam = kwargs.get('camera_id', 0)
-        person_id = kwargs.get('person_id', 0)
+    def handle(self, event):
+        signal_type = event.signal_type
+        timestamp = event.time_str()
         
-        console_msg = f"🟢 [TRONG VÙNG] {label} | Cam{cam} | BIM({x:.1f}, {y:.1f}) | ID={person_id}"
-        print(f"[{timestamp}] {console_msg}")
+        if signal_type == "DETECT_INSIDE":
+            console_msg = (f"🟢 [TRONG VÙNG] {event.get('label', 'unknown')} | Cam{event.get('camera_id', 0)} "
+                           f"| BIM({event.get('x', 0):.1f}, {event.get('y', 0):.1f}) | ID={event.get('person_id', 0)}")
+            if event.get('object_id') is not None:
+                console_msg += f" | Obj #{event.get('object_id')}"
+            
+        elif signal_type == "DETECT_OUTSIDE":
+            console_msg = (f"🔴 [NGOÀI VÙNG - {event.get('direction', 'UNKNOWN')}] {event.get('label', 'unknown')} "
+                           f"| Cam{event.get('camera_id', 0)} | BIM({event.get('x', 0):.1f}, {event.get('y', 0):.1f})")
+            if event.get('object_id') is not None:
+                console_msg += f" | Obj #{event.get('object_id')}"
+            
+        elif signal_type == "EXIT_WARNING":
+            console_msg = (f"🟠 [SẮP RA NGOÀI - {event.get('direction', 'UNKNOWN')}] {event.get('label', 'unknown')} "
+                           f"| Cam{event.get('camera_id', 0)} | BIM({event.get('x', 0):.1f}, {event.get('y', 0):.1f}) "
+                           f"| còn {event.get('eta_s', 0.0):.2f}s")
+            if event.get('track_id') is not None:
+                console_msg += f" | Track #{event.get('track_id')}"
+            if event.get('object_id') is not None:
+                console_msg += f" | Obj #{event.get('object_id')}"
+            
+        elif signal_type == "OBJECT_LOST":
+            console_msg = f"⚪ [MẤT DẤU] {event.get('label', 'unknown')} | Obj #{event.get('object_id')}"
+            if event.get('last_state') in ("OUTSIDE", "WARNING"):
+                console_msg += " | giữ cảnh báo tới khi xác nhận TRONG / xác nhận cảnh báo"
+            
+        elif signal_type == "ALARM_ACK":
+            console_msg = f"✔️ [XÁC NHẬN CẢNH BÁO] {event.get('label') or 'tất cả'}"
+            
+        elif signal_type == "ZONE_EVENT":
+            icon = "⛔" if event.get('zone_type', 'work') == "exclusion" else "📍"
+            action = "VÀO" if event.get('event', 'ENTER') == "ENTER" else "RA"
+            console_msg = (f"{icon} [{action} VÙNG {event.get('zone', 'unknown')}] {event.get('label', 'unknown')} "
+                           f"| BIM({event.get('x', 0):.1f}, {event.get('y', 0):.1f})")
+            if event.get('object_id') is not None:
+                console_msg += f" | Obj #{event.get('object_id')}"
+            
+        elif signal_type == "CALIBRATION_DONE":
+            console_msg = f"✅ [CALIBRATION DONE] Camera {event.get('camera_id', 0)} đã calibrate xong!"
+            
+        elif signal_type == "SYSTEM_READY":
+            console_msg = "🚀 [SYSTEM READY] Hệ thống đã sẵn sàng!"
+            
+        elif signal_type == "MODBUS_READY":
+            console_msg = "🔌 [MODBUS READY] Modbus đã khởi tạo, gửi lại trạng thái đèn"
+            
+        elif signal_type == "SYSTEM_STOP":
+            console_msg = "⏹️ [SYSTEM STOP] Hệ thống đã dừng!"
+            
+        elif signal_type == "DB_SAVED":
+            console_msg = f"💾 [DB SAVED] Đã lưu {event.get('count', 0)} tọa độ vào database"
+            
+        else:
+            console_msg = f"❓ [UNKNOWN] {signal_type}"
         
-        # Vật VÀO vùng BIM
-        # Chỉ gửi tín hiệu TẮT đèn nếu trước đó đang Ở NGOÀI vùng
-        prev_state = last_region_state.get(label_lower)
-        last_region_state[label_lower] = "INSIDE"
-        if modbus_client and prev_state == "OUTSIDE":
-            print(f"         >>> MODBUS: {label} từ NGOÀI → TRONG, TẮT đèn")
-            turn_off_light_for_label(label)
+        print(f"[{timestamp}] {console_msg}")
+
+
+class ModbusSink(SignalSink):
+    """
+    Điều khiển đèn theo tín hiệu
+    - Mỗi đợt tín hiệu (1 chu kỳ detection) được xử lý trong 1 light_cycle() → 1 đợt ghi coil
+    - Trạng thái theo từng đối tượng (object_id); đèn của label BẬT khi có ít nhất 1 đối tượng
+      của label đó ở NGOÀI hoặc SẮP RA, chỉ gửi lệnh khi trạng thái label đổi (last_region_state)
+    - Đối tượng mất dấu khi đang NGOÀI / SẮP RA vẫn giữ cảnh báo (như khi theo label trước đây)
+      tới khi có đối tượng cùng label được xác nhận TRONG hoặc cảnh báo được xác nhận (ALARM_ACK)
+    """
+    name = "modbus"
+    
+    def __init__(self):
+        # label_lower -> {object_id (hoặc label nếu tín hiệu không có object_id): state}
+        self.object_states = {}
+        # label_lower -> set key đối tượng đã mất dấu nhưng còn giữ cảnh báo
+        self.lost_alarms = {}
+    
+    def handle_batch(self, events):
+        with light_cycle():
+            for event in events:
+                self.handle(event)
+    
+    def handle(self, event):
+        signal_type = event.signal_type
         
-    elif signal_type == "DETECT_OUTSIDE":
-        label = kwargs.get('label', 'unknown')
+        if signal_type == "DETECT_INSIDE":
+            self.update_object(event, "INSIDE")
+        elif signal_type == "DETECT_OUTSIDE":
+            self.update_object(event, "OUTSIDE")
+        elif signal_type == "EXIT_WARNING":
+            self.update_object(event, "WARNING")
+        elif signal_type == "OBJECT_LOST":
+            self.update_object(event, None)
+        elif signal_type == "ALARM_ACK":
+            self.acknowledge(event.get('label'))
+            
+        elif signal_type == "MODBUS_READY":
+            self.resend_lights()
+            
+        elif signal_type == "SYSTEM_READY":
+            # Self-test (ping slave + nháy đèn) chạy nền, không chặn vòng hiển thị
+            if modbus_client and modbus_config:
+                start_self_test()
+            
+        elif signal_type == "SYSTEM_STOP":
+            # Tắt tất cả đèn khi dừng
+            if modbus_client:
+                turn_off_all_lights()
+    
+    def update_object(self, event, state):
+        """Cập nhật trạng thái 1 đối tượng, BẬT/TẮT đèn khi trạng thái cả label đổi"""
+        label = event.get('label', 'unknown')
         label_lower = label.lower()
-        x = kwargs.get('x', 0)
-        y = kwargs.get('y', 0)
-        cam = kwargs.get('camera_id', 0)
-        direction = kwargs.get('direction', 'UNKNOWN')
+        object_id = event.get('object_id')
+        key = object_id if object_id is not None else label_lower
         
-        console_msg = f"🔴 [NGOÀI VÙNG - {direction}] {label} | Cam{cam} | BIM({x:.1f}, {y:.1f})"
-        print(f"[{timestamp}] {console_msg}")
+        states = self.object_states.setdefault(label_lower, {})
+        lost = self.lost_alarms.setdefault(label_lower, set())
+        if state is None:
+            if states.get(key) in ("OUTSIDE", "WARNING"):
+                # Mất dấu khi đang ở ngoài → giữ cảnh báo
+                lost.add(key)
+            else:
+                states.pop(key, None)
+        else:
+            if state == "INSIDE":
+                # Label đã được xác nhận TRONG → bỏ cảnh báo của các đối tượng đã mất dấu
+                for lost_key in lost:
+                    states.pop(lost_key, None)
+                lost.clear()
+            lost.discard(key)
+            states[key] = state
+        self.apply_label_state(label, event)
+    
+    def acknowledge(self, label=None):
+        """Xác nhận cảnh báo: bỏ cảnh báo của đối tượng đã mất dấu (label None = mọi label)"""
+        labels = [label.lower()] if label else list(self.lost_alarms)
+        for label_lower in labels:
+            lost = self.lost_alarms.get(label_lower)
+            if not lost:
+                continue
+            states = self.object_states.get(label_lower, {})
+            for key in lost:
+                states.pop(key, None)
+            print(f"         >>> MODBUS: đã xác nhận cảnh báo {label_lower} ({len(lost)} đối tượng mất dấu)")
+            lost.clear()
+            self.apply_label_state(label_lower)
+    
+    def apply_label_state(self, label, event=None):
+        """Tính trạng thái label từ trạng thái các đối tượng, BẬT/TẮT đèn khi trạng thái label đổi"""
+        label_lower = label.lower()
+        states = self.object_states.get(label_lower, {})
         
-        # Vật RA NGOÀI vùng BIM
-        # Chỉ gửi tín hiệu BẬT đèn nếu trước đó đang Ở TRONG vùng (hoặc chưa có trạng thái)
+        # Label: NGOÀI nếu có đối tượng ngoài, SẮP RA nếu có đối tượng sắp ra, còn lại TRONG
+        if "OUTSIDE" in states.values():
+            label_state = "OUTSIDE"
+        elif "WARNING" in states.values():
+            label_state = "WARNING"
+        else:
+            label_state = "INSIDE"
         prev_state = last_region_state.get(label_lower)
-        last_region_state[label_lower] = "OUTSIDE"
-        if modbus_client and prev_state != "OUTSIDE":
-            print(f"         >>> MODBUS: {label} từ TRONG → NGOÀI ({direction}), BẬT đèn")
-            turn_on_light_for_label(label)
-        
-    elif signal_type == "CALIBRATION_DONE":
-        cam = kwargs.get('camera_id', 0)
-        console_msg = f"✅ [CALIBRATION DONE] Camera {cam} đã calibrate xong!"
-        print(f"[{timestamp}] {console_msg}")
-        
-    elif signal_type == "SYSTEM_READY":
-        console_msg = "🚀 [SYSTEM READY] Hệ thống đã sẵn sàng!"
-        print(f"[{timestamp}] {console_msg}")
-        
-        # Nhấp nháy đèn để test kết nối
-        if modbus_client and modbus_config:
-            print("[MODBUS] Test đèn...")
-            slave1 = modbus_config.get("slave_esp32", 1)
-            slave2 = modbus_config.get("slave_esp8266", 2)
-            set_light(slave1, True)
-            set_light(slave2, True)
-            time.sleep(0.5)
-            turn_off_all_lights()
-        
-    elif signal_type == "SYSTEM_STOP":
-        console_msg = "⏹️ [SYSTEM STOP] Hệ thống đã dừng!"
-        print(f"[{timestamp}] {console_msg}")
-        
-        # Tắt tất cả đèn khi dừng
-        if modbus_client:
-            turn_off_all_lights()
-        
-    elif signal_type == "DB_SAVED":
-        count = kwargs.get('count', 0)
-        console_msg = f"💾 [DB SAVED] Đã lưu {count} tọa độ vào database"
-        print(f"[{timestamp}] {console_msg}")
+        last_region_state[label_lower] = label_state
         
+        light_on = label_state in ("OUTSIDE", "WARNING")
+        if not modbus_client or light_on == (prev_state in ("OUTSIDE", "WARNING")):
+            return
+        if light_on:
+            reason = "sắp ra NGOÀI" if label_state == "WARNING" else "ra NGOÀI"
+            direction = event.get('direction', 'UNKNOWN') if event is not None else 'UNKNOWN'
+            print(f"         >>> MODBUS: {label} {reason} ({direction}), BẬT đèn")
+            turn_on_light_for_label(label)
+        else:
+            print(f"         >>> MODBUS: {label} không còn đối tượng ở ngoài, TẮT đèn")
+            turn_off_light_for_label(label)
+
+    def resend_lights(self):
+        """Gửi lại trạng thái đèn của mọi label đã biết (khi Modbus vừa sẵn sàng)"""
+        if not modbus_client:
+            return
+        for label_lower, label_state in last_region_state.items():
+            set_lights_for_label(label_lower, label_state in ("OUTSIDE", "WARNING"))
+
+
+class FileLogSink(SignalSink):
+    """Ghi mỗi tín hiệu thành 1 dòng JSON (output/signals.jsonl)"""
+    name = "file_log"
+    
+    def __init__(self, path):
+        self.path = path if os.path.isabs(path) else os.path.join(script_dir, path)
+        self.file = None
+    
+    def handle_batch(self, events):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, 'a', encoding='utf-8')
+        for event in events:
+            self.file.write(json.dumps(event.to_dict(), ensure_ascii=False, default=str) + "\n")
+        self.file.flush()
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def create_signal_bus(sinks_config=None):
+    """
+    Tạo SignalBus với các sink bật trong config
+    
+    Args:
+        sinks_config: dict tên sink -> {enabled, queue_size, policy, block_timeout_s, ...}
+                      (None = "signal_sinks" trong modbus_config.json)
+    """
+    if sinks_config is None:
+        if modbus_config is None:
+            load_modbus_config()
+        sinks_config = modbus_config.get("signal_sinks", {})
+    
+    bus = SignalBus()
+    for name, defaults in DEFAULT_SIGNAL_SINKS.items():
+        cfg = {**defaults, **sinks_config.get(name, {})}
+        if not cfg.get("enabled", True):
+            continue
+        if name == "console":
+            sink = ConsoleSink()
+        elif name == "modbus":
+            sink = ModbusSink()
+        else:
+            sink = FileLogSink(cfg["path"])
+        bus.register(sink, queue_size=cfg["queue_size"], policy=cfg["policy"],
+                     block_timeout_s=cfg.get("block_timeout_s", 0.05))
+    return bus
+
+
+def get_signal_bus():
+    """SignalBus dùng chung (tạo lần đầu khi có tín hiệu)"""
+    global signal_bus
+    with _signal_bus_lock:
+        if signal_bus is None:
+            signal_bus = create_signal_bus()
+            atexit.register(close_signal_bus)
+        return signal_bus
+
+
+def register_signal_sink(sink, queue_size=1000, policy=POLICY_DROP_OLDEST, block_timeout_s=0.05):
+    """Thêm sink (còi, PLC, socket, ...) vào bus dùng chung"""
+    return get_signal_bus().register(sink, queue_size=queue_size, policy=policy, block_timeout_s=block_timeout_s)
+
+
+def flush_signals(timeout=2.0):
+    """Chờ các sink xử lý hết tín hiệu đang chờ"""
+    if signal_bus is not None:
+        signal_bus.flush(timeout)
+
+
+def close_signal_bus(timeout=2.0):
+    """Xử lý nốt tín hiệu rồi dừng mọi sink"""
+    global signal_bus
+    with _signal_bus_lock:
+        bus, signal_bus = signal_bus, None
+    if bus is not None:
+        bus.close(timeout)
+
+
+# ============ SIGNAL FUNCTIONS ============
+
+def send_signal(signal_type, **kwargs):
+    """
+    Phát tín hiệu lên SignalBus (không chặn)
+    Trong light_cycle(): gom lại, phát cả đợt khi hết cycle
+    """
+    event = SignalEvent(signal_type, kwargs)
+    staged = getattr(_light_staging, 'events', None)
+    if staged is not None:
+        staged.append(event)
     else:
-        console_msg = f"❓ [UNKNOWN] {signal_type}"
-        print(f"[{timestamp}] {console_msg}")
+        get_signal_bus().publish(event)
 
 
 # ============ SHORTCUT FUNCTIONS ============
 
-def signal_inside(label, x, y, camera_id, person_id=0):
+def signal_inside(label, x, y, camera_id, person_id=0, object_id=None):
     """Tín hiệu khi vật vào trong vùng BIM → TẮT đèn"""
     return send_signal("DETECT_INSIDE", label=label, x=x, y=y, 
-                       camera_id=camera_id, person_id=person_id)
+                       camera_id=camera_id, person_id=person_id, object_id=object_id)
 
-def signal_outside(label, x, y, camera_id, direction="UNKNOWN"):
+def signal_outside(label, x, y, camera_id, direction="UNKNOWN", object_id=None):
     """Tín hiệu khi vật ở ngoài vùng BIM → BẬT đèn"""
     return send_signal("DETECT_OUTSIDE", label=label, x=x, y=y, 
-                       camera_id=camera_id, direction=direction)
+                       camera_id=camera_id, direction=direction, object_id=object_id)
+
+
+def signal_exit_warning(label, x, y, camera_id, eta_s, direction="UNKNOWN", track_id=None, object_id=None):
+    """Cảnh báo sớm khi vật sắp ra khỏi vùng BIM → BẬT đèn trước"""
+    return send_signal("EXIT_WARNING", label=label, x=x, y=y, camera_id=camera_id,
+                       eta_s=eta_s, direction=direction, track_id=track_id, object_id=object_id)
+
+
+def signal_object_lost(label, object_id, last_state=None):
+    """
+    Đối tượng không còn được camera nào thấy
+    - last_state TRONG: bỏ trạng thái của nó (đèn tắt nếu không còn ai ở ngoài)
+    - last_state NGOÀI / SẮP RA: đèn giữ BẬT tới khi label được xác nhận TRONG hoặc acknowledge_alarm()
+    """
+    return send_signal("OBJECT_LOST", label=label, object_id=object_id, last_state=last_state)
+
+
+def acknowledge_alarm(label=None):
+    """Người vận hành xác nhận cảnh báo của đối tượng đã mất dấu (label None = mọi label)"""
+    return send_signal("ALARM_ACK", label=label)
+
+
+def signal_zone_event(label, zone, event, x, y, zone_type="work", object_id=None):
+    """Tín hiệu khi vật VÀO (event="ENTER") hoặc RA (event="EXIT") 1 vùng trong zones.json"""
+    return send_signal("ZONE_EVENT", label=label, zone=zone, event=event, x=x, y=y,
+                       zone_type=zone_type, object_id=object_id)
 
 
 def get_outside_direction(x, y, bim_bounds):
@@ -324,6 +1183,10 @@ def signal_ready():
     """Tín hiệu hệ thống sẵn sàng"""
     return send_signal("SYSTEM_READY")
 
+def signal_modbus_ready():
+    """Tín hiệu Modbus đã khởi tạo (ModbusSink gửi lại trạng thái đèn)"""
+    return send_signal("MODBUS_READY")
+
 def signal_stop():
     """Tín hiệu hệ thống dừng"""
     return send_signal("SYSTEM_STOP")
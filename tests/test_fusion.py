@@ -0,0 +1,78 @@
+"""
+Kiểm tra gộp detection 2 camera trong hệ BIM (CrossCameraFusion)
+Đồng hồ giả: timestamp ghi thẳng vào detection
+Chạy: python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fusion import CrossCameraFusion
+
+
+def det(x, y, timestamp, label="dog", confidence=0.8, track_id=None, inside_bim=True):
+    return {'label': label, 'bim': (x, y), 'confidence': confidence, 'timestamp': timestamp,
+            'track_id': track_id, 'inside_bim': inside_bim}
+
+
+def test_same_object_seen_by_both_cameras():
+    fusion = CrossCameraFusion(association_distance=2.0)
+    fusion.update(1, [det(10.0, 5.0, 0.0, confidence=0.9)], 0.0)
+    objects = fusion.update(2, [det(11.0, 5.0, 0.0, confidence=0.3, inside_bim=False)], 0.0)
+
+    assert len(objects) == 1
+    obj = objects[0]
+    assert obj['cameras'] == [1, 2]
+    # Vị trí gộp theo trọng số confidence
+    assert obj['bim'] == pytest.approx((10.25, 5.0))
+    assert obj['confidence'] == pytest.approx(0.9)
+    # 1 camera thấy ở ngoài → đối tượng ở ngoài
+    assert obj['inside_bim'] is False
+
+
+def test_far_or_different_label_stay_separate():
+    fusion = CrossCameraFusion(association_distance=2.0)
+    fusion.update(1, [det(10.0, 5.0, 0.0), det(30.0, 5.0, 0.0, label="songoku")], 0.0)
+    objects = fusion.update(2, [det(15.0, 5.0, 0.0), det(30.5, 5.0, 0.0)], 0.0)
+
+    assert len(objects) == 4
+    assert len({obj['object_id'] for obj in objects}) == 4
+
+
+def test_track_keeps_object_id_beyond_association_distance():
+    fusion = CrossCameraFusion(association_distance=1.0)
+    first = fusion.update(1, [det(10.0, 5.0, 0.0, track_id=7)], 0.0)
+    # Nhảy xa hơn association_distance nhưng cùng track → cùng đối tượng
+    second = fusion.update(1, [det(13.0, 5.0, 0.1, track_id=7)], 0.1)
+
+    assert [obj['object_id'] for obj in second] == [first[0]['object_id']]
+    assert second[0]['bim'] == pytest.approx((13.0, 5.0))
+    assert second[0]['track_ids'] == {1: 7}
+
+
+def test_new_frame_replaces_camera_observations():
+    fusion = CrossCameraFusion(association_distance=2.0)
+    fusion.update(1, [det(10.0, 5.0, 0.0)], 0.0)
+    fusion.update(2, [det(10.5, 5.0, 0.0)], 0.0)
+    # Camera 1 không còn thấy → đối tượng vẫn còn nhờ camera 2
+    objects = fusion.update(1, [], 0.1)
+
+    assert len(objects) == 1
+    assert objects[0]['cameras'] == [2]
+    assert objects[0]['bim'] == pytest.approx((10.5, 5.0))
+
+
+def test_stale_observations_expire():
+    fusion = CrossCameraFusion(association_distance=2.0, max_age_s=1.0)
+    fusion.update(1, [det(10.0, 5.0, 0.0)], 0.0)
+    objects = fusion.update(2, [det(10.5, 5.0, 0.5)], 0.5)
+    assert objects[0]['cameras'] == [1, 2]
+
+    # Camera 1 mất frame quá max_age_s → chỉ còn quan sát của camera 2
+    objects = fusion.snapshot(1.2)
+    assert objects[0]['cameras'] == [2]
+    assert fusion.snapshot(2.0) == []
@@ -0,0 +1,134 @@
+"""
+Kiểm tra ModbusWorker: gộp lệnh cùng coil, bỏ lệnh trùng trạng thái đã xác nhận, ghi lại sau lỗi
+Client Modbus giả: ghi nhận lệnh ghi, có thể giữ lệnh ghi đầu tiên để lệnh mới dồn lại
+Chạy: python -m pytest -q tests
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from signal_output import ModbusWorker
+
+
+class FakeResult:
+    def __init__(self, error=False):
+        self.error = error
+
+    def isError(self):
+        return self.error
+
+
+class FakeClient:
+    def __init__(self, failing_slaves=()):
+        self.writes = []
+        self.failing_slaves = set(failing_slaves)
+        # Giữ lệnh ghi đầu tiên tới khi release được set
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def write_coil(self, coil, state, unit):
+        self.entered.set()
+        self.release.wait(5.0)
+        self.writes.append((unit, coil, state))
+        return FakeResult(error=unit in self.failing_slaves)
+
+    def write_coils(self, coil, values, unit):
+        for i, state in enumerate(values):
+            self.writes.append((unit, coil + i, state))
+        return FakeResult(error=unit in self.failing_slaves)
+
+    def read_coils(self, address, count, unit):
+        return FakeResult()
+
+    def close(self):
+        pass
+
+    def connect(self):
+        return True
+
+
+def start_worker(client):
+    worker = ModbusWorker(client)
+    worker.start()
+    return worker
+
+
+def test_coalesces_requests_while_bus_busy():
+    client = FakeClient()
+    client.release.clear()
+    worker = start_worker(client)
+    try:
+        worker.request(1, 0, True)
+        assert client.entered.wait(5.0)
+        # Worker đang kẹt trong lệnh ghi đầu → các lệnh cho cùng coil chỉ còn lệnh cuối
+        worker.request(2, 0, True)
+        worker.request(2, 0, False)
+        worker.request(2, 0, True)
+        client.release.set()
+        assert worker.flush(5.0)
+    finally:
+        client.release.set()
+        worker.stop()
+
+    assert client.writes == [(1, 0, True), (2, 0, True)]
+    assert worker.stats['requested'] == 4
+    assert worker.stats['coalesced'] == 2
+    assert worker.stats['written'] == 2
+
+
+def test_acked_state_skips_duplicate_writes():
+    client = FakeClient()
+    worker = start_worker(client)
+    try:
+        worker.request(1, 0, True)
+        assert worker.flush(5.0)
+        assert worker.acked_state(1, 0) is True
+
+        worker.request(1, 0, True)
+        assert worker.flush(5.0)
+        worker.request(1, 0, False)
+        assert worker.flush(5.0)
+    finally:
+        worker.stop()
+
+    assert client.writes == [(1, 0, True), (1, 0, False)]
+    assert worker.stats['cached'] == 1
+    assert worker.acked_state(1, 0) is False
+
+
+def test_failed_write_is_not_acked():
+    client = FakeClient(failing_slaves={3})
+    worker = start_worker(client)
+    try:
+        worker.request(3, 0, True)
+        assert worker.flush(5.0)
+        assert worker.acked_state(3, 0) is None
+
+        # Trạng thái thực không rõ → cùng lệnh phải ghi lại
+        client.failing_slaves.clear()
+        worker.request(3, 0, True)
+        assert worker.flush(5.0)
+    finally:
+        worker.stop()
+
+    assert client.writes == [(3, 0, True), (3, 0, True)]
+    assert worker.stats['errors'] == 1
+    assert worker.acked_state(3, 0) is True
+
+
+def test_stop_writes_pending_requests():
+    client = FakeClient()
+    client.release.clear()
+    worker = start_worker(client)
+    worker.request(1, 0, True)
+    assert client.entered.wait(5.0)
+    worker.request(2, 0, True)
+    client.release.set()
+    worker.stop()
+
+    assert not worker.is_alive()
+    assert client.writes == [(1, 0, True), (2, 0, True)]
@@ -0,0 +1,148 @@
+"""
+Kiểm tra persistence stage: gộp / bỏ snapshot khi hàng đợi đầy và dựng dòng ghi database / log CSV
+Database và log CSV giả: chỉ nhớ các dòng được ghi
+Chạy: python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import (PersistenceThread, SNAPSHOT_DETECTIONS, SNAPSHOT_OBJECTS,
+                         POLICY_MERGE, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST)
+
+PERSON_IDS = {"songoku": 1, "dog": 2}
+
+
+class FakeDatabaseWriter:
+    def __init__(self):
+        self.history = []
+        self.temp = []
+
+    def write_history(self, rows):
+        self.history.extend(rows)
+        return True
+
+    def write_temp(self, coords):
+        self.temp.append(list(coords))
+        return True
+
+
+class FakeCsvLog:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+
+def make_thread(**kwargs):
+    params = dict(queue_size=1, policy=POLICY_MERGE, stats_interval_s=0)
+    params.update(kwargs)
+    return PersistenceThread(FakeDatabaseWriter(), FakeCsvLog(), PERSON_IDS, **params)
+
+
+def det(label, x, y, timestamp, track_id=None, confidence=0.8):
+    return {'label': label, 'bim': (x, y), 'timestamp': timestamp, 'track_id': track_id,
+            'confidence': confidence}
+
+
+def obj(object_id, label, x, y, track_ids=None, confidence=0.8, state="INSIDE"):
+    return {'object_id': object_id, 'label': label, 'bim': (x, y), 'confidence': confidence,
+            'cameras': sorted(track_ids or {1: None}), 'track_ids': track_ids or {1: None},
+            'inside_bim': True, 'state': state}
+
+
+def queued(thread):
+    return list(thread._queue)
+
+
+def test_merge_detections_of_same_camera():
+    thread = make_thread()
+    assert thread.submit(SNAPSHOT_DETECTIONS, 1.0, [obj(1, "dog", 0, 0, {1: 5})], camera_id=1,
+                         detections=[det("dog", 0, 0, 1.0, track_id=5)])
+    assert thread.submit(SNAPSHOT_DETECTIONS, 2.0, [obj(2, "songoku", 1, 1, {1: 6})], camera_id=1,
+                         detections=[det("songoku", 1, 1, 2.0, track_id=6)])
+
+    assert thread.stats['merged'] == 1 and thread.stats['dropped'] == 0
+    (snapshot,) = queued(thread)
+    # Lịch sử không mất dòng, giữ cả đối tượng của track cũ
+    assert [d['timestamp'] for d in snapshot['detections']] == [1.0, 2.0]
+    assert sorted(o['object_id'] for o in snapshot['objects']) == [1, 2]
+    assert snapshot['timestamp'] == 2.0
+
+
+def test_merge_objects_keeps_newest():
+    thread = make_thread()
+    thread.submit(SNAPSHOT_OBJECTS, 1.0, [obj(1, "dog", 0, 0)])
+    thread.submit(SNAPSHOT_OBJECTS, 2.0, [obj(1, "dog", 3, 4)])
+
+    (snapshot,) = queued(thread)
+    assert snapshot['timestamp'] == 2.0
+    assert snapshot['objects'][0]['bim'] == (3, 4)
+
+
+def test_merge_falls_back_to_drop_oldest():
+    # Khác camera → không gộp được
+    thread = make_thread()
+    thread.submit(SNAPSHOT_DETECTIONS, 1.0, [], camera_id=1, detections=[det("dog", 0, 0, 1.0)])
+    thread.submit(SNAPSHOT_DETECTIONS, 2.0, [], camera_id=2, detections=[det("dog", 0, 0, 2.0)])
+    assert [s['camera_id'] for s in queued(thread)] == [2]
+    assert thread.stats['dropped'] == 1
+
+    # Vượt max_merged_detections → không gộp được
+    thread = make_thread(max_merged_detections=2)
+    thread.submit(SNAPSHOT_DETECTIONS, 1.0, [], camera_id=1, detections=[det("dog", 0, 0, 1.0)] * 2)
+    thread.submit(SNAPSHOT_DETECTIONS, 2.0, [], camera_id=1, detections=[det("dog", 0, 0, 2.0)])
+    assert [s['timestamp'] for s in queued(thread)] == [2.0]
+    assert thread.stats['dropped'] == 1 and thread.stats['merged'] == 0
+
+
+@pytest.mark.parametrize("policy, kept, accepted", [(POLICY_DROP_OLDEST, 2.0, True),
+                                                     (POLICY_DROP_NEWEST, 1.0, False)])
+def test_drop_policies(policy, kept, accepted):
+    thread = make_thread(policy=policy)
+    thread.submit(SNAPSHOT_OBJECTS, 1.0, [obj(1, "dog", 0, 0)])
+    assert thread.submit(SNAPSHOT_OBJECTS, 2.0, [obj(1, "dog", 1, 1)]) is accepted
+    assert [s['timestamp'] for s in queued(thread)] == [kept]
+    assert thread.stats['dropped'] == 1 and thread.stats['merged'] == 0
+
+
+def test_history_rows():
+    thread = make_thread(queue_size=10, run_id="run-1")
+    thread.start()
+    objects = [obj(7, "dog", 1, 2, {1: 5}, state="OUTSIDE")]
+    thread.submit(SNAPSHOT_DETECTIONS, 1.0, objects, camera_id=1,
+                  detections=[det("dog", 1, 2, 1.0, track_id=5), det("songoku", 3, 4, 1.0)])
+    thread.close()
+
+    rows = thread.db_writer.history
+    assert [(r['run_id'], r['camera_id'], r['track_id'], r['object_id'], r['person_ID'], r['state'])
+            for r in rows] == [("run-1", "1", 5, 7, 2, "OUTSIDE"), ("run-1", "1", None, None, 1, None)]
+    assert thread.stats['persisted'] == 1
+
+
+def test_history_disabled():
+    thread = make_thread(queue_size=10, record_history=False)
+    thread.start()
+    thread.submit(SNAPSHOT_DETECTIONS, 1.0, [], camera_id=1, detections=[det("dog", 1, 2, 1.0)])
+    thread.close()
+    assert thread.db_writer.history == []
+
+
+def test_objects_rows():
+    saved = []
+    thread = make_thread(queue_size=10, status_names={"OUTSIDE": "NGOAI"}, on_saved=saved.append)
+    thread.start()
+    thread.submit(SNAPSHOT_OBJECTS, 1.0, [obj(1, "dog", 1, 1, confidence=0.5),
+                                          obj(2, "dog", 2, 2, confidence=0.9, state="OUTSIDE"),
+                                          obj(3, "cat", 3, 3)])
+    thread.close()
+
+    # temp_data: 1 dòng / person_ID, đối tượng confidence cao nhất
+    assert thread.db_writer.temp == [[(2, 2, 2)]]
+    assert saved == [1]
+    assert [(r['Object_ID'], r['Status']) for r in thread.csv_log.rows] == [(1, "TRONG"), (2, "NGOAI"), (3, "TRONG")]
@@ -0,0 +1,119 @@
+"""
+Kiểm tra máy trạng thái vùng: trễ (hysteresis), thời gian giữ (dwell) và giữ cảnh báo khi mất dấu
+Đồng hồ giả: timestamp truyền thẳng vào update()
+Chạy: python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import signal_output
+from region_state import RegionStateMachine, STATE_INSIDE, STATE_WARNING, STATE_OUTSIDE
+from signal_bus import SignalEvent
+from zones import Zone, ZoneIndex
+
+# Vùng làm việc 10 x 10
+ZONE_INDEX = ZoneIndex([Zone("work", [(0, 0), (10, 0), (10, 10), (0, 10)])])
+
+
+def make_machine(**kwargs):
+    params = dict(enter_margin=0.5, exit_margin=0.5, enter_dwell_s=0.0, exit_dwell_s=0.0, forget_after_s=3.0)
+    params.update(kwargs)
+    return RegionStateMachine(ZONE_INDEX.inside_mask, **params)
+
+
+def observe(machine, x, y, timestamp, object_id=1, label="dog", warning_ids=()):
+    objects = [{'object_id': object_id, 'label': label, 'bim': (x, y)}]
+    return [(t['state'], t['prev_state']) for t in machine.update(objects, timestamp, warning_ids)]
+
+
+def test_hysteresis_band_keeps_state():
+    machine = make_machine()
+    assert observe(machine, 5, 5, 0.0) == [(STATE_INSIDE, None)]
+    # Vừa qua biên nhưng chưa ra xa exit_margin → giữ TRONG
+    assert observe(machine, 10.2, 5, 1.0) == []
+    assert observe(machine, 10.8, 5, 2.0) == [(STATE_OUTSIDE, STATE_INSIDE)]
+    # Vừa quay lại qua biên nhưng chưa vào sâu enter_margin → giữ NGOÀI
+    assert observe(machine, 9.8, 5, 3.0) == []
+    assert machine.state_of(1) == STATE_OUTSIDE
+    assert observe(machine, 9.0, 5, 4.0) == [(STATE_INSIDE, STATE_OUTSIDE)]
+
+
+def test_dwell_confirms_only_held_states():
+    machine = make_machine(enter_dwell_s=0.5, exit_dwell_s=0.25)
+    # Đối tượng mới cũng phải giữ đủ enter_dwell_s
+    assert observe(machine, 5, 5, 0.0) == []
+    assert observe(machine, 5, 5, 0.3) == []
+    assert machine.state_of(1) is None
+    assert observe(machine, 5, 5, 0.5) == [(STATE_INSIDE, None)]
+
+    # Ra ngoài thoáng qua (ngắn hơn exit_dwell_s) → bỏ qua
+    assert observe(machine, 12, 5, 1.0) == []
+    assert observe(machine, 5, 5, 1.1) == []
+    assert machine.stats['suppressed'] == 1
+    assert observe(machine, 12, 5, 2.0) == []
+    assert observe(machine, 12, 5, 2.25) == [(STATE_OUTSIDE, STATE_INSIDE)]
+
+
+def test_new_object_in_band_uses_center_after_dwell():
+    machine = make_machine(enter_dwell_s=0.5)
+    # Đứng ngay trong biên (dải trễ): vẫn được xác nhận TRONG theo tâm sau dwell
+    assert observe(machine, 9.9, 5, 0.0) == []
+    assert observe(machine, 9.9, 5, 0.5) == [(STATE_INSIDE, None)]
+
+
+def test_warning_and_forget():
+    machine = make_machine()
+    assert observe(machine, 5, 5, 0.0) == [(STATE_INSIDE, None)]
+    assert observe(machine, 5, 5, 0.1, warning_ids={1}) == [(STATE_WARNING, STATE_INSIDE)]
+    assert observe(machine, 12, 5, 0.2) == [(STATE_OUTSIDE, STATE_WARNING)]
+    # Không còn thấy quá forget_after_s → sự kiện mất dấu kèm trạng thái cuối
+    assert machine.update([], 3.1) == []
+    lost = machine.update([], 3.3)
+    assert [(t['object_id'], t['state'], t['prev_state']) for t in lost] == [(1, None, STATE_OUTSIDE)]
+    assert machine.state_of(1) is None
+
+
+def test_unconfirmed_object_forgotten_silently():
+    machine = make_machine(enter_dwell_s=1.0)
+    assert observe(machine, 5, 5, 0.0) == []
+    assert machine.update([], 5.0) == []
+
+
+@pytest.fixture
+def modbus_sink(monkeypatch):
+    # Không có client → chỉ tính trạng thái label, không ghi coil
+    monkeypatch.setattr(signal_output, "modbus_client", None)
+    monkeypatch.setattr(signal_output, "last_region_state", {})
+    return signal_output.ModbusSink()
+
+
+def send(sink, signal_type, **data):
+    sink.handle_batch([SignalEvent(signal_type, dict(label="dog", **data))])
+    return signal_output.last_region_state.get("dog")
+
+
+def test_lost_outside_keeps_alarm_until_inside(modbus_sink):
+    assert send(modbus_sink, "DETECT_OUTSIDE", object_id=1) == STATE_OUTSIDE
+    # Mất dấu khi đang NGOÀI → giữ cảnh báo
+    assert send(modbus_sink, "OBJECT_LOST", object_id=1, last_state=STATE_OUTSIDE) == STATE_OUTSIDE
+    # Đối tượng khác cùng label ở TRONG → bỏ cảnh báo đã giữ
+    assert send(modbus_sink, "DETECT_INSIDE", object_id=2) == STATE_INSIDE
+
+
+def test_lost_outside_keeps_alarm_until_ack(modbus_sink):
+    send(modbus_sink, "DETECT_OUTSIDE", object_id=1)
+    send(modbus_sink, "OBJECT_LOST", object_id=1, last_state=STATE_OUTSIDE)
+    assert send(modbus_sink, "ALARM_ACK") == STATE_INSIDE
+
+
+def test_lost_inside_clears_state(modbus_sink):
+    send(modbus_sink, "DETECT_INSIDE", object_id=1)
+    send(modbus_sink, "DETECT_OUTSIDE", object_id=2)
+    send(modbus_sink, "DETECT_INSIDE", object_id=2)
+    assert send(modbus_sink, "OBJECT_LOST", object_id=1, last_state=STATE_INSIDE) == STATE_INSIDE
+    assert 1 not in modbus_sink.object_states["dog"]
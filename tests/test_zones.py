@@ -0,0 +1,73 @@
+"""
+Kiểm tra chỉ mục lưới ZoneIndex cho kết quả giống hệt kiểm tra đa giác chính xác
+Chạy: python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zones import Zone, ZoneIndex, points_in_polygon, ZONE_EXCLUSION
+
+# Vùng chữ U: khe rộng 0.4 đi xuyên qua ô (1, 1) mà không có đỉnh nào nằm trong ô đó
+U_ZONE = [(0, 0), (3, 0), (3, 3), (1.7, 3), (1.7, 0.5), (1.3, 0.5), (1.3, 3), (0, 3)]
+# Vùng chữ L trong docstring của zones.py
+L_ZONE = [(32, -5), (70, -5), (70, 10), (50, 10), (50, 27), (32, 27)]
+
+
+def random_points(polygon, n=20000, pad=1.0, seed=0):
+    polygon = np.asarray(polygon, dtype=np.float64)
+    low, high = polygon.min(axis=0) - pad, polygon.max(axis=0) + pad
+    return np.random.default_rng(seed).uniform(low, high, size=(n, 2))
+
+
+def test_notch_narrower_than_cell():
+    index = ZoneIndex([Zone("u", U_ZONE)], cell_size=1.0)
+    point = np.array([[1.5, 1.5]])
+    assert not points_in_polygon(point, index.zones[0].polygon)[0]
+    assert not index.inside_mask(point)[0]
+
+
+@pytest.mark.parametrize("polygon", [U_ZONE, L_ZONE])
+@pytest.mark.parametrize("cell_size", [0.25, 0.5, 1.0, 2.0, 5.0])
+def test_grid_matches_exact_concave(polygon, cell_size):
+    index = ZoneIndex([Zone("zone", polygon)], cell_size=cell_size)
+    points = random_points(polygon)
+    # Thêm điểm nằm đúng trên đỉnh / cạnh
+    vertices = np.asarray(polygon, dtype=np.float64)
+    points = np.concatenate([points, vertices, (vertices + np.roll(vertices, -1, axis=0)) / 2])
+
+    exact = points_in_polygon(points, index.zones[0].polygon)
+    np.testing.assert_array_equal(index.inside_mask(points), exact)
+
+
+def test_grid_matches_exact_with_exclusion():
+    exclusion = [(40, 0), (44, 0), (44, 4), (40, 4)]
+    index = ZoneIndex([Zone("work", L_ZONE), Zone("cut", exclusion, ZONE_EXCLUSION)], cell_size=1.0)
+    points = random_points(L_ZONE, seed=1)
+
+    exact = (points_in_polygon(points, np.asarray(L_ZONE, dtype=np.float64)) &
+             ~points_in_polygon(points, np.asarray(exclusion, dtype=np.float64)))
+    np.testing.assert_array_equal(index.inside_mask(points), exact)
+
+
+def test_label_scoped_exclusion():
+    # Máy cắt chỉ cấm songoku, chó vẫn được ở đó
+    exclusion = [(40, 0), (44, 0), (44, 4), (40, 4)]
+    index = ZoneIndex([Zone("work", L_ZONE), Zone("may_cat", exclusion, ZONE_EXCLUSION, ["songoku"])])
+    point = [(42, 2)]
+    assert index.inside_mask(point, "dog")[0]
+    assert not index.inside_mask(point, "songoku")[0]
+    np.testing.assert_array_equal(index.inside_mask(point * 2, ["dog", "songoku"]), [True, False])
+
+    # Thời điểm / hướng ra theo cạnh đa giác và vùng cấm áp dụng cho label
+    assert index.exit_time(36, 2, 1, 0, "songoku") == pytest.approx(4.0)
+    assert index.exit_time(36, 2, 1, 0, "dog") == pytest.approx(34.0)
+    assert index.exit_time(45, 20, 1, 0, "dog") == pytest.approx(5.0)
+    assert index.outside_direction(42, 2, "songoku") == "VUNG_CAM_may_cat"
+    assert index.outside_direction(42, 2, "dog") == "TRONG"
+    assert index.outside_direction(55, 20, "dog") == "PHAI"
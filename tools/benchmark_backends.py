@@ -0,0 +1,118 @@
+"""
+Đo tốc độ inference của các backend trên CÙNG 1 video đã quay
+- Video lấy từ output/videos/ (quay bằng record_dual_cam.py)
+- Mỗi backend: warmup vài frame rồi đo ms/frame trên cùng các frame
+- In bảng so sánh ms/frame (trung bình, p50, p95) và FPS
+
+Cách dùng:
+    python tools/benchmark_backends.py output/videos/cam1_xxx.avi
+    python tools/benchmark_backends.py video.avi --backends pytorch onnx openvino --device cpu
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Thêm path để import các module ở thư mục gốc
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+
+from detection_config import load_detection_config
+from inference_backend import BACKENDS, load_inference_backend
+
+
+def read_frames(video_path, max_frames):
+    """Đọc tối đa max_frames frame từ video vào bộ nhớ"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Không mở được video: {video_path}")
+
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def benchmark_backend(backend, frames, weights_path, inference_config, imgsz, conf, warmup):
+    """Đo ms/frame của 1 backend"""
+    config = dict(inference_config, backend=backend)
+    model = load_inference_backend(weights_path, config, imgsz=imgsz)
+
+    for frame in frames[:warmup]:
+        model(frame, conf=conf, imgsz=imgsz, verbose=False)
+
+    timings = []
+    for frame in frames:
+        t0 = time.perf_counter()
+        model(frame, conf=conf, imgsz=imgsz, verbose=False)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+
+    timings = np.array(timings)
+    return {
+        'backend': backend,
+        'device': model.device,
+        'precision': model.precision,
+        'mean_ms': float(timings.mean()),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'fps': 1000.0 / float(timings.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference backend trên video đã quay")
+    parser.add_argument("video", help="Đường dẫn video (vd: output/videos/cam1_xxx.avi)")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--device", default=None, help="auto / cpu / 0 (mặc định theo config)")
+    parser.add_argument("--precision", default=None, choices=["fp32", "fp16"])
+    parser.add_argument("--frames", type=int, default=200, help="Số frame đo")
+    parser.add_argument("--warmup", type=int, default=10, help="Số frame chạy trước khi đo")
+    args = parser.parse_args()
+
+    detection_config = load_detection_config()
+    inference_config = dict(detection_config.get("inference", {}))
+    if args.device is not None:
+        inference_config["device"] = args.device
+    if args.precision is not None:
+        inference_config["precision"] = args.precision
+
+    weights_path = os.path.join(script_dir, inference_config.get("weights", os.path.join("models", "best.pt")))
+    imgsz = detection_config.get("imgsz", 640)
+    conf = detection_config.get("conf", 0.3)
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        print("[ERROR] Video không có frame nào!")
+        return
+    print(f"[INFO] Đã đọc {len(frames)} frame từ {args.video}")
+
+    results = []
+    for backend in args.backends:
+        print(f"\n[BENCH] Backend: {backend}")
+        try:
+            results.append(benchmark_backend(backend, frames, weights_path, inference_config,
+                                             imgsz, conf, args.warmup))
+        except Exception as e:
+            print(f"[ERROR] {backend}: {e}")
+
+    print("\n" + "="*70)
+    print(f"  KẾT QUẢ BENCHMARK ({len(frames)} frame, imgsz={imgsz})")
+    print("="*70)
+    print(f"  {'Backend':<13}{'Device':<8}{'Prec':<6}{'TB ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'FPS':>8}")
+    print("  " + "-"*66)
+    for r in results:
+        print(f"  {r['backend']:<13}{str(r['device']):<8}{r['precision']:<6}"
+              f"{r['mean_ms']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['fps']:>8.1f}")
+    print("="*70)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,6 @@ Chương trình tính toán điểm pixel trên Camera 1 và 2 từ tọa độ
 - Sử dụng ma trận H nghịch đảo
 """
 
-import cv2
-import numpy as np
 import os
 import sys
 
@@ -16,57 +14,17 @@ sys.path.insert(0, os.path.join(script_dir, "config"))
 
 from chuyendoitoado import get_projection_matrix
 from chuyendoitoado_cam2 import get_projection_matrix_cam2
+from bim_transform import load_camera_transforms, bim_to_pixel
 
 
-def bim_to_pixel_cam1(bim_x, bim_y, matrix):
+def bim_to_pixel_camera(bim_x, bim_y, inv_matrix):
     """
-    Tính pixel trên Camera 1 từ tọa độ BIM
-    Camera 1: Transform trực tiếp qua H^(-1)
+    Tính pixel trên camera từ tọa độ BIM
+    inv_matrix: nghịch đảo của ma trận hiệu dụng (Camera 2 đã gộp sẵn
+    swap/remap/đảo Y nên cả 2 camera đều chỉ cần 1 phép biến đổi)
     """
-    # Tạo điểm BIM dạng numpy array
-    bim_point = np.array([[[float(bim_x), float(bim_y)]]], dtype=np.float32)
-    
-    # Tính ma trận nghịch đảo
-    inv_matrix = np.linalg.inv(matrix)
-    
-    # Transform ngược lại
-    pixel_point = cv2.perspectiveTransform(bim_point, inv_matrix)
-    px = int(pixel_point[0, 0, 0])
-    py = int(pixel_point[0, 0, 1])
-    
-    return px, py
-
-
-def bim_to_pixel_cam2(bim_x, bim_y, matrix):
-    """
-    Tính pixel trên Camera 2 từ tọa độ BIM
-    Camera 2: Cần đảo ngược các phép biến đổi trước khi dùng H^(-1)
-    """
-    # Bước 1: Đảo ngược phép đảo Y
-    # ty = 22 - ty_original  => ty_original = 22 - ty
-    ty_original = 22 - bim_y  # 22 = -5 + 27
-    
-    # Bước 2: Đảo ngược remap Y: từ range (-5, 27) về range (32, 70)
-    # ty = (ty_old - 32) / 38.0 * 32.0 + (-5)
-    # => ty_old = (ty - (-5)) / 32.0 * 38.0 + 32
-    ty_before_remap = (ty_original - (-5)) / 32.0 * 38.0 + 32
-    
-    # Bước 3: Đảo ngược remap X: từ range (32, 70) về range (-5, 27)
-    # tx = (tx_old - (-5)) / 32.0 * 38.0 + 32
-    # => tx_old = (tx - 32) / 38.0 * 32.0 + (-5)
-    tx_before_remap = (bim_x - 32) / 38.0 * 32.0 + (-5)
-    
-    # Bước 4: Đảo ngược swap (swap lại X và Y)
-    tx_after_swap, ty_after_swap = ty_before_remap, tx_before_remap
-    
-    # Bước 5: Transform qua H^(-1)
-    bim_point = np.array([[[float(tx_after_swap), float(ty_after_swap)]]], dtype=np.float32)
-    inv_matrix = np.linalg.inv(matrix)
-    pixel_point = cv2.perspectiveTransform(bim_point, inv_matrix)
-    px = int(pixel_point[0, 0, 0])
-    py = int(pixel_point[0, 0, 1])
-    
-    return px, py
+    px, py = bim_to_pixel(bim_x, bim_y, inv_matrix)
+    return int(px), int(py)
 
 
 def main():
@@ -80,6 +38,10 @@ def main():
     matrix1 = get_projection_matrix().astype('float32')
     matrix2 = get_projection_matrix_cam2().astype('float32')
     
+    # Ma trận nghịch đảo BIM → Pixel (tính 1 lần)
+    _, inv_matrices = load_camera_transforms((1, 2))
+    inv1, inv2 = inv_matrices[1], inv_matrices[2]
+    
     print("\n  Ma trận H Camera 1:")
     print("  " + "-"*66)
     for i in range(3):
@@ -115,10 +77,10 @@ def main():
                 bim_y = float(input("    Y (North): "))
                 
                 # Tính pixel cho Camera 1
-                px1, py1 = bim_to_pixel_cam1(bim_x, bim_y, matrix1)
+                px1, py1 = bim_to_pixel_camera(bim_x, bim_y, inv1)
                 
                 # Tính pixel cho Camera 2
-                px2, py2 = bim_to_pixel_cam2(bim_x, bim_y, matrix2)
+                px2, py2 = bim_to_pixel_camera(bim_x, bim_y, inv2)
                 
                 print("\n  " + "="*66)
                 print(f"  Tọa độ BIM: ({bim_x:.2f}, {bim_y:.2f})")
@@ -146,8 +108,8 @@ def main():
             print("  " + "="*70)
             
             for name, bim_x, bim_y in calibration_points:
-                px1, py1 = bim_to_pixel_cam1(bim_x, bim_y, matrix1)
-                px2, py2 = bim_to_pixel_cam2(bim_x, bim_y, matrix2)
+                px1, py1 = bim_to_pixel_camera(bim_x, bim_y, inv1)
+                px2, py2 = bim_to_pixel_camera(bim_x, bim_y, inv2)
                 
                 print(f"\n  {name}:")
                 print(f"    BIM: ({bim_x:6.2f}, {bim_y:6.2f})")
@@ -179,8 +141,8 @@ def main():
                             bim_x = float(parts[0])
                             bim_y = float(parts[1])
                             
-                            px1, py1 = bim_to_pixel_cam1(bim_x, bim_y, matrix1)
-                            px2, py2 = bim_to_pixel_cam2(bim_x, bim_y, matrix2)
+                            px1, py1 = bim_to_pixel_camera(bim_x, bim_y, inv1)
+                            px2, py2 = bim_to_pixel_camera(bim_x, bim_y, inv2)
                             
                             f_out.write(f"{bim_x:.2f}\t{bim_y:.2f}\t{px1}\t{py1}\t{px2}\t{py2}\n")
                             print(f"  [OK] Dòng {line_num}: BIM({bim_x:.2f}, {bim_y:.2f}) → Cam1({px1}, {py1}), Cam2({px2}, {py2})")
@@ -0,0 +1,48 @@
+"""
+Xuất file Excel từ log CSV của detection (output/detection_logs/)
+- Chạy khi cần, không ảnh hưởng chương trình detection đang chạy
+- Lọc theo khoảng thời gian
+- Mặc định ghi ra file mới output/detection_export_YYYYmmdd_HHMMSS.xlsx;
+  file đã tồn tại chỉ bị ghi đè khi có --force
+
+Cách dùng:
+    python tools/export_detection_excel.py
+    python tools/export_detection_excel.py --start "2026-10-18 10:00" --end "2026-10-18 11:00"
+    python tools/export_detection_excel.py --output output/ca_sang.xlsx --force
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Thêm path để import các module ở thư mục gốc
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+
+from detection_log import LOG_DIR, export_to_excel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xuất Excel từ log CSV của detection")
+    parser.add_argument("--log-dir", default=LOG_DIR, help="Thư mục chứa file CSV")
+    parser.add_argument("--output", default=None,
+                        help="File Excel xuất ra (mặc định: output/detection_export_<thời gian>.xlsx)")
+    parser.add_argument("--force", action="store_true", help="Ghi đè nếu file xuất ra đã tồn tại")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None, help='vd: "2026-10-18 10:00"')
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None, help='vd: "2026-10-18 11:00"')
+    args = parser.parse_args()
+
+    if args.output is None:
+        args.output = os.path.join(script_dir, "output",
+                                   f"detection_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+    if os.path.exists(args.output) and not args.force:
+        print(f"[ERROR] File đã tồn tại: {args.output}")
+        print("        → Chọn --output khác hoặc thêm --force để ghi đè")
+        sys.exit(1)
+
+    export_to_excel(args.output, log_dir=args.log_dir, start=args.start, end=args.end)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Giả lập các slave Modbus (thay cho ESP32/ESP8266 trong slave1/, slave2/)
+- N slave, mỗi slave có M coil (đèn), hỗ trợ FC1 (đọc coil), FC5 (ghi 1 coil), FC15 (ghi nhiều coil)
+- Modbus TCP (mặc định) hoặc Modbus RTU qua cổng serial ảo (cần pyserial)
+- Giả lập độ trễ phản hồi và mất gói để đo đường tín hiệu trong điều kiện giống bus thật
+- Không cần phần cứng → chạy được signal_output.py / run_dual_cam.py trên máy Linux bất kỳ
+
+Cách dùng:
+    # Modbus TCP, 2 slave như hệ thống thật
+    python tools/modbus_slave_simulator.py --transport tcp --port 5020
+    → config/modbus_config.json: "transport": "tcp", "host": "127.0.0.1", "tcp_port": 5020
+
+    # 32 slave, mỗi slave 4 đèn, trễ 8 ms ± 3 ms, mất 2% gói
+    python tools/modbus_slave_simulator.py --slaves 32 --coils 4 --latency-ms 8 --jitter-ms 3 --loss 0.02
+
+    # Modbus RTU qua cặp cổng serial ảo (Linux)
+    socat -d -d pty,raw,echo=0 pty,raw,echo=0          → in ra /dev/pts/3 và /dev/pts/4
+    python tools/modbus_slave_simulator.py --transport rtu --serial /dev/pts/3
+    → config/modbus_config.json: "transport": "rtu", "port": "/dev/pts/4"
+"""
+
+import argparse
+import random
+import socketserver
+import struct
+import threading
+import time
+
+try:
+    import serial
+    PYSERIAL_AVAILABLE = True
+except ImportError:
+    PYSERIAL_AVAILABLE = False
+
+FC_READ_COILS = 1
+FC_WRITE_SINGLE_COIL = 5
+FC_WRITE_MULTIPLE_COILS = 15
+
+EXC_ILLEGAL_FUNCTION = 1
+EXC_ILLEGAL_ADDRESS = 2
+EXC_ILLEGAL_VALUE = 3
+
+
+def crc16(data):
+    """CRC-16/MODBUS (trả về 2 byte, byte thấp trước)"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return struct.pack('<H', crc)
+
+
+class SlaveBank:
+    """Trạng thái coil của mọi slave giả lập + độ trễ / mất gói"""
+    def __init__(self, slave_ids, coils=1, latency_ms=0.0, jitter_ms=0.0, loss=0.0, verbose=True):
+        self.coils = {slave_id: [False] * coils for slave_id in slave_ids}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.stats = {slave_id: {'requests': 0, 'dropped': 0, 'writes': 0} for slave_id in slave_ids}
+
+    def handle(self, unit, pdu):
+        """
+        Xử lý 1 PDU gửi tới slave unit
+
+        Returns:
+            PDU phản hồi, hoặc None nếu slave không trả lời (không tồn tại / giả lập mất gói)
+        """
+        if unit not in self.coils:
+            return None
+
+        with self.lock:
+            self.stats[unit]['requests'] += 1
+            if self.loss and random.random() < self.loss:
+                self.stats[unit]['dropped'] += 1
+                return None
+
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        function = pdu[0]
+        try:
+            if function == FC_READ_COILS:
+                return self._read_coils(unit, pdu)
+            if function == FC_WRITE_SINGLE_COIL:
+                return self._write_single(unit, pdu)
+            if function == FC_WRITE_MULTIPLE_COILS:
+                return self._write_multiple(unit, pdu)
+            return bytes([function | 0x80, EXC_ILLEGAL_FUNCTION])
+        except struct.error:
+            return bytes([function | 0x80, EXC_ILLEGAL_VALUE])
+
+    def _read_coils(self, unit, pdu):
+        address, count = struct.unpack('>HH', pdu[1:5])
+        coils = self.coils[unit]
+        if count < 1 or address + count > len(coils):
+            return bytes([FC_READ_COILS | 0x80, EXC_ILLEGAL_ADDRESS])
+        with self.lock:
+            values = coils[address:address + count]
+        packed = bytearray((count + 7) // 8)
+        for i, value in enumerate(values):
+            if value:
+                packed[i // 8] |= 1 << (i % 8)
+        return bytes([FC_READ_COILS, len(packed)]) + bytes(packed)
+
+    def _write_single(self, unit, pdu):
+        address, value = struct.unpack('>HH', pdu[1:5])
+        if address >= len(self.coils[unit]):
+            return bytes([FC_WRITE_SINGLE_COIL | 0x80, EXC_ILLEGAL_ADDRESS])
+        if value not in (0x0000, 0xFF00):
+            return bytes([FC_WRITE_SINGLE_COIL | 0x80, EXC_ILLEGAL_VALUE])
+        self._set(unit, address, [value == 0xFF00])
+        # Phản hồi FC5 = lặp lại yêu cầu
+        return bytes(pdu[:5])
+
+    def _write_multiple(self, unit, pdu):
+        address, count, byte_count = struct.unpack('>HHB', pdu[1:6])
+        data = pdu[6:6 + byte_count]
+        if count < 1 or address + count > len(self.coils[unit]):
+            return bytes([FC_WRITE_MULTIPLE_COILS | 0x80, EXC_ILLEGAL_ADDRESS])
+        if len(data) != byte_count or byte_count != (count + 7) // 8:
+            return bytes([FC_WRITE_MULTIPLE_COILS | 0x80, EXC_ILLEGAL_VALUE])
+        values = [bool(data[i // 8] >> (i % 8) & 1) for i in range(count)]
+        self._set(unit, address, values)
+        return struct.pack('>BHH', FC_WRITE_MULTIPLE_COILS, address, count)
+
+    def _set(self, unit, address, values):
+        with self.lock:
+            self.coils[unit][address:address + len(values)] = values
+            self.stats[unit]['writes'] += 1
+        if self.verbose:
+            states = " ".join("🔆" if v else "⚫" for v in self.coils[unit])
+            print(f"[SIM] Slave {unit}: {states}")
+
+    def report(self):
+        """In thống kê từng slave"""
+        for slave_id, st in self.stats.items():
+            states = "".join("1" if v else "0" for v in self.coils[slave_id])
+            print(f"[SIM] Slave {slave_id}: yêu cầu={st['requests']} bỏ (mất gói)={st['dropped']} "
+                  f"ghi={st['writes']} coil={states}")
+
+
+# ============ MODBUS TCP ============
+
+class ModbusTcpHandler(socketserver.BaseRequestHandler):
+    """1 kết nối TCP: đọc MBAP header + PDU, trả lời cùng transaction id"""
+    def recv_exact(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def handle(self):
+        bank = self.server.bank
+        while True:
+            header = self.recv_exact(7)
+            if header is None:
+                return
+            transaction_id, protocol_id, length, unit = struct.unpack('>HHHB', header)
+            pdu = self.recv_exact(length - 1)
+            if pdu is None:
+                return
+            response = bank.handle(unit, pdu)
+            if response is None:
+                continue  # Giả lập slave không trả lời → client tự timeout
+            self.request.sendall(struct.pack('>HHHB', transaction_id, protocol_id, len(response) + 1, unit)
+                                 + response)
+
+
+class ModbusTcpServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, bank):
+        super().__init__(address, ModbusTcpHandler)
+        self.bank = bank
+
+
+# ============ MODBUS RTU ============
+
+def rtu_frame_length(buffer):
+    """Độ dài frame RTU yêu cầu (None nếu chưa đủ byte để biết)"""
+    if len(buffer) < 2:
+        return None
+    function = buffer[1]
+    if function in (FC_READ_COILS, FC_WRITE_SINGLE_COIL):
+        return 8
+    if function == FC_WRITE_MULTIPLE_COILS:
+        if len(buffer) < 7:
+            return None
+        return 9 + buffer[6]
+    # Function không hỗ trợ: giả định độ dài 8 byte giống các lệnh đọc/ghi đơn
+    return 8
+
+
+def serve_rtu(serial_port, baudrate, bank):
+    """Đọc frame RTU từ cổng serial, trả lời slave tương ứng"""
+    ser = serial.Serial(serial_port, baudrate=baudrate, bytesize=8, parity='N', stopbits=1, timeout=0.05)
+    # Khoảng lặng giữa 2 frame (3.5 ký tự, tối thiểu 1.75 ms theo chuẩn)
+    frame_gap = max(3.5 * 11 / baudrate, 0.00175)
+    print(f"[SIM] Modbus RTU tại {serial_port} @ {baudrate}")
+
+    buffer = bytearray()
+    last_byte_time = time.monotonic()
+    while True:
+        chunk = ser.read(ser.in_waiting or 1)
+        now = time.monotonic()
+        if chunk:
+            if buffer and now - last_byte_time > frame_gap * 4:
+                buffer.clear()  # Phần frame cũ bị cắt giữa chừng
+            buffer.extend(chunk)
+            last_byte_time = now
+
+        length = rtu_frame_length(buffer)
+        if length is None or len(buffer) < length:
+            continue
+        frame, buffer = bytes(buffer[:length]), buffer[length:]
+        if crc16(frame[:-2]) != frame[-2:]:
+            print("[SIM] ⚠ Sai CRC, bỏ frame")
+            buffer.clear()
+            continue
+
+        unit = frame[0]
+        response = bank.handle(unit, frame[1:-2])
+        if response is None:
+            continue
+        reply = bytes([unit]) + response
+        ser.write(reply + crc16(reply))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Giả lập slave Modbus (đèn) cho hệ thống detection")
+    parser.add_argument("--transport", choices=["tcp", "rtu"], default="tcp")
+    parser.add_argument("--host", default="127.0.0.1", help="Địa chỉ lắng nghe (TCP)")
+    parser.add_argument("--port", type=int, default=5020, help="Cổng TCP")
+    parser.add_argument("--serial", default=None, help="Cổng serial (RTU), vd: /dev/pts/3")
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--slaves", type=int, default=2, help="Số slave (ID 1..N)")
+    parser.add_argument("--coils", type=int, default=1, help="Số coil (đèn) mỗi slave")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Độ trễ phản hồi (ms)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Dao động độ trễ ± (ms)")
+    parser.add_argument("--loss", type=float, default=0.0, help="Tỉ lệ không phản hồi (0-1)")
+    parser.add_argument("--quiet", action="store_true", help="Không in mỗi lần đổi trạng thái coil")
+    args = parser.parse_args()
+
+    bank = SlaveBank(range(1, args.slaves + 1), coils=args.coils, latency_ms=args.latency_ms,
+                     jitter_ms=args.jitter_ms, loss=args.loss, verbose=not args.quiet)
+    print(f"[SIM] {args.slaves} slave x {args.coils} coil | trễ {args.latency_ms}±{args.jitter_ms} ms "
+          f"| mất gói {args.loss * 100:.1f}%")
+
+    try:
+        if args.transport == "tcp":
+            server = ModbusTcpServer((args.host, args.port), bank)
+            print(f"[SIM] Modbus TCP tại {args.host}:{args.port} (Ctrl+C để dừng)")
+            server.serve_forever()
+        else:
+            if not PYSERIAL_AVAILABLE:
+                print("[ERROR] Thiếu pyserial! Chạy: pip install pyserial")
+                return
+            if not args.serial:
+                print("[ERROR] Cần --serial cho chế độ RTU")
+                return
+            serve_rtu(args.serial, args.baudrate, bank)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bank.report()
+
+
+if __name__ == "__main__":
+    main()
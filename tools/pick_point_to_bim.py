@@ -6,7 +6,6 @@ Chương trình Pick điểm trên Camera và tính tọa độ BIM
 """
 
 import cv2
-import numpy as np
 import os
 import sys
 
@@ -14,8 +13,7 @@ import sys
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(script_dir, "config"))
 
-from chuyendoitoado import get_projection_matrix
-from chuyendoitoado_cam2 import get_projection_matrix_cam2
+from bim_transform import get_effective_matrix, pixel_to_bim
 
 # Thông tin camera IP
 USER = "admin"
@@ -41,22 +39,8 @@ class PointPicker:
         self.cap = None
         
     def pixel_to_bim(self, px, py):
-        """Chuyển pixel sang tọa độ BIM"""
-        pt = np.array([[[float(px), float(py)]]], dtype=np.float32)
-        tpt = cv2.perspectiveTransform(pt, self.matrix)
-        tx, ty = float(tpt[0, 0, 0]), float(tpt[0, 0, 1])
-        
-        # Camera 2: Áp dụng các phép biến đổi
-        if self.camera_id == 2:
-            tx, ty = ty, tx  # Swap X và Y
-            # Remap tx: từ range (-5, 27) sang range (32, 70)
-            tx = (tx - (-5)) / 32.0 * 38.0 + 32
-            # Remap ty: từ range (32, 70) sang range (-5, 27)
-            ty = (ty - 32) / 38.0 * 32.0 + (-5)
-            # Đảo ngược Y
-            ty = 22 - ty  # 22 = -5 + 27
-        
-        return tx, ty
+        """Chuyển pixel sang tọa độ BIM (matrix là ma trận hiệu dụng của camera)"""
+        return pixel_to_bim(px, py, self.matrix)
     
     def mouse_callback(self, event, x, y, flags, param):
         if event == cv2.EVENT_LBUTTONDOWN:
@@ -246,12 +230,12 @@ def main():
     if camera_id == 1:
         camera_ip = IP1
         camera_url = CAMERA_URL_1
-        matrix = get_projection_matrix().astype('float32')
+        matrix = get_effective_matrix(1)
     else:
         camera_id = 2
         camera_ip = IP2
         camera_url = CAMERA_URL_2
-        matrix = get_projection_matrix_cam2().astype('float32')
+        matrix = get_effective_matrix(2)
     
     print(f"\n[INFO] Dang khoi dong Camera {camera_id}...\n")
     
@@ -0,0 +1,264 @@
+"""
+Tạo model INT8 (OpenVINO) từ models/best.pt và so sánh với FP32/FP16
+- Calibrate bằng ảnh chụp trong output/images/ (record_dual_cam.py, phím S)
+- Báo cáo: mAP (nếu có dataset có label), ms/frame, bộ nhớ của từng biến thể
+  (mỗi biến thể chạy trong 1 tiến trình riêng → RAM đo được không lẫn với biến thể trước)
+- Kết quả lưu tại output/quantize/quantization_report.json
+
+Cách dùng:
+    python tools/quantize_model.py
+    python tools/quantize_model.py --data path/to/labeled_dataset.yaml --device cpu
+
+Sau khi có model INT8, sửa config/detection_config.json:
+    "inference": {"backend": "openvino", "precision": "int8", ...}
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from queue import Empty
+
+import cv2
+import numpy as np
+import yaml
+
+# Thêm path để import các module ở thư mục gốc
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+
+from detection_config import load_detection_config
+from inference_backend import InferenceBackend, resolve_device, is_cpu
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+    print("[WARN] psutil chưa cài → không đo RAM. Chạy: pip install psutil")
+
+IMAGES_DIR = os.path.join(script_dir, "output", "images")
+QUANTIZE_DIR = os.path.join(script_dir, "output", "quantize")
+REPORT_PATH = os.path.join(QUANTIZE_DIR, "quantization_report.json")
+
+
+def write_calibration_yaml(images_dir, names, yaml_path):
+    """Tạo dataset .yaml trỏ tới thư mục ảnh calibrate (không cần label)"""
+    os.makedirs(os.path.dirname(yaml_path), exist_ok=True)
+    dataset = {
+        'path': images_dir,
+        'train': '.',
+        'val': '.',
+        'names': {int(k): v for k, v in names.items()},
+    }
+    with open(yaml_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(dataset, f, allow_unicode=True, sort_keys=False)
+    return yaml_path
+
+
+def get_size_mb(path):
+    """Dung lượng file hoặc thư mục model (MB)"""
+    if os.path.isdir(path):
+        total = sum(os.path.getsize(p) for p in glob.glob(os.path.join(path, "**"), recursive=True)
+                    if os.path.isfile(p))
+    else:
+        total = os.path.getsize(path)
+    return total / (1024 * 1024)
+
+
+def get_rss_mb():
+    if not PSUTIL_AVAILABLE:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def get_peak_rss_mb():
+    """RSS lớn nhất của tiến trình hiện tại (MB)"""
+    if PSUTIL_AVAILABLE:
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)  # Windows
+        if peak is not None:
+            return peak / (1024 * 1024)
+    try:
+        import resource
+        # Linux: ru_maxrss tính bằng KB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
+def load_images(image_paths):
+    images = [cv2.imread(p) for p in image_paths]
+    return [img for img in images if img is not None]
+
+
+def evaluate_variant(name, weights_path, backend, precision, device, images, imgsz, conf,
+                     calibration_data, labeled_data, warmup):
+    """Load 1 biến thể model, đo latency / bộ nhớ / mAP (gọi trong tiến trình riêng của biến thể)"""
+    print(f"\n[QUANT] === {name} ({backend}, {precision}) ===")
+    rss_before = get_rss_mb()
+    model = InferenceBackend(weights_path, backend=backend, device=device, precision=precision,
+                             imgsz=imgsz, calibration_data=calibration_data)
+
+    for image in images[:warmup]:
+        model(image, conf=conf, imgsz=imgsz, verbose=False)
+    rss_after = get_rss_mb()
+
+    timings = []
+    for image in images:
+        t0 = time.perf_counter()
+        model(image, conf=conf, imgsz=imgsz, verbose=False)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+    timings = np.array(timings)
+
+    result = {
+        'name': name,
+        'backend': backend,
+        'precision': model.precision,
+        'device': str(model.device),
+        'artifact': model.artifact_path,
+        'size_mb': get_size_mb(model.artifact_path),
+        'ram_mb': (rss_after - rss_before) if rss_before is not None else None,
+        'peak_rss_mb': None,
+        'mean_ms': float(timings.mean()),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'map50': None,
+        'map50_95': None,
+    }
+
+    # mAP cần dataset có label (ảnh trong output/images/ chưa có label)
+    if labeled_data:
+        metrics = model.model.val(data=labeled_data, imgsz=imgsz, device=model.device,
+                                  half=model.half, verbose=False)
+        result['map50'] = float(metrics.box.map50)
+        result['map50_95'] = float(metrics.box.map)
+
+    result['peak_rss_mb'] = get_peak_rss_mb()
+    return result
+
+
+def _variant_process(result_queue, image_paths, args):
+    """Entry của tiến trình con: tự đọc ảnh, đo 1 biến thể, trả kết quả qua hàng đợi"""
+    try:
+        result_queue.put(evaluate_variant(images=load_images(image_paths), **args))
+    except Exception as e:
+        result_queue.put({'error': str(e)})
+
+
+def run_variant(image_paths, **args):
+    """Đo 1 biến thể trong tiến trình mới (spawn) → bộ nhớ của biến thể trước không tính vào"""
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=_variant_process, args=(result_queue, image_paths, args))
+    process.start()
+    while True:
+        try:
+            result = result_queue.get(timeout=1.0)
+            break
+        except Empty:
+            # Tiến trình con chết không kịp báo lỗi (vd: lỗi native trong backend)
+            if not process.is_alive():
+                result = {'error': f"tiến trình đo thoát với mã {process.exitcode}"}
+                break
+    process.join()
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+def print_report(results):
+    """In bảng so sánh các biến thể"""
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    print("\n" + "="*96)
+    print("  SO SÁNH INT8 vs FP32/FP16")
+    print("="*96)
+    print(f"  {'Biến thể':<10}{'Backend':<11}{'Device':<8}{'TB ms':>8}{'p95 ms':>8}"
+          f"{'File MB':>9}{'RAM MB':>8}{'Peak MB':>10}{'mAP50':>8}{'mAP50-95':>10}")
+    print("  " + "-"*94)
+    for r in results:
+        print(f"  {r['name']:<10}{r['backend']:<11}{r['device']:<8}{r['mean_ms']:>8.1f}{r['p95_ms']:>8.1f}"
+              f"{r['size_mb']:>9.1f}{fmt(r['ram_mb'], '>8.1f'):>8}{fmt(r['peak_rss_mb'], '>10.1f'):>10}"
+              f"{fmt(r['map50'], '>8.3f'):>8}{fmt(r['map50_95'], '>10.3f'):>10}")
+    print("="*96)
+    print("  RAM MB: RSS tăng thêm khi load + warmup; Peak MB: RSS lớn nhất của tiến trình biến thể")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize models/best.pt sang INT8 và so sánh")
+    parser.add_argument("--images", default=IMAGES_DIR, help="Thư mục ảnh calibrate")
+    parser.add_argument("--data", default=None, help="Dataset .yaml CÓ label để tính mAP (tùy chọn)")
+    parser.add_argument("--device", default=None, help="auto / cpu / 0 (mặc định theo config)")
+    parser.add_argument("--max-images", type=int, default=200, help="Số ảnh đo latency")
+    parser.add_argument("--warmup", type=int, default=5)
+    args = parser.parse_args()
+
+    detection_config = load_detection_config()
+    inference_config = detection_config.get("inference", {})
+    weights_path = os.path.join(script_dir, inference_config.get("weights", os.path.join("models", "best.pt")))
+    imgsz = detection_config.get("imgsz", 640)
+    conf = detection_config.get("conf", 0.3)
+    device = resolve_device(args.device or inference_config.get("device", "auto"))
+
+    image_paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) +
+                         glob.glob(os.path.join(args.images, "*.png")))
+    if not image_paths:
+        print(f"[ERROR] Không có ảnh calibrate trong {args.images}")
+        print("        → Chạy record_dual_cam.py và nhấn S để chụp ảnh")
+        return
+    print(f"[INFO] {len(image_paths)} ảnh calibrate trong {args.images}")
+
+    # Ảnh được đọc lại trong tiến trình của từng biến thể
+    image_paths = image_paths[:args.max_images]
+
+    # Dataset calibrate cho INT8
+    from ultralytics import YOLO
+    names = YOLO(weights_path).names
+    calibration_data = inference_config.get("calibration_data", "output/quantize/calibration.yaml")
+    if not os.path.isabs(calibration_data):
+        calibration_data = os.path.join(script_dir, calibration_data)
+    write_calibration_yaml(os.path.abspath(args.images), names, calibration_data)
+    print(f"[INFO] Dataset calibrate: {calibration_data}")
+
+    # FP16: PyTorch trên GPU, OpenVINO trên CPU
+    fp16_backend = "openvino" if is_cpu(device) else "pytorch"
+    variants = [
+        ("FP32", "pytorch", "fp32"),
+        ("FP16", fp16_backend, "fp16"),
+        ("INT8", "openvino", "int8"),
+    ]
+
+    results = []
+    for name, backend, precision in variants:
+        try:
+            results.append(run_variant(image_paths, name=name, weights_path=weights_path, backend=backend,
+                                       precision=precision, device=device, imgsz=imgsz, conf=conf,
+                                       calibration_data=calibration_data, labeled_data=args.data,
+                                       warmup=args.warmup))
+        except Exception as e:
+            print(f"[ERROR] {name}: {e}")
+
+    if not results:
+        return
+
+    print_report(results)
+
+    os.makedirs(QUANTIZE_DIR, exist_ok=True)
+    with open(REPORT_PATH, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'images': len(image_paths),
+            'imgsz': imgsz,
+            'labeled_data': args.data,
+            'variants': results,
+        }, f, indent=4, ensure_ascii=False)
+    print(f"\n[OK] Đã lưu báo cáo: {REPORT_PATH}")
+    if not args.data:
+        print("[INFO] Chưa tính mAP: truyền --data <dataset có label>.yaml để so sánh độ chính xác")
+
+
+if __name__ == "__main__":
+    main()
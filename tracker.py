@@ -0,0 +1,165 @@
+"""
+Multi-Object Tracker (IoU, kiểu ByteTrack)
+- Gán track_id ổn định cho detection qua các frame (mỗi camera 1 tracker)
+- Ghép 2 bước: detection confidence cao trước, confidence thấp sau
+- Chỉ ghép detection và track cùng class
+- predict(): đẩy box theo vận tốc để chạy detector mỗi N frame
+"""
+
+import itertools
+
+import numpy as np
+
+# Bộ đếm ID dùng chung → track_id không trùng giữa các camera
+_track_ids = itertools.count(1)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU giữa mọi cặp box (x1, y1, x2, y2): mảng len(a) x len(b)"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def greedy_match(iou, threshold):
+    """Ghép cặp theo IoU giảm dần, trả về list (row, col)"""
+    matches = []
+    if iou.size == 0:
+        return matches
+
+    rows, cols = np.where(iou >= threshold)
+    order = np.argsort(-iou[rows, cols])
+    used_rows, used_cols = set(), set()
+    for k in order:
+        r, c = int(rows[k]), int(cols[k])
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matches.append((r, c))
+    return matches
+
+
+class Track:
+    """1 đối tượng đang được theo dõi"""
+    def __init__(self, bbox, cls_id, confidence):
+        self.track_id = next(_track_ids)
+        self.bbox = np.asarray(bbox, dtype=np.float64)
+        self.velocity = np.zeros(4)
+        self.cls_id = int(cls_id)
+        self.confidence = float(confidence)
+        self.hits = 1
+        self.missed = 0
+
+    def predict(self):
+        """Đẩy box theo vận tốc (pixel/frame)"""
+        self.bbox = self.bbox + self.velocity
+        self.missed += 1
+
+    def update(self, bbox, confidence, smoothing=0.5):
+        """Cập nhật bằng detection mới, làm mượt vận tốc"""
+        bbox = np.asarray(bbox, dtype=np.float64)
+        # Box hiện tại đã được predict() đẩy đi 'missed' bước
+        steps = max(self.missed, 1)
+        measured_velocity = (bbox - (self.bbox - self.velocity * self.missed)) / steps
+        self.velocity = smoothing * measured_velocity + (1 - smoothing) * self.velocity
+        self.bbox = bbox
+        self.confidence = float(confidence)
+        self.hits += 1
+        self.missed = 0
+
+
+class IoUTracker:
+    """Tracker IoU cho 1 camera"""
+    def __init__(self, iou_threshold=0.3, max_missed=10, high_conf=0.5, min_hits=1):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.high_conf = high_conf
+        self.min_hits = min_hits
+        self.tracks = []
+
+    def _match_stage(self, track_indices, det_indices, boxes, cls_ids):
+        """Ghép 1 nhóm track với 1 nhóm detection (chỉ cùng class)"""
+        if not track_indices or not det_indices:
+            return []
+
+        track_boxes = np.array([self.tracks[t].bbox for t in track_indices])
+        track_cls = np.array([self.tracks[t].cls_id for t in track_indices])
+        iou = iou_matrix(track_boxes, boxes[det_indices])
+        iou[track_cls[:, None] != cls_ids[det_indices][None, :]] = 0.0
+
+        return [(track_indices[r], det_indices[c]) for r, c in greedy_match(iou, self.iou_threshold)]
+
+    def update(self, boxes, cls_ids, confidences):
+        """
+        Ghép detection của frame hiện tại với các track
+
+        Args:
+            boxes: Nx4 (x1, y1, x2, y2), cls_ids: N, confidences: N
+        Returns:
+            mảng N track_id (-1 nếu track chưa đủ min_hits)
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        cls_ids = np.asarray(cls_ids, dtype=int)
+        confidences = np.asarray(confidences, dtype=np.float64)
+
+        for track in self.tracks:
+            track.predict()
+
+        high = [i for i in range(len(boxes)) if confidences[i] >= self.high_conf]
+        low = [i for i in range(len(boxes)) if confidences[i] < self.high_conf]
+
+        # Bước 1: detection confidence cao với mọi track
+        all_tracks = list(range(len(self.tracks)))
+        matches = self._match_stage(all_tracks, high, boxes, cls_ids)
+
+        # Bước 2: detection confidence thấp với các track còn lại
+        matched_tracks = {t for t, _ in matches}
+        remaining = [t for t in all_tracks if t not in matched_tracks]
+        matches += self._match_stage(remaining, low, boxes, cls_ids)
+
+        track_ids = np.full(len(boxes), -1, dtype=int)
+        for t, d in matches:
+            track = self.tracks[t]
+            track.update(boxes[d], confidences[d])
+            if track.hits >= self.min_hits:
+                track_ids[d] = track.track_id
+
+        # Detection confidence cao chưa ghép → track mới
+        matched_dets = {d for _, d in matches}
+        for d in high:
+            if d not in matched_dets:
+                track = Track(boxes[d], cls_ids[d], confidences[d])
+                self.tracks.append(track)
+                if track.hits >= self.min_hits:
+                    track_ids[d] = track.track_id
+
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        return track_ids
+
+    def predict(self):
+        """
+        Frame không chạy detector: đẩy mọi track theo vận tốc
+
+        Returns:
+            (boxes Nx4, cls_ids N, confidences N, track_ids N) của các track còn sống
+        """
+        for track in self.tracks:
+            track.predict()
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+
+        alive = [t for t in self.tracks if t.hits >= self.min_hits]
+        if not alive:
+            return np.empty((0, 4)), np.empty(0, dtype=int), np.empty(0), np.empty(0, dtype=int)
+        return (np.array([t.bbox for t in alive]),
+                np.array([t.cls_id for t in alive], dtype=int),
+                np.array([t.confidence for t in alive]),
+                np.array([t.track_id for t in alive], dtype=int))
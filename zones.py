@@ -0,0 +1,387 @@
+"""
+Vùng giám sát (geofence) trong hệ tọa độ BIM
+- Vùng đa giác bất kỳ đọc từ config/zones.json (vùng chữ L, nhiều vùng cấm, ...)
+- Không có file → 1 vùng làm việc hình chữ nhật = vùng BIM calibrate (như trước)
+- Chỉ mục lưới (grid): mỗi điểm chỉ kiểm tra các vùng chạm ô lưới chứa nó,
+  ô nằm trọn trong vùng (không có cạnh nào đi qua) thì không cần kiểm tra đa giác
+- Vùng có khai báo labels chỉ áp dụng cho các label đó (cả khi xét trong / ngoài vùng được phép)
+- Thời gian tới lúc rời vùng và hướng ra ngoài tính theo cạnh đa giác (không theo hình chữ nhật bao)
+- ZoneTracker: sinh sự kiện VÀO / RA từng vùng cho từng đối tượng
+
+Định dạng config/zones.json:
+    {
+        "cell_size": 1.0,
+        "zones": [
+            {"name": "khu_lam_viec", "type": "work",
+             "polygon": [[32, -5], [70, -5], [70, 10], [50, 10], [50, 27], [32, 27]]},
+            {"name": "may_cat", "type": "exclusion", "labels": ["songoku"],
+             "polygon": [[40, 0], [44, 0], [44, 4], [40, 4]]}
+        ]
+    }
+    type: "work" (được phép ở trong) hoặc "exclusion" (vùng cấm)
+    labels (tùy chọn): vùng chỉ sinh sự kiện cho các label này
+"""
+
+import os
+import json
+
+import numpy as np
+
+# Path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ZONES_PATH = os.path.join(script_dir, "config", "zones.json")
+
+ZONE_WORK = "work"
+ZONE_EXCLUSION = "exclusion"
+
+
+def points_in_polygon(points, polygon):
+    """
+    Kiểm tra nhiều điểm trong 1 đa giác (ray casting, vector hóa)
+
+    Args:
+        points: mảng Nx2, polygon: mảng Mx2 các đỉnh
+    Returns:
+        mảng bool N (điểm nằm trên cạnh được tính là trong)
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    xs, ys = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+    # Tia ngang sang phải cắt cạnh (x1,y1)-(x2,y2)
+    crosses = (y1 > ys) != (y2 > ys)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+    inside = (crosses & (xs < x_cross)).sum(axis=1) % 2 == 1
+
+    # Điểm nằm trên cạnh
+    cross = (x2 - x1) * (ys - y1) - (y2 - y1) * (xs - x1)
+    on_segment = ((np.abs(cross) < 1e-9) &
+                  (xs >= np.minimum(x1, x2) - 1e-9) & (xs <= np.maximum(x1, x2) + 1e-9) &
+                  (ys >= np.minimum(y1, y2) - 1e-9) & (ys <= np.maximum(y1, y2) + 1e-9))
+    return inside | on_segment.any(axis=1)
+
+
+def segment_hits_boxes(p0, p1, x0, y0, x1, y1):
+    """
+    Đoạn thẳng p0-p1 có chạm các hình chữ nhật [x0, x1] x [y0, y1] không (slab test, vector hóa)
+
+    Returns:
+        mảng bool theo từng hình chữ nhật (chạm biên cũng tính là chạm)
+    """
+    t_min = np.zeros(len(x0))
+    t_max = np.ones(len(x0))
+    hits = np.ones(len(x0), dtype=bool)
+    for start, delta, lo, hi in ((p0[0], p1[0] - p0[0], x0, x1), (p0[1], p1[1] - p0[1], y0, y1)):
+        if abs(delta) < 1e-12:
+            # Cạnh song song trục: chỉ chạm nếu nằm trong dải [lo, hi]
+            hits &= (start >= lo - 1e-9) & (start <= hi + 1e-9)
+            continue
+        t0 = (lo - start) / delta
+        t1 = (hi - start) / delta
+        t_min = np.maximum(t_min, np.minimum(t0, t1))
+        t_max = np.minimum(t_max, np.maximum(t0, t1))
+    return hits & (t_min <= t_max + 1e-9)
+
+
+class Zone:
+    """1 vùng đa giác trong hệ BIM"""
+    def __init__(self, name, polygon, zone_type=ZONE_WORK, labels=None):
+        if zone_type not in (ZONE_WORK, ZONE_EXCLUSION):
+            raise ValueError(f"Loại vùng không hợp lệ: {zone_type}")
+        self.name = name
+        self.polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if len(self.polygon) < 3:
+            raise ValueError(f"Vùng {name} cần ít nhất 3 đỉnh")
+        self.zone_type = zone_type
+        self.labels = {label.lower() for label in labels} if labels else None
+
+    def applies_to(self, label):
+        """Vùng có áp dụng cho label không (không khai báo labels = mọi label)"""
+        return self.labels is None or label.lower() in self.labels
+
+    def bounds(self):
+        """(x_min, x_max, y_min, y_max)"""
+        x_min, y_min = self.polygon.min(axis=0)
+        x_max, y_max = self.polygon.max(axis=0)
+        return float(x_min), float(x_max), float(y_min), float(y_max)
+
+
+class ZoneIndex:
+    """Chỉ mục lưới: ô lưới → các vùng chạm ô (và ô có nằm trọn trong vùng không)"""
+    def __init__(self, zones, cell_size=1.0):
+        self.zones = list(zones)
+        self.cell_size = float(cell_size)
+
+        all_points = np.concatenate([zone.polygon for zone in self.zones])
+        self.origin = all_points.min(axis=0)
+        # (ix, iy) -> list (zone_index, full)
+        self.cells = {}
+        for zone_index, zone in enumerate(self.zones):
+            self._index_zone(zone_index, zone)
+
+        self.work_indices = [i for i, z in enumerate(self.zones) if z.zone_type == ZONE_WORK]
+        self.exclusion_indices = [i for i, z in enumerate(self.zones) if z.zone_type == ZONE_EXCLUSION]
+
+    def _cell_of(self, points):
+        return np.floor((points - self.origin) / self.cell_size).astype(int)
+
+    def _index_zone(self, zone_index, zone):
+        """Đăng ký vùng vào các ô lưới mà bounding box của nó chạm tới"""
+        x_min, x_max, y_min, y_max = zone.bounds()
+        (ix0, iy0), (ix1, iy1) = self._cell_of(np.array([[x_min, y_min], [x_max, y_max]]))
+        ixs, iys = np.meshgrid(np.arange(ix0, ix1 + 1), np.arange(iy0, iy1 + 1), indexing='ij')
+        ixs, iys = ixs.ravel(), iys.ravel()
+
+        # 4 góc của mọi ô
+        x0 = self.origin[0] + ixs * self.cell_size
+        y0 = self.origin[1] + iys * self.cell_size
+        x1, y1 = x0 + self.cell_size, y0 + self.cell_size
+        corners = np.stack([np.stack([x0, y0], 1), np.stack([x1, y0], 1),
+                            np.stack([x1, y1], 1), np.stack([x0, y1], 1)], axis=1)
+        corners_inside = points_in_polygon(corners.reshape(-1, 2), zone.polygon).reshape(-1, 4)
+
+        # Ô có cạnh đa giác đi qua thì không chắc nằm trọn, kể cả khi 4 góc đều trong vùng
+        # (khe / góc lõm hẹp hơn 1 ô) → các ô này luôn kiểm tra đa giác chính xác
+        ny = iy1 - iy0 + 1
+        has_edge = np.zeros(len(ixs), dtype=bool)
+        for p0, p1 in zip(zone.polygon, np.roll(zone.polygon, -1, axis=0)):
+            (ex0, ey0), (ex1, ey1) = self._cell_of(np.array([np.minimum(p0, p1), np.maximum(p0, p1)]))
+            ex0, ey0 = max(ex0, ix0), max(ey0, iy0)
+            ex1, ey1 = min(ex1, ix1), min(ey1, iy1)
+            cells = ((np.arange(ex0, ex1 + 1)[:, None] - ix0) * ny +
+                     (np.arange(ey0, ey1 + 1)[None, :] - iy0)).ravel()
+            hits = segment_hits_boxes(p0, p1, x0[cells], y0[cells], x1[cells], y1[cells])
+            has_edge[cells[hits]] = True
+        full = corners_inside.all(axis=1) & ~has_edge
+
+        for ix, iy, is_full in zip(ixs.tolist(), iys.tolist(), full.tolist()):
+            self.cells.setdefault((ix, iy), []).append((zone_index, is_full))
+
+    def membership(self, points):
+        """
+        Điểm nào nằm trong vùng nào
+
+        Args:
+            points: mảng Nx2 tọa độ BIM
+        Returns:
+            mảng bool N x số vùng
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        result = np.zeros((len(points), len(self.zones)), dtype=bool)
+        if len(points) == 0:
+            return result
+
+        cells = self._cell_of(points)
+        # Gom các điểm cùng ô → mỗi ô chỉ tra chỉ mục 1 lần
+        unique_cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for k, (ix, iy) in enumerate(unique_cells.tolist()):
+            entries = self.cells.get((ix, iy))
+            if not entries:
+                continue
+            rows = np.flatnonzero(inverse == k)
+            for zone_index, full in entries:
+                if full:
+                    result[rows, zone_index] = True
+                else:
+                    result[rows, zone_index] = points_in_polygon(points[rows], self.zones[zone_index].polygon)
+        return result
+
+    def applies_mask(self, labels, n):
+        """
+        Vùng nào áp dụng cho từng điểm
+
+        Args:
+            labels: None (mọi vùng), 1 label cho mọi điểm, hoặc list N label
+        Returns:
+            mảng bool N x số vùng
+        """
+        if labels is None:
+            return np.ones((n, len(self.zones)), dtype=bool)
+        if isinstance(labels, str):
+            labels = [labels] * n
+        by_label = {}
+        rows = []
+        for label in labels:
+            row = by_label.get(label)
+            if row is None:
+                row = by_label[label] = np.array([zone.applies_to(label) for zone in self.zones], dtype=bool)
+            rows.append(row)
+        return np.array(rows, dtype=bool).reshape(n, len(self.zones))
+
+    def inside_mask(self, points, labels=None):
+        """
+        Điểm ở trong vùng được phép: trong 1 vùng work bất kỳ và không trong vùng cấm nào
+        (chỉ xét các vùng áp dụng cho label của điểm; labels None = mọi vùng)
+        """
+        member = self.membership(points)
+        member &= self.applies_mask(labels, len(member))
+        inside = member[:, self.work_indices].any(axis=1)
+        if self.exclusion_indices:
+            inside &= ~member[:, self.exclusion_indices].any(axis=1)
+        return inside
+
+    def exit_time(self, x, y, vx, vy, label=None):
+        """
+        Thời gian (giây) tới khi điểm đang trong vùng được phép đi ra ngoài, đi theo vận tốc hiện tại
+        - Xét giao điểm của tia chuyển động với cạnh mọi vùng áp dụng cho label (gồm khe, vùng cấm)
+
+        Returns:
+            time_s hoặc None nếu không bao giờ ra
+        """
+        speed = float(np.hypot(vx, vy))
+        if speed == 0:
+            return None
+        times = []
+        for zone in self.zones:
+            if label is not None and not zone.applies_to(label):
+                continue
+            start = zone.polygon
+            edge = np.roll(start, -1, axis=0) - start
+            wx, wy = start[:, 0] - x, start[:, 1] - y
+            # (x, y) + t * v = start + s * edge
+            denom = edge[:, 0] * vy - vx * edge[:, 1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = (edge[:, 0] * wy - wx * edge[:, 1]) / denom
+                s = (vx * wy - vy * wx) / denom
+            valid = (np.abs(denom) > 1e-12) & (t >= 0) & (s >= -1e-9) & (s <= 1 + 1e-9)
+            times.extend(t[valid].tolist())
+        if not times:
+            return None
+
+        times = np.unique(times)
+        # Điểm ngay sau mỗi giao điểm (1 mm BIM): ra ngoài vùng được phép thì đó là lúc rời vùng
+        step = 1e-3 / speed
+        probes = np.stack([x + vx * (times + step), y + vy * (times + step)], axis=1)
+        outside = ~self.inside_mask(probes, label)
+        if not outside.any():
+            return None
+        return float(times[np.argmax(outside)])
+
+    def outside_direction(self, x, y, label=None):
+        """
+        Hướng của điểm so với vùng được phép
+        - "TRONG" nếu trong vùng, "VUNG_CAM_<tên>" nếu trong vùng cấm
+        - Ngoài vùng work: hướng từ điểm gần nhất trên biên vùng work tới điểm (TRAI / PHAI / DUOI / TREN,
+          ghép 2 hướng khi đi chéo, vd: "PHAI_TREN")
+        """
+        point = np.array([[x, y]], dtype=np.float64)
+        if self.inside_mask(point, label)[0]:
+            return "TRONG"
+        member = self.membership(point)[0] & self.applies_mask(label, 1)[0]
+        for i in self.exclusion_indices:
+            if member[i]:
+                return f"VUNG_CAM_{self.zones[i].name}"
+
+        best = None
+        for i in self.work_indices:
+            zone = self.zones[i]
+            if label is not None and not zone.applies_to(label):
+                continue
+            start = zone.polygon
+            edge = np.roll(start, -1, axis=0) - start
+            length2 = np.maximum((edge ** 2).sum(axis=1), 1e-12)
+            s = np.clip(((x - start[:, 0]) * edge[:, 0] + (y - start[:, 1]) * edge[:, 1]) / length2, 0.0, 1.0)
+            nearest = start + edge * s[:, None]
+            dist2 = ((nearest - point) ** 2).sum(axis=1)
+            k = int(np.argmin(dist2))
+            if best is None or dist2[k] < best[0]:
+                best = (dist2[k], nearest[k])
+        if best is None or best[0] == 0:
+            return "NGOAI"
+
+        dx, dy = x - best[1][0], y - best[1][1]
+        norm = np.hypot(dx, dy)
+        directions = []
+        # Thành phần đủ lớn (> ~22.5°) mới ghép vào hướng
+        if abs(dx) >= 0.38 * norm:
+            directions.append("TRAI" if dx < 0 else "PHAI")
+        if abs(dy) >= 0.38 * norm:
+            directions.append("DUOI" if dy < 0 else "TREN")
+        return "_".join(directions)
+
+    def work_polygons(self):
+        """Đa giác các vùng work (để chiếu lên ảnh: motion gate, ROI)"""
+        return [self.zones[i].polygon for i in self.work_indices]
+
+
+class ZoneTracker:
+    """Theo dõi đối tượng đang ở vùng nào → sự kiện VÀO / RA"""
+    def __init__(self, zone_index):
+        self.zone_index = zone_index
+        # object_id -> tập tên vùng đang ở
+        self.current = {}
+
+    def update(self, objects):
+        """
+        Args:
+            objects: list dict có 'object_id', 'label', 'bim'
+        Returns:
+            list sự kiện dict: object_id, label, zone, zone_type, event ("ENTER"/"EXIT"), bim
+        """
+        events = []
+        if not objects:
+            self.current = {}
+            return events
+
+        member = self.zone_index.membership([obj['bim'] for obj in objects])
+        zones = self.zone_index.zones
+        seen = {}
+        for obj, row in zip(objects, member):
+            names = {zones[i].name for i in np.flatnonzero(row) if zones[i].applies_to(obj['label'])}
+            previous = self.current.get(obj['object_id'], set())
+            for zone in zones:
+                if zone.name in names and zone.name not in previous:
+                    event = "ENTER"
+                elif zone.name in previous and zone.name not in names:
+                    event = "EXIT"
+                else:
+                    continue
+                events.append({
+                    'object_id': obj['object_id'],
+                    'label': obj['label'],
+                    'zone': zone.name,
+                    'zone_type': zone.zone_type,
+                    'event': event,
+                    'bim': obj['bim'],
+                })
+            seen[obj['object_id']] = names
+
+        # Đối tượng biến mất thì quên trạng thái
+        self.current = seen
+        return events
+
+
+def rectangle_zone(bim_bounds, name="vung_bim"):
+    """Vùng work hình chữ nhật từ (x_min, x_max, y_min, y_max)"""
+    x_min, x_max, y_min, y_max = bim_bounds
+    return Zone(name, [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)], ZONE_WORK)
+
+
+def load_zones(bim_bounds, zones_path=ZONES_PATH):
+    """
+    Đọc các vùng từ config/zones.json và tạo chỉ mục lưới
+
+    Returns:
+        ZoneIndex (mặc định 1 vùng chữ nhật bim_bounds nếu không có file / lỗi)
+    """
+    if not os.path.exists(zones_path):
+        print(f"[CONFIG] Không có {zones_path} → dùng vùng BIM chữ nhật")
+        return ZoneIndex([rectangle_zone(bim_bounds)])
+
+    try:
+        with open(zones_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        zones = [Zone(z["name"], z["polygon"], z.get("type", ZONE_WORK), z.get("labels"))
+                 for z in config.get("zones", [])]
+        if not any(zone.zone_type == ZONE_WORK for zone in zones):
+            # Chỉ khai báo vùng cấm → vùng làm việc vẫn là vùng BIM calibrate
+            zones.insert(0, rectangle_zone(bim_bounds))
+        index = ZoneIndex(zones, cell_size=config.get("cell_size", 1.0))
+        print(f"[CONFIG] Đã đọc {len(zones)} vùng: {zones_path}")
+        return index
+    except Exception as e:
+        print(f"[CONFIG] ❌ Lỗi đọc vùng: {e} → dùng vùng BIM chữ nhật")
+        return ZoneIndex([rectangle_zone(bim_bounds)])